@@ -0,0 +1,21 @@
+#!/usr/bin/env bash
+# ------------------------------------------------------------
+# [+] Build the PoC runner image used by script_AI/06_validate_PoC.py
+#     (python3, curl, node – the target stays in playground_node_js)
+# ------------------------------------------------------------
+
+set -euo pipefail               # abort on error, undefined vars, pipeline failures
+
+readonly IMAGE_NAME="ctf_poc_runner"
+
+info() { echo -e "\e[32m[+] $*\e[0m"; }   # green
+warn() { echo -e "\e[31m[-] $*\e[0m" >&2; } # red
+
+if ! docker version >/dev/null 2>&1; then
+    warn "Docker daemon does not appear to be running or you are not in the 'docker' group."
+    exit 1
+fi
+
+info "Building Docker image '${IMAGE_NAME}' ..."
+docker build -t "${IMAGE_NAME}" "$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)" >/dev/null
+info "Image built successfully."
@@ -6,4 +6,6 @@ python3 -m pip install --upgrade pip
 pip install openai rich markdown-it-py
 pip install docling docling-hierarchical-pdf fugashi ipadic
 pip install faiss-cpu sentence-transformers
+# Optional: --backend onnx / onnx-int8 for 13_embedding.py and 14_retrieve.py
+# pip install "sentence-transformers[onnx]"
 deactivate
@@ -14,6 +14,11 @@ from rich.markdown import Markdown
 from rich.table import Table as RichTable
 from rich.syntax import Syntax
 
+# ------------------------------------------------------------
+# Local helpers shared by the script_AI tools
+# ------------------------------------------------------------
+from instrumentation import tracer, timed_chat_completion
+
 # ------------------------------------------------------------
 # Configuration – adjust to your environment / model limits
 # ------------------------------------------------------------
@@ -31,6 +36,7 @@ BASE_PROLOGUE = (
 )
 
 
+@tracer.timed("render_with_rich")
 def render_with_rich(md_text: str, structured_blocks=None):
     """
     Pretty-print the model's markdown reply using Rich.
@@ -70,20 +76,22 @@ def inquire_lmstudio(prompt: str) -> Optional[str]:
     Send a single prompt to the LM-Studio server.
     Returns the assistant's reply text or ``None`` on error.
     """
-    try:
-        completion = client.chat.completions.create(
-            model="default",                     # change if you have a named model
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user",   "content": prompt},
-            ],
-            max_tokens=131072,                     # adjust according to your model
-            temperature=0.2,                    # low temp for more deterministic analysis
-        )
-        return completion.choices[0].message.content
-    except Exception as e:
-        print(f"[!] OpenAI request failed: {e}")
-        return None
+    with tracer.span("inquire_lmstudio", prompt_bytes=len(prompt.encode("utf-8"))) as sp:
+        try:
+            return timed_chat_completion(
+                client,
+                model="default",                     # change if you have a named model
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user",   "content": prompt},
+                ],
+                max_tokens=131072,                     # adjust according to your model
+                temperature=0.2,                    # low temp for more deterministic analysis
+            )
+        except Exception as e:
+            sp.status = "ERROR"
+            print(f"[!] OpenAI request failed: {e}")
+            return None
 
 
 # ------------------------------------------------------------
@@ -103,11 +111,22 @@ def parse_cli() -> argparse.Namespace:
             "Example: \"-i 'Also check for usage of eval().'\""
         ),
     )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help=(
+            "Append per-stage spans (OpenTelemetry-shaped JSON lines) to FILE. "
+            "The CTF_TRACE_FILE environment variable does the same."
+        ),
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_cli()
+    tracer.configure(args.trace)
 
     # ---- TIMING START -------------------------------------------------
     start_dt   = datetime.now()
@@ -143,6 +162,7 @@ def main() -> None:
 
     print(f"\n[+] Inquiry finished at {end_dt.strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"[+] Total elapsed wall-clock time: {elapsed_hms} ({elapsed_seconds:.2f}s)")
+    tracer.finish()
 
 
 if __name__ == "__main__":
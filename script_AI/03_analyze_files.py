@@ -1,5 +1,4 @@
 import os
-from pathlib import Path
 from typing import Optional
 from openai import OpenAI
 from markdown_it import MarkdownIt
@@ -8,12 +7,37 @@ from rich.markdown import Markdown
 from rich.table import Table as RichTable
 from rich.syntax import Syntax
 import argparse
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from instrumentation import tracer
+from file_scanner import read_source_file
+from findings import FINDINGS_INSTRUCTION, aggregate_findings, extract_findings, format_consensus
+from triage import ANALYSE, AUDIT, DEFAULT_AUDIT_RATE, DEFAULT_THRESHOLD, TRIAGE_PROMPT, Triage
+from file_ranking import score_file
+from scheduler import DeadlineScheduler, Job
+from job_journal import JobJournal, unit_key
+from concurrency_limiter import AdaptiveLimit, ThreadLimiter, limited_call, limited_chat_completion
 
 client = OpenAI(
     base_url="http://192.168.192.11:1234/v1",  # note the trailing /v1
     api_key="lmstudio"                    # dummy key – required by the SDK but ignored
 )
 
+MAX_TOKENS = 4096                          # adjust as needed for response length
+TEMPERATURE = 0.8                          # adjust for creativity vs. accuracy
+DEFAULT_PENDING_FILE = "pending_files.jsonl"   # files left over at the deadline
+DEFAULT_JOURNAL_FILE = "analyze_files_journal.jsonl"  # --journal / --resume without FILE
+
+# Every completion passes through this adaptive limit (see concurrency_limiter);
+# main() sizes it from --concurrency and --samples.
+limiter = ThreadLimiter(AdaptiveLimit())
+_output_lock = threading.Lock()            # keeps concurrently finished replies readable
+
 
 def parse_blocks(md_text: str):
     """Return a list of dicts preserving original order."""
@@ -84,6 +108,7 @@ def parse_blocks(md_text: str):
     return blocks
 
 
+@tracer.timed("render_with_rich")
 def render_with_rich(md_text: str, structured_blocks=None):
     """
     Print the whole response using Rich's Markdown renderer.
@@ -119,6 +144,7 @@ def render_with_rich(md_text: str, structured_blocks=None):
                 console.print(rt)
 
 
+@tracer.timed("read_file")
 def _read_file_contents(filepath: str, max_bytes: int = 200_000) -> str:
     """
     Read the file at ``filepath`` and return its text content.
@@ -129,50 +155,118 @@ def _read_file_contents(filepath: str, max_bytes: int = 200_000) -> str:
       because LM Studio models have a limited context window.
     * UTF‑8 decoding is tried first; if it fails we fall back to latin‑1,
       which never raises a UnicodeDecodeError (it maps bytes 0‑255 directly).
+    * Large files are memory‑mapped and decoded in place (no extra copy);
+      files containing NUL bytes are treated as binary and rejected.
 
     Raises:
         FileNotFoundError, PermissionError – for obvious OS problems.
-        ValueError – when the file is too big or not a regular file.
+        ValueError – when the file is binary or not a regular file.
     """
-    p = Path(filepath).expanduser().resolve(strict=True)
-
-    if not p.is_file():
-        raise ValueError(f"'{filepath}' is not a regular file.")
-
-    size = p.stat().st_size
-    if size > max_bytes:
-        # We will read only the first ``max_bytes`` bytes – enough for most
-        # source‑code files while keeping us inside the model’s context.
-        truncate = True
-    else:
-        truncate = False
-
-    # Open in binary mode so we can control truncation before decoding.
-    with p.open("rb") as f:
-        raw = f.read(max_bytes) if truncate else f.read()
-
-    try:
-        return raw.decode("utf-8")
-    except UnicodeDecodeError:
-        # Fallback – this will never raise an exception.
-        return raw.decode("latin-1")
-
+    return read_source_file(filepath, max_bytes)
+
+
+def _complete(
+    messages: list,
+    name: str = "inquire_lmstudio",
+    max_tokens: int = MAX_TOKENS,
+    **attrs,
+) -> Optional[str]:
+    """One streamed completion in its own span; ``None`` on error."""
+    with tracer.span(name, **attrs) as sp:
+        try:
+            return limited_chat_completion(
+                limiter,
+                client,
+                model="default",  # Or your preferred model in LM Studio
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=TEMPERATURE,
+            )
+        except Exception as e:
+            sp.status = "ERROR"
+            print(f"Error inquiring LMstudio for {attrs.get('file')}: {e}")
+            return None
+
+
+def _sample_completions(
+    messages: list,
+    samples: int,
+    filepath: str,
+    use_api_n: bool = False,
+    max_tokens: int = MAX_TOKENS,
+) -> list:
+    """
+    Return up to ``samples`` completions for the same prompt.
 
-def inquire_lmstudio(filepath: str) -> Optional[str]:
+    With ``use_api_n`` a single request with the API's ``n`` parameter is tried
+    first (not every server honours it); missing samples are then requested as
+    concurrent calls, so the wall time stays close to that of a single call.
+    """
+    replies = []
+    if use_api_n:
+        with tracer.span("inquire_lmstudio_n", file=filepath, n=samples) as sp:
+            try:
+                resp = limited_call(
+                    limiter, client.chat.completions.create,
+                    model="default",
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=TEMPERATURE,
+                    n=samples,
+                )
+                replies = [c.message.content for c in resp.choices if c.message.content]
+                if resp.usage:
+                    sp.set("prompt_tokens", resp.usage.prompt_tokens)
+                    sp.set("completion_tokens", resp.usage.completion_tokens)
+            except Exception as e:
+                sp.status = "ERROR"
+                print(f"[-] n={samples} request failed for {filepath}, falling back to parallel calls: {e}")
+        if len(replies) < samples:
+            print(f"[-] Server returned {len(replies)}/{samples} choices – requesting the rest in parallel.")
+
+    missing = samples - len(replies)
+    if missing > 0:
+        # Copy the context so every worker's span nests under the caller's span
+        with ThreadPoolExecutor(max_workers=missing) as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, _complete, messages,
+                            "inquire_lmstudio", max_tokens, file=filepath, sample=len(replies) + i + 1)
+                for i in range(missing)
+            ]
+            replies += [r for r in (f.result() for f in futures) if r]
+    return replies[:samples]
+
+
+def inquire_lmstudio(
+    filepath: str,
+    samples: int = 1,
+    use_api_n: bool = False,
+    file_content: Optional[str] = None,
+    record_findings: bool = False,
+    max_tokens: int = MAX_TOKENS,
+) -> Optional[str]:
     """
     Send the **contents** of ``filepath`` to the LM Studio server (via
-    OpenAI‑compatible API) and return the model’s answer.
+    OpenAI‑compatible API) and return the model’s answer.  ``file_content`` may
+    be passed when the caller has already read the file; ``record_findings``
+    asks for the machine‑readable findings block (always on when sampling).
+
+    With ``samples`` > 1 the same prompt is sampled several times
+    (self‑consistency); the findings of all replies are merged by frequency and
+    the answer starts with a confidence‑ranked table, followed by the reply that
+    agrees best with it.
 
     Returns:
         The assistant message text on success, or ``None`` if something went
         wrong.  Errors are printed to stdout/stderr – you can replace the
         ``print`` calls with a proper logger in production.
     """
-    try:
-        file_content = _read_file_contents(filepath)
-    except Exception as exc:               # includes FileNotFoundError, PermissionError …
-        print(f"[-] Could not read '{filepath}': {exc}")
-        return None
+    if file_content is None:
+        try:
+            file_content = _read_file_contents(filepath)
+        except Exception as exc:           # includes FileNotFoundError, PermissionError …
+            print(f"[-] Could not read '{filepath}': {exc}")
+            return None
 
     system_prompt = ""                     # keep empty or customise as you like
 
@@ -183,22 +277,30 @@ def inquire_lmstudio(filepath: str) -> Optional[str]:
         f"{file_content}\n"
         f"--- END FILE CONTENT ---"
     )
+    if samples > 1 or record_findings:
+        user_prompt += f"\n\n{FINDINGS_INSTRUCTION}"
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
 
     """Sends the filepath to the LMstudio server (via OpenAI API) and returns the response."""
-    try:
-        completion = client.chat.completions.create(
-            model="default",  # Or your preferred model in LM Studio
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            max_tokens=4096,  # Adjust as needed for response length
-            temperature=0.8 # Adjust for creativity vs. accuracy
-        )
-        return completion.choices[0].message.content
-    except Exception as e:
-        print(f"Error inquiring LMstudio for {filepath}: {e}")
-        return None
+    if samples <= 1:
+        return _complete(messages, max_tokens=max_tokens, file=filepath)
+
+    with tracer.span("self_consistency", file=filepath, samples=samples) as sp:
+        replies = _sample_completions(messages, samples, filepath, use_api_n, max_tokens)
+        if not replies:
+            return None
+        per_sample = [extract_findings(parse_blocks(r)) for r in replies]
+        ranked = aggregate_findings(per_sample)
+        sp.set("findings", len(ranked))
+
+    # Representative reply: the one that reported the most majority findings
+    majority = [voters for _f, voters in ranked if len(voters) * 2 > len(replies)]
+    best = max(range(len(replies)), key=lambda i: sum(i in voters for voters in majority))
+    return f"{format_consensus(ranked, len(replies))}\n\n---\n\n{replies[best]}"
 
 
 def should_process(file_path: str, allowed_exts: set[str]) -> bool:
@@ -209,24 +311,189 @@ def should_process(file_path: str, allowed_exts: set[str]) -> bool:
     return ext.lower() in allowed_exts
 
 
-def traverse_and_inquire(root_dir: str, allowed_exts: set[str]) -> None:
-    """Walk ``root_dir`` recursively and query LM‑Studio only for whitelisted files."""
-    for dirpath, _dirnames, filenames in os.walk(root_dir):
-        for name in filenames:
-            full_path = os.path.join(dirpath, name)
+def make_triage_classifier(model: str):
+    """
+    Cheap‑model tier for ``Triage``: ask the (small, fast) ``model`` for a one‑word
+    YES/NO verdict.  Errors count as YES so that a flaky triage model never hides
+    a file.
+    """
+    def classify(rel_path: str, snippet: str) -> bool:
+        with tracer.span("triage_model", file=rel_path) as sp:
+            try:
+                resp = limited_call(
+                    limiter, client.chat.completions.create,
+                    model=model,
+                    messages=[{"role": "user", "content": TRIAGE_PROMPT.format(path=rel_path, snippet=snippet)}],
+                    max_tokens=3,
+                    temperature=0.0,
+                )
+                answer = (resp.choices[0].message.content or "").strip().upper()
+            except Exception as e:
+                sp.status = "ERROR"
+                print(f"[-] Triage model failed for {rel_path}: {e}")
+                return True
+            sp.set("answer", answer)
+            return not answer.startswith("NO")
+    return classify
+
+
+def _analyse_file(
+    full_path: str,
+    file_content: Optional[str],
+    key: Optional[str],
+    audit: bool = False,
+    samples: int = 1,
+    use_api_n: bool = False,
+    max_tokens: int = MAX_TOKENS,
+    triage: Optional[Triage] = None,
+    journal: Optional[JobJournal] = None,
+    sched: Optional[DeadlineScheduler] = None,
+    sched_job: Optional[Job] = None,
+) -> None:
+    """Query the model for one file and record / render the reply."""
+    started = time.perf_counter()
+    response = inquire_lmstudio(
+        full_path, samples=samples, use_api_n=use_api_n,
+        file_content=file_content, record_findings=audit,
+        max_tokens=max_tokens,
+    )
+    if sched is not None:
+        sched.record(time.perf_counter() - started, response, sched_job)
+    if journal is not None:
+        if response:
+            journal.finish(key, full_path, response)
+        else:
+            journal.fail(key, full_path)
+    if response:
+        with _output_lock:
+            if audit:
+                triage.record_audit(bool(extract_findings(parse_blocks(response))))
+            #print("LM‑Studio response:")
+            render_with_rich(response)
+            #blocks = parse_blocks(response)
+            #render_with_rich(response, structured_blocks=blocks)
+            print("-" * 60)
+
+
+def traverse_and_inquire(
+    root_dir: str,
+    allowed_exts: set[str],
+    samples: int = 1,
+    use_api_n: bool = False,
+    triage: Optional[Triage] = None,
+    deadline_s: Optional[float] = None,
+    pending_path: str = DEFAULT_PENDING_FILE,
+    from_pending: Optional[str] = None,
+    journal: Optional[JobJournal] = None,
+    concurrency: int = 1,
+) -> None:
+    """
+    Walk ``root_dir`` recursively and query LM‑Studio only for whitelisted files.
+    With ``triage`` only files classified as interesting (plus a random recall
+    audit of the rest) reach the expensive model.
+
+    With ``deadline_s`` (seconds) files are queued by their security‑relevance score
+    and analysed most relevant first; ``max_tokens`` shrinks as the deadline nears and
+    the files left when time runs out are saved to ``pending_path``, to be continued
+    with ``from_pending``.
+
+    With ``journal`` every file is logged (keyed by path + content hash) and its reply
+    saved to disk; a resumed journal skips files whose content was already analysed.
+
+    With ``concurrency`` > 1 up to that many files are analysed in parallel, while the
+    adaptive ``limiter`` keeps the number of concurrent requests at what the server
+    handles without latency build‑up.
+    """
+    # Skip files we are not interested in – saves time and API calls.
+    paths = (
+        os.path.join(dirpath, name)
+        for dirpath, _dirnames, filenames in os.walk(root_dir)
+        for name in filenames
+        if should_process(name, allowed_exts)
+    )
 
-            if not should_process(full_path, allowed_exts):
-                # Skip files we are not interested in – saves time and API calls.
+    sched = None
+    if deadline_s or from_pending:
+        sched = DeadlineScheduler(deadline_s, default_max_tokens=MAX_TOKENS)
+        if from_pending:
+            print(f"[+] {sched.load_pending(from_pending)} pending file(s) loaded from '{from_pending}'")
+        else:
+            with tracer.span("schedule_files") as sp:
+                for full_path in paths:
+                    try:
+                        score = score_file(os.path.relpath(full_path, root_dir),
+                                           _read_file_contents(full_path)).score
+                    except Exception:
+                        score = 0.0             # unreadable – reported when it is analysed
+                    sched.push(full_path, score, full_path)
+                sp.set("files", len(sched))
+
+    # (path, scheduler job) – the job goes back to the pending file if its request fails
+    items = ((job.payload, job) for job in sched) if sched is not None else ((p, None) for p in paths)
+
+    pool = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+    inflight: set = set()
+
+    for full_path, sched_job in items:
+        file_content = None
+        decision = ANALYSE
+        if triage is not None or journal is not None:
+            try:
+                file_content = _read_file_contents(full_path)
+            except Exception as exc:
+                print(f"[-] Could not read '{full_path}': {exc}")
+                continue
+        key = None
+        if journal is not None:
+            key = unit_key(full_path, file_content, f"samples={samples}")
+            if journal.skip(key, full_path):
+                continue
+        if triage is not None:
+            with tracer.span("triage", file=full_path) as sp:
+                decision = triage.decide(os.path.relpath(full_path, root_dir), file_content)
+                sp.set("decision", decision)
+            if decision not in (ANALYSE, AUDIT):
+                print(f"[-] Triage: skipping {full_path}")
                 continue
 
-            print(f"\n[+] Querying LM‑Studio for: {full_path}")
-            response = inquire_lmstudio(full_path)
-            if response:
-                #print("LM‑Studio response:")
-                render_with_rich(response)
-                #blocks = parse_blocks(response)
-                #render_with_rich(response, structured_blocks=blocks)
-                print("-" * 60)
+        audit = decision == AUDIT
+        print(f"\n[+] Querying LM‑Studio for: {full_path}" + (" (recall audit)" if audit else ""))
+        if journal is not None:
+            journal.start(key, full_path)
+        job = functools.partial(
+            _analyse_file, full_path, file_content, key,
+            audit=audit, samples=samples, use_api_n=use_api_n,
+            max_tokens=sched.max_tokens() if sched is not None else MAX_TOKENS,
+            triage=triage, journal=journal, sched=sched, sched_job=sched_job,
+        )
+        if pool is None:
+            job()
+            continue
+        # Keep at most ``concurrency`` files in flight; the limiter decides how many
+        # of their requests actually run at the same time.
+        inflight.add(pool.submit(contextvars.copy_context().run, job))
+        if len(inflight) >= concurrency:
+            done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                fut.result()
+
+    if pool is not None:
+        for fut in inflight:
+            fut.result()
+        pool.shutdown()
+        print(limiter.limit.report())
+
+    if triage is not None:
+        calls = [r for r in tracer.summary_rows() if r["name"] == "inquire_lmstudio"]
+        mean_call_s = calls[0]["total_s"] / calls[0]["count"] if calls else None
+        print(triage.stats.report(mean_call_s))
+
+    if sched is not None:
+        print(sched.report())
+        left = sched.save_pending(pending_path)
+        if left:
+            print(f"[!] {left} file(s) not analysed – saved to '{pending_path}' "
+                  f"(continue with --from-pending {pending_path})")
 
 
 def parse_cli() -> argparse.Namespace:
@@ -248,18 +515,158 @@ def parse_cli() -> argparse.Namespace:
             "Provide them with the leading dot, e.g. -e .js .ts .html"
         ),
     )
+    parser.add_argument(
+        "-n",
+        "--samples",
+        type=int,
+        default=1,
+        metavar="N",
+        help=(
+            "Self‑consistency: sample each file N times concurrently and rank the "
+            "findings by how many samples agree (default: 1 = single call)."
+        ),
+    )
+    parser.add_argument(
+        "--api-n",
+        action="store_true",
+        help="With --samples: ask for all samples in one request via the API's 'n' parameter when the server supports it.",
+    )
+    parser.add_argument(
+        "--triage",
+        action="store_true",
+        help=(
+            "Only send files that a cheap heuristic (and, with --triage-model, a small model) "
+            "classifies as security‑relevant to the expensive model."
+        ),
+    )
+    parser.add_argument(
+        "--triage-model",
+        type=str,
+        default=None,
+        metavar="NAME",
+        help="Small/fast LM Studio model for the second triage tier (implies --triage).",
+    )
+    parser.add_argument(
+        "--triage-threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        metavar="SCORE",
+        help=f"Heuristic score at which a file is always analysed (default: {DEFAULT_THRESHOLD:g}).",
+    )
+    parser.add_argument(
+        "--triage-audit",
+        type=float,
+        default=DEFAULT_AUDIT_RATE,
+        metavar="RATE",
+        help=(
+            "Recall safeguard: share of rejected files analysed anyway to measure "
+            f"missed findings (default: {DEFAULT_AUDIT_RATE:g}; 0 disables)."
+        ),
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        metavar="SEC",
+        help=(
+            "Time budget in seconds: analyse the most relevant files first, shrink "
+            "max_tokens near the deadline and save what is left to --pending."
+        ),
+    )
+    parser.add_argument(
+        "--pending",
+        type=str,
+        default=DEFAULT_PENDING_FILE,
+        metavar="FILE",
+        help=f"Where unfinished files are saved with --deadline (default: {DEFAULT_PENDING_FILE}).",
+    )
+    parser.add_argument(
+        "--from-pending",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Analyse the files saved by an earlier --deadline run instead of walking the directory.",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=1,
+        metavar="N",
+        help=(
+            "Analyse up to N files in parallel; the number of concurrent requests adapts "
+            "between 1 and N to the server's latency and 429/503 replies (default: 1)."
+        ),
+    )
+    parser.add_argument(
+        "--journal",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help=(
+            "Keep a job journal (JSON lines) recording every file and saving its reply next to it, "
+            "so that an interrupted run can be resumed (off by default)."
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Journal the run and continue an interrupted one: skip files the journal marks as "
+            f"done (unless they changed).  Uses --journal, else {DEFAULT_JOURNAL_FILE}."
+        ),
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help=(
+            "Append per-stage spans (OpenTelemetry-shaped JSON lines) to FILE. "
+            "The CTF_TRACE_FILE environment variable does the same."
+        ),
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_cli()
+    tracer.configure(args.trace)
 
     # Normalise extensions – ensure they all start with a dot and are lower‑cased.
     allowed_exts = {ext if ext.startswith(".") else f".{ext}" for ext in args.ext}
     allowed_exts = {e.lower() for e in allowed_exts}
 
     print(f"Scanning '{args.directory}' for extensions: {', '.join(sorted(allowed_exts))}")
-    traverse_and_inquire(args.directory, allowed_exts)
+
+    start_dt   = datetime.now()
+    start_perf = time.perf_counter()
+
+    triage = None
+    if args.triage or args.triage_model:
+        triage = Triage(
+            threshold=args.triage_threshold,
+            classifier=make_triage_classifier(args.triage_model) if args.triage_model else None,
+            audit_rate=args.triage_audit,
+        )
+
+    if args.resume and args.journal is None:
+        args.journal = DEFAULT_JOURNAL_FILE
+    journal = JobJournal(args.journal, resume=args.resume) if args.journal else None
+    max_requests = max(1, args.concurrency) * max(1, args.samples)
+    limiter.limit = AdaptiveLimit(initial=min(max_requests, max(2, args.samples)), max_limit=max_requests)
+    traverse_and_inquire(
+        args.directory, allowed_exts, samples=args.samples, use_api_n=args.api_n, triage=triage,
+        deadline_s=args.deadline, pending_path=args.pending, from_pending=args.from_pending,
+        journal=journal, concurrency=args.concurrency,
+    )
+    if journal is not None:
+        journal.close()
+
+    elapsed_seconds = time.perf_counter() - start_perf
+    print(f"\n[+] Scan started at {start_dt.strftime('%Y-%m-%d %H:%M:%S')}, "
+          f"took {elapsed_seconds:.2f}s")
+    tracer.finish()
 
 
 if __name__ == "__main__":
@@ -17,11 +17,12 @@ Usage stays identical to the original script, with one extra optional argument:
 """
 
 import os
+import json
 import time
 from datetime import datetime
 import argparse
 from pathlib import Path
-from typing import Optional, List, Set, Tuple
+from typing import Iterable, Iterator, Optional, Set, Tuple
 
 # ------------------------------------------------------------
 # 3rd‑party imports (unchanged)
@@ -33,6 +34,25 @@ from rich.markdown import Markdown
 from rich.table import Table as RichTable
 from rich.syntax import Syntax
 
+# ------------------------------------------------------------
+# Local helpers shared by the script_AI tools
+# ------------------------------------------------------------
+from instrumentation import tracer, timed_chat_completion
+from file_scanner import (
+    DEFAULT_EXCLUDES,
+    DEFAULT_WORKERS,
+    parallel_read,
+    read_source_file,
+    walk_source_files,
+)
+from file_ranking import print_ranking, rank_file_entries, select_within_budget
+from dependency_graph import count_cross_edges, pack_by_dependencies
+from payload_optimizer import PayloadOptimizer
+from prompt_chunks import chunk_file_paths, iter_prompt_chunks, wrapped_size
+from scheduler import DeadlineScheduler
+from job_journal import JobJournal, unit_key
+from findings import FINDINGS_INSTRUCTION, extract_findings, save_findings
+
 # ------------------------------------------------------------
 # Configuration – adjust to your environment / model limits
 # ------------------------------------------------------------
@@ -53,33 +73,25 @@ BASE_PROLOGUE = (
 MAX_TOTAL_BYTES = 950_000               # leave room for the model’s response
 MAX_FILE_BYTES = 200_000                # per‑file cap – same as original script
 CHUNK_OVERLAP_BYTES = 2_000             # small overlap to keep context continuity
+MAX_RESPONSE_TOKENS = 131_072           # adjust according to your model
+DEFAULT_PENDING_FILE = "pending_chunks.jsonl"   # chunks left over at the deadline
+DEFAULT_JOURNAL_FILE = "analyze_application_journal.jsonl"  # --journal / --resume without FILE
 
 # ------------------------------------------------------------
 # Helper: read a file safely, honouring size limits and encoding fallbacks
 # ------------------------------------------------------------
+@tracer.timed("read_file")
 def _read_file_contents(filepath: str, max_bytes: int = MAX_FILE_BYTES) -> str:
     """
     Return the (possibly truncated) text of *filepath*.
 
-    - Only regular files are accepted.
+    - Only regular files are accepted; binary files (NUL bytes) are rejected.
     - Size is capped to ``max_bytes``; larger files are truncated.
     - UTF‑8 is tried first, then latin‑1 as a safe fallback.
+    - Large files are memory‑mapped and decoded in place; the returned string
+      carries its UTF‑8 size (``.nbytes``) so it is never re‑encoded to be measured.
     """
-    p = Path(filepath).expanduser().resolve(strict=True)
-
-    if not p.is_file():
-        raise ValueError(f"'{filepath}' is not a regular file.")
-
-    size = p.stat().st_size
-    truncate = size > max_bytes
-
-    with p.open("rb") as f:
-        raw = f.read(max_bytes) if truncate else f.read()
-
-    try:
-        return raw.decode("utf-8")
-    except UnicodeDecodeError:
-        return raw.decode("latin-1")
+    return read_source_file(filepath, max_bytes)
 
 
 # ------------------------------------------------------------
@@ -152,6 +164,7 @@ def parse_blocks(md_text: str):
     return blocks
 
 
+@tracer.timed("render_with_rich")
 def render_with_rich(md_text: str, structured_blocks=None):
     """
     Pretty‑print the model’s markdown reply using Rich.
@@ -195,106 +208,71 @@ def should_process(file_path: str, allowed_exts: Set[str]) -> bool:
     return ext.lower() in allowed_exts
 
 
-def collect_file_entries(root_dir: str, allowed_exts: Set[str]) -> List[Tuple[str, str]]:
+def collect_file_entries(
+    root_dir: str,
+    allowed_exts: Set[str],
+    excludes: Iterable[str] = DEFAULT_EXCLUDES,
+    use_gitignore: bool = True,
+    workers: int = DEFAULT_WORKERS,
+) -> Iterator[Tuple[str, str]]:
     """
-    Walk ``root_dir`` and return a list of tuples ``(relative_path, file_content)`` for
+    Walk ``root_dir`` and lazily yield tuples ``(relative_path, file_content)`` for
     every file whose extension is whitelisted.
 
+    * The ``os.scandir`` walk runs on a background thread and files are read on a
+      thread pool, so entries start flowing before the walk has finished.
+    * Directories / files matching ``excludes`` (gitignore‑style globs) or any
+      ``.gitignore`` in the tree are skipped without being entered.
+    * Entries are yielded in deterministic walk order.
+
     The relative path is calculated with respect to *root_dir* – this keeps the prompt
     readable even when the script is run from an arbitrary working directory.
     """
-    entries: List[Tuple[str, str]] = []
     root_path = Path(root_dir).expanduser().resolve(strict=True)
+    paths = walk_source_files(str(root_path), allowed_exts, excludes, use_gitignore)
 
-    for dirpath, _dirnames, filenames in os.walk(root_path):
-        for name in filenames:
-            full_path = os.path.join(dirpath, name)
-            if not should_process(full_path, allowed_exts):
-                continue
-
-            try:
-                print(f"[+] reading '{full_path}'")
-                content = _read_file_contents(full_path)
-            except Exception as exc:
-                print(f"[-] Could not read '{full_path}': {exc}")
-                continue
-
-            rel_path = os.path.relpath(full_path, start=root_path)
-            entries.append((rel_path, content))
-
-    return entries
+    for full_path, content, exc in parallel_read(paths, _read_file_contents, workers):
+        if exc is not None:
+            print(f"[-] Could not read '{full_path}': {exc}")
+            continue
+        print(f"[+] read '{full_path}'")
+        yield os.path.relpath(full_path, start=root_path), content
 
 
 def build_prompt_chunks(
-    file_entries: List[Tuple[str, str]],
+    file_entries: Iterable[Tuple[str, str]],
     max_total_bytes: int = MAX_TOTAL_BYTES,
     overlap_bytes: int = CHUNK_OVERLAP_BYTES,
-) -> List[str]:
+) -> Iterator[str]:
     """
-    Turn the list of ``(path, content)`` into one or more prompt strings that each
-    respect ``max_total_bytes``.
+    Turn the stream of ``(path, content)`` into one or more prompt strings that each
+    respect ``max_total_bytes``.  Chunks are yielded as soon as they are full, so the
+    first request can go out while later files are still being read.
 
-    The algorithm is simple:
+    The algorithm is simple (see ``prompt_chunks`` for the details):
 
     * Keep appending files (with a small header/footer wrapper) until adding the next
-      file would exceed the limit.
-    * When the limit is reached, start a new chunk.  The first ``overlap_bytes`` of the
-      previous chunk are copied to the front of the new one – this helps the model keep
-      context across chunk boundaries.
-
-    Returns a list of ready‑to‑send prompt strings **without** the fixed prologue.
+      file would exceed the limit – sizes are tracked in UTF‑8 bytes per file, and
+      each chunk is joined only once.
+    * When the limit is reached, start a new chunk.  Up to ``overlap_bytes`` from the
+      end of the previous chunk, cut on a file or line boundary, are copied to the
+      front of the new one – this helps the model keep context across chunk boundaries.
+    * A file that alone exceeds the limit is truncated by bytes.
+
+    Yields ready‑to‑send prompt strings **without** the fixed prologue.
     """
-    chunks: List[str] = []
-    current_parts: List[str] = []
-    current_size = 0
-
-    def flush_current():
-        nonlocal current_parts, current_size
-        if current_parts:
-            chunks.append("\n".join(current_parts))
-            # keep overlap for next chunk
-            overlap_text = "\n".join(current_parts)[-overlap_bytes:]
-            current_parts = [overlap_text] if overlap_text else []
-            current_size = len(overlap_text.encode("utf-8"))
-        else:
-            current_parts = []
-            current_size = 0
-
-    for rel_path, content in file_entries:
-        # Build a small wrapper that makes the prompt self‑documenting
-        wrapped = (
-            f"\n--- BEGIN FILE: {rel_path} ---\n"
-            f"{content}\n"
-            f"--- END FILE: {rel_path} ---\n"
-        )
-        wrapped_bytes = len(wrapped.encode("utf-8"))
-
-        # If a single file alone exceeds the per‑chunk limit, we truncate it
-        if wrapped_bytes > max_total_bytes:
-            truncated = wrapped[:max_total_bytes]
-            print(f"[!] File '{rel_path}' is larger than the chunk size – truncating.")
-            wrapped = truncated
-            wrapped_bytes = len(wrapped.encode("utf-8"))
-
-        # Does adding this file overflow the current chunk?
-        if current_size + wrapped_bytes > max_total_bytes:
-            flush_current()
-
-        current_parts.append(wrapped)
-        current_size += wrapped_bytes
-
-    # finalise last chunk
-    flush_current()
-    return chunks
+    return iter_prompt_chunks(file_entries, max_total_bytes, overlap_bytes)
 
 
 def _assemble_full_prompt(
     chunk_body: str,
     extra_instruction: Optional[str] = None,
+    record_findings: bool = False,
 ) -> str:
     """
     Insert the fixed prologue and (optionally) a user‑supplied instruction **before**
-    the actual code chunk.
+    the actual code chunk.  With ``record_findings`` the model is also asked to end
+    its reply with a machine‑readable list of findings.
 
     The final string is what will be sent to the model.
     """
@@ -305,6 +283,9 @@ def _assemble_full_prompt(
         # Strip leading/trailing whitespace so we don't get accidental blank lines
         parts.append(extra_instruction.strip())
 
+    if record_findings:
+        parts.append(FINDINGS_INSTRUCTION)
+
     # Separate the instruction block from the file list with a blank line for readability
     parts.append("")          # forces a newline between instruction and code
     parts.append(chunk_body)
@@ -312,67 +293,215 @@ def _assemble_full_prompt(
     return "\n".join(parts)
 
 
-def inquire_lmstudio(prompt: str) -> Optional[str]:
+def inquire_lmstudio(prompt: str, max_tokens: int = MAX_RESPONSE_TOKENS) -> Optional[str]:
     """
     Send a *single* prompt (which may contain many files) to the LM‑Studio server.
     Returns the assistant’s reply text or ``None`` on error.
     """
-    try:
-        completion = client.chat.completions.create(
-            model="default",                     # change if you have a named model
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user",   "content": prompt},
-            ],
-            max_tokens=131072,                     # adjust according to your model
-            temperature=0.2,                    # low temp for more deterministic analysis
-        )
-        return completion.choices[0].message.content
-    except Exception as e:
-        print(f"[!] OpenAI request failed: {e}")
-        return None
+    with tracer.span("inquire_lmstudio", prompt_bytes=len(prompt.encode("utf-8"))) as sp:
+        try:
+            return timed_chat_completion(
+                client,
+                model="default",                     # change if you have a named model
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user",   "content": prompt},
+                ],
+                max_tokens=max_tokens,
+                temperature=0.2,                    # low temp for more deterministic analysis
+            )
+        except Exception as e:
+            sp.status = "ERROR"
+            print(f"[!] OpenAI request failed: {e}")
+            return None
 
 
 def process_project(
     root_dir: str,
     allowed_exts: Set[str],
     extra_instruction: Optional[str] = None,
+    excludes: Iterable[str] = DEFAULT_EXCLUDES,
+    use_gitignore: bool = True,
+    workers: int = DEFAULT_WORKERS,
+    rank: bool = False,
+    budget_tokens: Optional[int] = None,
+    max_requests: Optional[int] = None,
+    group_deps: bool = False,
+    dedupe: bool = False,
+    strip_comments: bool = False,
+    line_map_path: Optional[str] = None,
+    findings_path: Optional[str] = None,
+    deadline_s: Optional[float] = None,
+    pending_path: str = DEFAULT_PENDING_FILE,
+    from_pending: Optional[str] = None,
+    journal: Optional[JobJournal] = None,
 ) -> None:
     """
-    Orchestrates the whole workflow:
-
-    1. Collect all matching files.
-    2. Split them into size‑limited chunks.
-    3. Prepend the fixed prologue (and optional instruction) to each chunk.
-    4. Send each chunk to the model and render the answer.
+    Orchestrates the whole workflow as a stream:
+
+    1. Collect matching files (walk + reads run in the background).
+    2. Optionally rank them by security relevance and trim them to ``budget_tokens``
+       (this waits for the full scan, since ranking needs every file).
+    3. Split them into size‑limited chunks as they arrive – or, with ``group_deps``,
+       pack files connected by require/import/include edges into the same chunk.
+       Duplicates are replaced by references and comments / blank lines stripped
+       in this final send order, so the copy sent in full is the highest‑ranked
+       one and always precedes its references.
+    4. Prepend the fixed prologue (and optional instruction) to each chunk.
+    5. Send each chunk to the model and render the answer – without ranking the first
+       chunk goes out while the rest of the tree is still being read.  At most
+       ``max_requests`` chunks are sent.
+    6. With ``findings_path``, store the structured findings of every reply as JSON
+       lines – the input of ``05_build_PoC.py --findings``.
+
+    With ``deadline_s`` (seconds) the chunks are queued by their best file score and
+    sent most relevant first; ``max_tokens`` shrinks as the deadline approaches, and
+    whatever is left when time runs out is saved to ``pending_path``.  A later run
+    with ``from_pending`` picks those chunks up instead of scanning ``root_dir``.
+
+    Every chunk is logged in ``journal`` (keyed by the hash of the full prompt) with
+    its reply saved to disk; a resumed journal skips the chunks already done.
     """
     print(f"🔎 Scanning '{root_dir}' for extensions: {', '.join(sorted(allowed_exts))}")
 
-    file_entries = collect_file_entries(root_dir, allowed_exts)
-    if not file_entries:
-        print("[-] No files matched – exiting.")
-        return
-
-    raw_chunks = build_prompt_chunks(file_entries)
+    next_finding_id = 1
+    if findings_path:
+        open(findings_path, "w", encoding="utf-8").close()      # one run per file
 
-    # Add the prologue / optional instruction **once per chunk**
-    chunks = [_assemble_full_prompt(c, extra_instruction) for c in raw_chunks]
+    if from_pending:
+        file_entries = iter(())             # the pending file already holds the chunks
+    else:
+        file_entries = collect_file_entries(
+            root_dir, allowed_exts, excludes=excludes, use_gitignore=use_gitignore, workers=workers
+        )
+    if deadline_s and not from_pending:
+        rank = True                         # job priorities come from the ranking
+
+    optimizer = PayloadOptimizer(dedupe=dedupe, strip=strip_comments) if dedupe or strip_comments else None
+
+    scores = None
+    if rank or budget_tokens:
+        with tracer.span("rank_file_entries") as sp:
+            ranked, scores = rank_file_entries(file_entries)
+            sp.set("files", len(ranked))
+        print_ranking(scores)
+        file_entries, scores = select_within_budget(ranked, scores, budget_tokens)
+        if budget_tokens:
+            print(f"[+] Token budget {budget_tokens}: keeping {len(scores)}/{len(ranked)} file(s), "
+                  f"~{sum(fs.est_tokens for fs in scores)} tokens")
+
+    if group_deps:
+        # Ranking, budget and the import graph all see the original contents
+        with tracer.span("pack_by_dependencies") as sp:
+            file_entries = list(file_entries)
+            bins = pack_by_dependencies(
+                file_entries,
+                MAX_TOTAL_BYTES,
+                size_of=lambda e: wrapped_size(*e) + 1,
+                priority=[fs.score for fs in scores] if scores else None,
+            )
+            inside, crossing = count_cross_edges(bins)
+            sp.set("bins", len(bins))
+        print(f"[+] Dependency packing: {len(file_entries)} file(s) in {len(bins)} chunk(s), "
+              f"{inside} import edge(s) kept together, {crossing} split")
+        if optimizer is not None:
+            bins = [list(optimizer.process(b)) for b in bins]     # only shrinks – bins still fit
+        # Each bin already fits – no overlap needed between independent clusters
+        raw_chunks = (c for b in bins for c in build_prompt_chunks(b, overlap_bytes=0))
+    else:
+        if optimizer is not None:
+            file_entries = optimizer.process(file_entries)
+        raw_chunks = build_prompt_chunks(file_entries)
+
+    sched = None
+    if deadline_s or from_pending:
+        sched = DeadlineScheduler(deadline_s, default_max_tokens=MAX_RESPONSE_TOKENS)
+        if from_pending:
+            print(f"[+] {sched.load_pending(from_pending)} pending chunk(s) loaded from '{from_pending}'")
+        else:
+            file_score = {fs.path: fs.score for fs in scores or ()}
+            with tracer.span("schedule_chunks") as sp:
+                for n, raw in enumerate(raw_chunks, start=1):
+                    priority = max((file_score.get(p, 0.0) for p in chunk_file_paths(raw)), default=0.0)
+                    sched.push(f"chunk {n}", priority, raw)
+                sp.set("chunks", len(sched))
+
+    # (raw chunk, scheduler job) – the job goes back to the pending file if its request fails
+    jobs = ((job.payload, job) for job in sched) if sched is not None else ((c, None) for c in raw_chunks)
+
+    idx = 0
+    while max_requests is None or idx < max_requests:
+        with tracer.span("build_prompt_chunks"):
+            raw_chunk, sched_job = next(jobs, (None, None))
+        if raw_chunk is None:
+            break
+
+        # Add the prologue / optional instruction **once per chunk**
+        chunk = _assemble_full_prompt(raw_chunk, extra_instruction, record_findings=bool(findings_path))
+        key = unit_key(chunk)
+        if journal is not None and journal.is_done(key):
+            saved = ""
+            if findings_path:               # keep the findings file complete on resume
+                try:
+                    with open(journal.result_path(key), "r", encoding="utf-8") as f:
+                        saved = f.read()
+                except OSError as exc:
+                    print(f"[-] Journal: cannot read the reply of chunk {key[:8]} ({exc}) – analysing it again")
+                    saved = None
+            if saved is not None and journal.skip(key, f"chunk {key[:8]}"):
+                if saved:
+                    found = extract_findings(parse_blocks(saved))
+                    next_finding_id = save_findings(findings_path, found, next_finding_id)
+                continue
+        idx += 1
 
-    total = len(chunks)
-    for idx, chunk in enumerate(chunks, start=1):
-        banner = f"\n[bold cyan]=== Chunk {idx}/{total} ({len(chunk.encode('utf-8'))//1024} KB) ===[/]\n"
+        banner = f"\n[bold cyan]=== Chunk {idx} ({len(chunk.encode('utf-8'))//1024} KB) ===[/]\n"
         print(banner)
 
-        response = inquire_lmstudio(chunk)
+        if journal is not None:
+            journal.start(key, f"chunk {idx}")
+        if sched is None:
+            response = inquire_lmstudio(chunk)
+        else:
+            started = time.perf_counter()
+            response = inquire_lmstudio(chunk, max_tokens=sched.max_tokens())
+            sched.record(time.perf_counter() - started, response, sched_job)
+        if journal is not None:
+            if response:
+                journal.finish(key, f"chunk {idx}", response)
+            else:
+                journal.fail(key, f"chunk {idx}")
         if response:
             render_with_rich(response)
             # Uncomment the following two lines if you also want the parsed view
             # blocks = parse_blocks(response)
             # render_with_rich(response, structured_blocks=blocks)
+            if findings_path:
+                found = extract_findings(parse_blocks(response), chunk=idx)
+                next_finding_id = save_findings(findings_path, found, next_finding_id)
+                print(f"[+] {len(found)} finding(s) from chunk {idx} appended to: {findings_path}")
         else:
             print("[-] No response received for this chunk.")
         print("-" * 80)
 
+    skipped = journal.skipped if journal is not None else 0
+    if idx == 0 and not skipped and not (sched is not None and len(sched)):
+        print("[-] No files matched – exiting.")
+
+    if sched is not None:
+        print(sched.report())
+        left = sched.save_pending(pending_path)
+        if left:
+            print(f"[!] {left} chunk(s) not analysed – saved to '{pending_path}' "
+                  f"(continue with --from-pending {pending_path})")
+
+    if optimizer is not None:
+        print(optimizer.stats.report())
+        if line_map_path:
+            with open(line_map_path, "w", encoding="utf-8") as f:
+                json.dump(optimizer.line_maps, f)
+            print(f"[+] Line maps (prompt line → original line) written to: {line_map_path}")
+
 
 # ------------------------------------------------------------
 # CLI handling (now includes optional instruction argument)
@@ -406,11 +535,151 @@ def parse_cli() -> argparse.Namespace:
             "and before the source files. Example: \"-i 'Also check for usage of eval().'\""
         ),
     )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help=(
+            "Append per-stage spans (OpenTelemetry-shaped JSON lines) to FILE. "
+            "The CTF_TRACE_FILE environment variable does the same."
+        ),
+    )
+    parser.add_argument(
+        "-x",
+        "--exclude",
+        nargs="+",
+        default=[],
+        metavar="GLOB",
+        help=(
+            "Extra gitignore‑style patterns to skip, on top of the defaults "
+            f"({' '.join(DEFAULT_EXCLUDES)}). Example: -x 'test/' '*.spec.js'"
+        ),
+    )
+    parser.add_argument(
+        "--no-default-excludes",
+        action="store_true",
+        help="Do not apply the built‑in exclude patterns (node_modules/, dist/, *.min.js …).",
+    )
+    parser.add_argument(
+        "--no-gitignore",
+        action="store_true",
+        help="Ignore .gitignore files found in the scanned tree.",
+    )
+    parser.add_argument(
+        "--rank",
+        action="store_true",
+        help=(
+            "Rank files by security relevance (sinks, sources, import centrality) so the "
+            "most interesting code is sent in the earliest chunks."
+        ),
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=None,
+        metavar="TOKENS",
+        help="Approximate input‑token budget; keeps the highest‑ranked files that fit (implies --rank).",
+    )
+    parser.add_argument(
+        "--group-deps",
+        action="store_true",
+        help=(
+            "Pack files connected by require/import/include edges into the same chunk "
+            "(JS/EJS built in, Python/PHP via parser plugins)."
+        ),
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help=(
+            "Replace exact duplicates with a 'same as X' reference and near duplicates "
+            "(MinHash) with a reference plus diff."
+        ),
+    )
+    parser.add_argument(
+        "--strip-comments",
+        action="store_true",
+        help="Strip comments, licence banners and blank lines (security‑relevant comments are kept).",
+    )
+    parser.add_argument(
+        "--line-map",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="With --strip-comments: write per‑file maps of prompt line → original line as JSON.",
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Send at most N chunks to the model.",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        metavar="SEC",
+        help=(
+            "Time budget in seconds: send chunks most relevant first (implies --rank), "
+            "shrink max_tokens near the deadline and save what is left to --pending."
+        ),
+    )
+    parser.add_argument(
+        "--pending",
+        type=str,
+        default=DEFAULT_PENDING_FILE,
+        metavar="FILE",
+        help=f"Where unfinished chunks are saved with --deadline (default: {DEFAULT_PENDING_FILE}).",
+    )
+    parser.add_argument(
+        "--from-pending",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Analyse the chunks saved by an earlier --deadline run instead of scanning the directory.",
+    )
+    parser.add_argument(
+        "--journal",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help=(
+            "Keep a job journal (JSON lines) recording every chunk and saving its reply next to it, "
+            "so that an interrupted run can be resumed (off by default)."
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Journal the run and continue an interrupted one: skip the chunks the journal marks "
+            f"as done.  Uses --journal, else {DEFAULT_JOURNAL_FILE}."
+        ),
+    )
+    parser.add_argument(
+        "--findings-out",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help=(
+            "Ask the model for a JSON list of findings and write them to FILE (JSON lines), "
+            "e.g. for 05_build_PoC.py --findings FILE."
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Number of file‑reader threads (default: {DEFAULT_WORKERS}).",
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_cli()
+    tracer.configure(args.trace)
 
     # Normalise extensions – ensure they all start with a dot and are lower‑cased.
     allowed_exts = {ext if ext.startswith(".") else f".{ext}" for ext in args.ext}
@@ -424,7 +693,33 @@ def main() -> None:
 
     print(f"\n🚀 Scan started at  {start_dt.strftime('%Y-%m-%d %H:%M:%S')}\n")
 
-    process_project(args.directory, allowed_exts, extra_instruction=args.instruction)
+    excludes = ([] if args.no_default_excludes else list(DEFAULT_EXCLUDES)) + args.exclude
+
+    if args.resume and args.journal is None:
+        args.journal = DEFAULT_JOURNAL_FILE
+    journal = JobJournal(args.journal, resume=args.resume) if args.journal else None
+    process_project(
+        args.directory,
+        allowed_exts,
+        extra_instruction=args.instruction,
+        excludes=excludes,
+        use_gitignore=not args.no_gitignore,
+        workers=args.workers,
+        rank=args.rank,
+        budget_tokens=args.budget,
+        max_requests=args.max_requests,
+        group_deps=args.group_deps,
+        dedupe=args.dedupe,
+        strip_comments=args.strip_comments,
+        line_map_path=args.line_map,
+        findings_path=args.findings_out,
+        deadline_s=args.deadline,
+        pending_path=args.pending,
+        from_pending=args.from_pending,
+        journal=journal,
+    )
+    if journal is not None:
+        journal.close()
 
     # ---- TIMING END ---------------------------------------------------
     end_dt   = datetime.now()
@@ -435,6 +730,7 @@ def main() -> None:
 
     print(f"\n✅ Scan finished at {end_dt.strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"⏱️  Total elapsed wall‑clock time: {elapsed_hms} ({elapsed_seconds:.2f}s)")
+    tracer.finish()
 
 
 if __name__ == "__main__":
@@ -14,25 +14,53 @@ Usage stays identical to the original script, with one extra optional argument:
     python analyse_all.py /path/to/project -e .js .ejs \
         -i "Also check for any usage of eval() and report possible XSS."
 
+Pipeline mode: instead of re‑sending the whole code base, generate one PoC per
+finding recorded by ``04_analyze_application.py --findings-out``.  Only the files a
+finding names are sent, findings are processed concurrently, and every PoC is
+written to its own file:
+
+    python 05_build_PoC.py /path/to/project --findings findings.jsonl \
+        --out-dir poc/ --concurrency 4
+
 """
 
 import os
+import json
+import asyncio
 import time
 from datetime import datetime
 import argparse
 from pathlib import Path
-from typing import Optional, List, Set, Tuple
+from typing import Iterable, Iterator, Optional, List, Set, Tuple
 
 # ------------------------------------------------------------
 # 3rd‑party imports (unchanged)
 # ------------------------------------------------------------
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from markdown_it import MarkdownIt
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.table import Table as RichTable
 from rich.syntax import Syntax
 
+# ------------------------------------------------------------
+# Local helpers shared by the script_AI tools
+# ------------------------------------------------------------
+from instrumentation import tracer, timed_chat_completion
+from concurrency_limiter import AdaptiveLimit, AsyncLimiter, async_limited_chat_completion
+from file_scanner import (
+    DEFAULT_EXCLUDES,
+    DEFAULT_WORKERS,
+    parallel_read,
+    read_source_file,
+    walk_source_files,
+)
+from file_ranking import print_ranking, rank_file_entries, select_within_budget
+from dependency_graph import count_cross_edges, pack_by_dependencies
+from payload_optimizer import PayloadOptimizer
+from prompt_chunks import iter_prompt_chunks, wrapped_size
+from findings import Finding, load_findings
+
 # ------------------------------------------------------------
 # Configuration – adjust to your environment / model limits
 # ------------------------------------------------------------
@@ -54,32 +82,29 @@ MAX_TOTAL_BYTES = 950_000               # leave room for the model’s response
 MAX_FILE_BYTES = 200_000                # per‑file cap – same as original script
 CHUNK_OVERLAP_BYTES = 2_000             # small overlap to keep context continuity
 
+# Pipeline mode (--findings): one targeted request per finding
+FINDING_PROLOGUE = (
+    "Please generate Proof-of-Concept code that demonstrates the following "
+    "vulnerability.  Only the files implicated by the finding are included."
+)
+DEFAULT_CONCURRENCY = 4                 # upper bound for parallel requests (adapted at run time)
+DEFAULT_POC_DIR = "poc"
+
 # ------------------------------------------------------------
 # Helper: read a file safely, honouring size limits and encoding fallbacks
 # ------------------------------------------------------------
+@tracer.timed("read_file")
 def _read_file_contents(filepath: str, max_bytes: int = MAX_FILE_BYTES) -> str:
     """
     Return the (possibly truncated) text of *filepath*.
 
-    - Only regular files are accepted.
+    - Only regular files are accepted; binary files (NUL bytes) are rejected.
     - Size is capped to ``max_bytes``; larger files are truncated.
     - UTF‑8 is tried first, then latin‑1 as a safe fallback.
+    - Large files are memory‑mapped and decoded in place; the returned string
+      carries its UTF‑8 size (``.nbytes``) so it is never re‑encoded to be measured.
     """
-    p = Path(filepath).expanduser().resolve(strict=True)
-
-    if not p.is_file():
-        raise ValueError(f"'{filepath}' is not a regular file.")
-
-    size = p.stat().st_size
-    truncate = size > max_bytes
-
-    with p.open("rb") as f:
-        raw = f.read(max_bytes) if truncate else f.read()
-
-    try:
-        return raw.decode("utf-8")
-    except UnicodeDecodeError:
-        return raw.decode("latin-1")
+    return read_source_file(filepath, max_bytes)
 
 
 # ------------------------------------------------------------
@@ -152,6 +177,7 @@ def parse_blocks(md_text: str):
     return blocks
 
 
+@tracer.timed("render_with_rich")
 def render_with_rich(md_text: str, structured_blocks=None):
     """
     Pretty‑print the model’s markdown reply using Rich.
@@ -195,97 +221,60 @@ def should_process(file_path: str, allowed_exts: Set[str]) -> bool:
     return ext.lower() in allowed_exts
 
 
-def collect_file_entries(root_dir: str, allowed_exts: Set[str]) -> List[Tuple[str, str]]:
+def collect_file_entries(
+    root_dir: str,
+    allowed_exts: Set[str],
+    excludes: Iterable[str] = DEFAULT_EXCLUDES,
+    use_gitignore: bool = True,
+    workers: int = DEFAULT_WORKERS,
+) -> Iterator[Tuple[str, str]]:
     """
-    Walk ``root_dir`` and return a list of tuples ``(relative_path, file_content)`` for
+    Walk ``root_dir`` and lazily yield tuples ``(relative_path, file_content)`` for
     every file whose extension is whitelisted.
 
+    * The ``os.scandir`` walk runs on a background thread and files are read on a
+      thread pool, so entries start flowing before the walk has finished.
+    * Directories / files matching ``excludes`` (gitignore‑style globs) or any
+      ``.gitignore`` in the tree are skipped without being entered.
+    * Entries are yielded in deterministic walk order.
+
     The relative path is calculated with respect to *root_dir* – this keeps the prompt
     readable even when the script is run from an arbitrary working directory.
     """
-    entries: List[Tuple[str, str]] = []
     root_path = Path(root_dir).expanduser().resolve(strict=True)
+    paths = walk_source_files(str(root_path), allowed_exts, excludes, use_gitignore)
 
-    for dirpath, _dirnames, filenames in os.walk(root_path):
-        for name in filenames:
-            full_path = os.path.join(dirpath, name)
-            if not should_process(full_path, allowed_exts):
-                continue
-
-            try:
-                print(f"[+] reading '{full_path}'")
-                content = _read_file_contents(full_path)
-            except Exception as exc:
-                print(f"[-] Could not read '{full_path}': {exc}")
-                continue
-
-            rel_path = os.path.relpath(full_path, start=root_path)
-            entries.append((rel_path, content))
-
-    return entries
+    for full_path, content, exc in parallel_read(paths, _read_file_contents, workers):
+        if exc is not None:
+            print(f"[-] Could not read '{full_path}': {exc}")
+            continue
+        print(f"[+] read '{full_path}'")
+        yield os.path.relpath(full_path, start=root_path), content
 
 
 def build_prompt_chunks(
-    file_entries: List[Tuple[str, str]],
+    file_entries: Iterable[Tuple[str, str]],
     max_total_bytes: int = MAX_TOTAL_BYTES,
     overlap_bytes: int = CHUNK_OVERLAP_BYTES,
-) -> List[str]:
+) -> Iterator[str]:
     """
-    Turn the list of ``(path, content)`` into one or more prompt strings that each
-    respect ``max_total_bytes``.
+    Turn the stream of ``(path, content)`` into one or more prompt strings that each
+    respect ``max_total_bytes``.  Chunks are yielded as soon as they are full, so the
+    first request can go out while later files are still being read.
 
-    The algorithm is simple:
+    The algorithm is simple (see ``prompt_chunks`` for the details):
 
     * Keep appending files (with a small header/footer wrapper) until adding the next
-      file would exceed the limit.
-    * When the limit is reached, start a new chunk.  The first ``overlap_bytes`` of the
-      previous chunk are copied to the front of the new one – this helps the model keep
-      context across chunk boundaries.
-
-    Returns a list of ready‑to‑send prompt strings **without** the fixed prologue.
+      file would exceed the limit – sizes are tracked in UTF‑8 bytes per file, and
+      each chunk is joined only once.
+    * When the limit is reached, start a new chunk.  Up to ``overlap_bytes`` from the
+      end of the previous chunk, cut on a file or line boundary, are copied to the
+      front of the new one – this helps the model keep context across chunk boundaries.
+    * A file that alone exceeds the limit is truncated by bytes.
+
+    Yields ready‑to‑send prompt strings **without** the fixed prologue.
     """
-    chunks: List[str] = []
-    current_parts: List[str] = []
-    current_size = 0
-
-    def flush_current():
-        nonlocal current_parts, current_size
-        if current_parts:
-            chunks.append("\n".join(current_parts))
-            # keep overlap for next chunk
-            overlap_text = "\n".join(current_parts)[-overlap_bytes:]
-            current_parts = [overlap_text] if overlap_text else []
-            current_size = len(overlap_text.encode("utf-8"))
-        else:
-            current_parts = []
-            current_size = 0
-
-    for rel_path, content in file_entries:
-        # Build a small wrapper that makes the prompt self‑documenting
-        wrapped = (
-            f"\n--- BEGIN FILE: {rel_path} ---\n"
-            f"{content}\n"
-            f"--- END FILE: {rel_path} ---\n"
-        )
-        wrapped_bytes = len(wrapped.encode("utf-8"))
-
-        # If a single file alone exceeds the per‑chunk limit, we truncate it
-        if wrapped_bytes > max_total_bytes:
-            truncated = wrapped[:max_total_bytes]
-            print(f"[!] File '{rel_path}' is larger than the chunk size – truncating.")
-            wrapped = truncated
-            wrapped_bytes = len(wrapped.encode("utf-8"))
-
-        # Does adding this file overflow the current chunk?
-        if current_size + wrapped_bytes > max_total_bytes:
-            flush_current()
-
-        current_parts.append(wrapped)
-        current_size += wrapped_bytes
-
-    # finalise last chunk
-    flush_current()
-    return chunks
+    return iter_prompt_chunks(file_entries, max_total_bytes, overlap_bytes)
 
 
 def _assemble_full_prompt(
@@ -317,50 +306,108 @@ def inquire_lmstudio(prompt: str) -> Optional[str]:
     Send a *single* prompt (which may contain many files) to the LM‑Studio server.
     Returns the assistant’s reply text or ``None`` on error.
     """
-    try:
-        completion = client.chat.completions.create(
-            model="default",                     # change if you have a named model
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user",   "content": prompt},
-            ],
-            max_tokens=131072,                     # adjust according to your model
-            temperature=0.2,                    # low temp for more deterministic analysis
-        )
-        return completion.choices[0].message.content
-    except Exception as e:
-        print(f"[!] OpenAI request failed: {e}")
-        return None
+    with tracer.span("inquire_lmstudio", prompt_bytes=len(prompt.encode("utf-8"))) as sp:
+        try:
+            return timed_chat_completion(
+                client,
+                model="default",                     # change if you have a named model
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user",   "content": prompt},
+                ],
+                max_tokens=131072,                     # adjust according to your model
+                temperature=0.2,                    # low temp for more deterministic analysis
+            )
+        except Exception as e:
+            sp.status = "ERROR"
+            print(f"[!] OpenAI request failed: {e}")
+            return None
 
 
 def process_project(
     root_dir: str,
     allowed_exts: Set[str],
     extra_instruction: Optional[str] = None,
+    excludes: Iterable[str] = DEFAULT_EXCLUDES,
+    use_gitignore: bool = True,
+    workers: int = DEFAULT_WORKERS,
+    rank: bool = False,
+    budget_tokens: Optional[int] = None,
+    max_requests: Optional[int] = None,
+    group_deps: bool = False,
+    dedupe: bool = False,
+    strip_comments: bool = False,
+    line_map_path: Optional[str] = None,
 ) -> None:
     """
-    Orchestrates the whole workflow:
-
-    1. Collect all matching files.
-    2. Split them into size‑limited chunks.
-    3. Prepend the fixed prologue (and optional instruction) to each chunk.
-    4. Send each chunk to the model and render the answer.
+    Orchestrates the whole workflow as a stream:
+
+    1. Collect matching files (walk + reads run in the background).
+    2. Optionally rank them by security relevance and trim them to ``budget_tokens``
+       (this waits for the full scan, since ranking needs every file).
+    3. Split them into size‑limited chunks as they arrive – or, with ``group_deps``,
+       pack files connected by require/import/include edges into the same chunk.
+       Duplicates are replaced by references and comments / blank lines stripped
+       in this final send order, so the copy sent in full is the highest‑ranked
+       one and always precedes its references.
+    4. Prepend the fixed prologue (and optional instruction) to each chunk.
+    5. Send each chunk to the model and render the answer – without ranking the first
+       chunk goes out while the rest of the tree is still being read.  At most
+       ``max_requests`` chunks are sent.
     """
     print(f"🔎 Scanning '{root_dir}' for extensions: {', '.join(sorted(allowed_exts))}")
 
-    file_entries = collect_file_entries(root_dir, allowed_exts)
-    if not file_entries:
-        print("[-] No files matched – exiting.")
-        return
-
-    raw_chunks = build_prompt_chunks(file_entries)
-
-    # Add the prologue / optional instruction **once per chunk**
-    chunks = [_assemble_full_prompt(c, extra_instruction) for c in raw_chunks]
+    file_entries = collect_file_entries(
+        root_dir, allowed_exts, excludes=excludes, use_gitignore=use_gitignore, workers=workers
+    )
 
-    total = len(chunks)
-    for idx, chunk in enumerate(chunks, start=1):
-        banner = f"\n[bold cyan]=== Chunk {idx}/{total} ({len(chunk.encode('utf-8'))//1024} KB) ===[/]\n"
+    optimizer = PayloadOptimizer(dedupe=dedupe, strip=strip_comments) if dedupe or strip_comments else None
+
+    scores = None
+    if rank or budget_tokens:
+        with tracer.span("rank_file_entries") as sp:
+            ranked, scores = rank_file_entries(file_entries)
+            sp.set("files", len(ranked))
+        print_ranking(scores)
+        file_entries, scores = select_within_budget(ranked, scores, budget_tokens)
+        if budget_tokens:
+            print(f"[+] Token budget {budget_tokens}: keeping {len(scores)}/{len(ranked)} file(s), "
+                  f"~{sum(fs.est_tokens for fs in scores)} tokens")
+
+    if group_deps:
+        # Ranking, budget and the import graph all see the original contents
+        with tracer.span("pack_by_dependencies") as sp:
+            file_entries = list(file_entries)
+            bins = pack_by_dependencies(
+                file_entries,
+                MAX_TOTAL_BYTES,
+                size_of=lambda e: wrapped_size(*e) + 1,
+                priority=[fs.score for fs in scores] if scores else None,
+            )
+            inside, crossing = count_cross_edges(bins)
+            sp.set("bins", len(bins))
+        print(f"[+] Dependency packing: {len(file_entries)} file(s) in {len(bins)} chunk(s), "
+              f"{inside} import edge(s) kept together, {crossing} split")
+        if optimizer is not None:
+            bins = [list(optimizer.process(b)) for b in bins]     # only shrinks – bins still fit
+        # Each bin already fits – no overlap needed between independent clusters
+        raw_chunks = (c for b in bins for c in build_prompt_chunks(b, overlap_bytes=0))
+    else:
+        if optimizer is not None:
+            file_entries = optimizer.process(file_entries)
+        raw_chunks = build_prompt_chunks(file_entries)
+
+    idx = 0
+    while max_requests is None or idx < max_requests:
+        with tracer.span("build_prompt_chunks"):
+            raw_chunk = next(raw_chunks, None)
+        if raw_chunk is None:
+            break
+        idx += 1
+
+        # Add the prologue / optional instruction **once per chunk**
+        chunk = _assemble_full_prompt(raw_chunk, extra_instruction)
+        banner = f"\n[bold cyan]=== Chunk {idx} ({len(chunk.encode('utf-8'))//1024} KB) ===[/]\n"
         print(banner)
 
         response = inquire_lmstudio(chunk)
@@ -373,6 +420,184 @@ def process_project(
             print("[-] No response received for this chunk.")
         print("-" * 80)
 
+    if idx == 0:
+        print("[-] No files matched – exiting.")
+
+    if optimizer is not None:
+        print(optimizer.stats.report())
+        if line_map_path:
+            with open(line_map_path, "w", encoding="utf-8") as f:
+                json.dump(optimizer.line_maps, f)
+            print(f"[+] Line maps (prompt line → original line) written to: {line_map_path}")
+
+
+# ------------------------------------------------------------
+# Pipeline mode – targeted PoC generation from recorded findings
+# ------------------------------------------------------------
+def _finding_file_entries(
+    root_path: Path,
+    finding: Finding,
+    file_cache: dict,
+    find_by_name,
+) -> List[Tuple[str, str]]:
+    """
+    Read the files named by ``finding`` (relative to ``root_path``).  Paths the
+    model got slightly wrong are looked up by basename; paths escaping the root
+    are ignored.  ``file_cache`` is shared between findings.
+    """
+    entries = []
+    for rel in finding.files:
+        full = (root_path / rel.lstrip("/")).resolve()
+        if root_path not in full.parents or not full.is_file():
+            candidates = find_by_name(os.path.basename(rel))
+            if not candidates:
+                print(f"[-] Finding {finding.id}: file '{rel}' not found under '{root_path}'")
+                continue
+            full = candidates[0]
+        rel_path = os.path.relpath(full, start=root_path)
+        if rel_path not in file_cache:
+            try:
+                file_cache[rel_path] = _read_file_contents(str(full))
+            except Exception as e:
+                print(f"[-] Could not read '{full}': {e}")
+                file_cache[rel_path] = None
+        if file_cache[rel_path] is not None:
+            entries.append((rel_path, file_cache[rel_path]))
+    return entries
+
+
+def _assemble_finding_prompt(
+    finding: Finding,
+    entries: List[Tuple[str, str]],
+    extra_instruction: Optional[str] = None,
+) -> str:
+    """Prologue + finding + the implicated files (cut to ``MAX_TOTAL_BYTES``)."""
+    parts = [FINDING_PROLOGUE]
+    if extra_instruction:
+        parts.append(extra_instruction.strip())
+    parts += ["", finding.as_prompt(), ""]
+
+    chunks = build_prompt_chunks(entries, overlap_bytes=0)
+    body = next(chunks, "")
+    if next(chunks, None) is not None:
+        print(f"[!] Finding {finding.id}: implicated files exceed the chunk size – "
+              f"only the first chunk is sent.")
+    parts.append(body)
+    return "\n".join(parts)
+
+
+async def _generate_poc(
+    aclient: AsyncOpenAI,
+    limiter: AsyncLimiter,
+    finding: Finding,
+    prompt: str,
+    out_dir: Path,
+) -> Optional[Path]:
+    """Send one finding to the model and write the reply to its own Markdown file."""
+    with tracer.span("generate_poc", finding=finding.id,
+                     prompt_bytes=len(prompt.encode("utf-8"))) as sp:
+        try:
+            response = await async_limited_chat_completion(
+                limiter,
+                aclient,
+                model="default",
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user",   "content": prompt},
+                ],
+                max_tokens=16384,
+                temperature=0.2,
+            )
+        except Exception as e:
+            sp.status = "ERROR"
+            print(f"[!] Finding {finding.id}: OpenAI request failed: {e}")
+            return None
+
+    if not response:
+        print(f"[-] Finding {finding.id}: no response received.")
+        return None
+
+    out_path = out_dir / f"poc_{finding.id:03d}_{finding.slug}.md"
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(f"# PoC for finding {finding.id}: {finding.title}\n\n")
+        f.write(f"```text\n{finding.as_prompt()}\n```\n\n")
+        f.write(response)
+    print(f"[+] Finding {finding.id} ({finding.severity}): PoC written to '{out_path}'")
+    return out_path
+
+
+async def _run_findings(
+    jobs: List[Tuple[Finding, str]],
+    out_dir: Path,
+    concurrency: int,
+) -> List[Optional[Path]]:
+    aclient = AsyncOpenAI(base_url=str(client.base_url), api_key=client.api_key)
+    # Start small and let latency / 429s decide how close to ``concurrency`` we get
+    limiter = AsyncLimiter(AdaptiveLimit(initial=min(2, concurrency), max_limit=max(1, concurrency)))
+    try:
+        return await asyncio.gather(
+            *(_generate_poc(aclient, limiter, f, p, out_dir) for f, p in jobs)
+        )
+    finally:
+        await aclient.close()
+        print(limiter.limit.report())
+
+
+def process_findings(
+    root_dir: str,
+    findings_path: str,
+    allowed_exts: Set[str],
+    out_dir: str = DEFAULT_POC_DIR,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    extra_instruction: Optional[str] = None,
+    max_requests: Optional[int] = None,
+    excludes: Iterable[str] = DEFAULT_EXCLUDES,
+    use_gitignore: bool = True,
+) -> None:
+    """
+    Pipeline mode:
+
+    1. Load the findings of a previous ``04_analyze_application.py --findings-out``
+       run (most severe first, at most ``max_requests``).
+    2. For each finding read only the files it names.
+    3. Send findings to the model concurrently – at most ``concurrency`` at once, fewer
+       while the adaptive limiter sees rising latency or 429/503 – and write every
+       PoC to ``out_dir/poc_<id>_<title>.md``.
+    """
+    root_path = Path(root_dir).expanduser().resolve(strict=True)
+    findings = load_findings(findings_path)
+    if max_requests is not None:
+        findings = findings[:max_requests]
+    if not findings:
+        print(f"[-] No findings in '{findings_path}' – exiting.")
+        return
+    print(f"[+] {len(findings)} finding(s) loaded from '{findings_path}'")
+
+    by_name = None
+
+    def find_by_name(name: str) -> List[Path]:
+        nonlocal by_name
+        if by_name is None:                 # only walk the tree if a path needs fixing
+            by_name = {}
+            for full in walk_source_files(str(root_path), allowed_exts, excludes, use_gitignore):
+                by_name.setdefault(os.path.basename(full), []).append(Path(full))
+        return by_name.get(name, [])
+
+    file_cache: dict = {}
+    jobs = []
+    with tracer.span("assemble_finding_prompts", findings=len(findings)):
+        for finding in findings:
+            entries = _finding_file_entries(root_path, finding, file_cache, find_by_name)
+            if not entries:
+                print(f"[-] Finding {finding.id}: none of its files could be read – skipped.")
+                continue
+            jobs.append((finding, _assemble_finding_prompt(finding, entries, extra_instruction)))
+
+    out_path = Path(out_dir)
+    out_path.mkdir(parents=True, exist_ok=True)
+    written = asyncio.run(_run_findings(jobs, out_path, concurrency))
+    print(f"[+] {sum(p is not None for p in written)}/{len(findings)} PoC(s) written to '{out_path}'")
+
 
 # ------------------------------------------------------------
 # CLI handling (now includes optional instruction argument)
@@ -406,11 +631,126 @@ def parse_cli() -> argparse.Namespace:
             "and before the source files. Example: \"-i 'Also check for usage of eval().'\""
         ),
     )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help=(
+            "Append per-stage spans (OpenTelemetry-shaped JSON lines) to FILE. "
+            "The CTF_TRACE_FILE environment variable does the same."
+        ),
+    )
+    parser.add_argument(
+        "-x",
+        "--exclude",
+        nargs="+",
+        default=[],
+        metavar="GLOB",
+        help=(
+            "Extra gitignore‑style patterns to skip, on top of the defaults "
+            f"({' '.join(DEFAULT_EXCLUDES)}). Example: -x 'test/' '*.spec.js'"
+        ),
+    )
+    parser.add_argument(
+        "--no-default-excludes",
+        action="store_true",
+        help="Do not apply the built‑in exclude patterns (node_modules/, dist/, *.min.js …).",
+    )
+    parser.add_argument(
+        "--no-gitignore",
+        action="store_true",
+        help="Ignore .gitignore files found in the scanned tree.",
+    )
+    parser.add_argument(
+        "--rank",
+        action="store_true",
+        help=(
+            "Rank files by security relevance (sinks, sources, import centrality) so the "
+            "most interesting code is sent in the earliest chunks."
+        ),
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=None,
+        metavar="TOKENS",
+        help="Approximate input‑token budget; keeps the highest‑ranked files that fit (implies --rank).",
+    )
+    parser.add_argument(
+        "--group-deps",
+        action="store_true",
+        help=(
+            "Pack files connected by require/import/include edges into the same chunk "
+            "(JS/EJS built in, Python/PHP via parser plugins)."
+        ),
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help=(
+            "Replace exact duplicates with a 'same as X' reference and near duplicates "
+            "(MinHash) with a reference plus diff."
+        ),
+    )
+    parser.add_argument(
+        "--strip-comments",
+        action="store_true",
+        help="Strip comments, licence banners and blank lines (security‑relevant comments are kept).",
+    )
+    parser.add_argument(
+        "--line-map",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="With --strip-comments: write per‑file maps of prompt line → original line as JSON.",
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Send at most N chunks to the model.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Number of file‑reader threads (default: {DEFAULT_WORKERS}).",
+    )
+    parser.add_argument(
+        "--findings",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help=(
+            "Pipeline mode: generate one PoC per finding in FILE (written by "
+            "04_analyze_application.py --findings-out), sending only the implicated files."
+        ),
+    )
+    parser.add_argument(
+        "--out-dir",
+        type=str,
+        default=DEFAULT_POC_DIR,
+        metavar="DIR",
+        help=f"With --findings: directory for the PoC files (default: {DEFAULT_POC_DIR}).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        metavar="N",
+        help=(
+            f"With --findings: maximum number of findings processed in parallel; the actual "
+            f"number adapts to the server's latency (default: {DEFAULT_CONCURRENCY})."
+        ),
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_cli()
+    tracer.configure(args.trace)
 
     # Normalise extensions – ensure they all start with a dot and are lower‑cased.
     allowed_exts = {ext if ext.startswith(".") else f".{ext}" for ext in args.ext}
@@ -424,7 +764,36 @@ def main() -> None:
 
     print(f"\n🚀 Scan started at  {start_dt.strftime('%Y-%m-%d %H:%M:%S')}\n")
 
-    process_project(args.directory, allowed_exts, extra_instruction=args.instruction)
+    excludes = ([] if args.no_default_excludes else list(DEFAULT_EXCLUDES)) + args.exclude
+
+    if args.findings:
+        process_findings(
+            args.directory,
+            args.findings,
+            allowed_exts,
+            out_dir=args.out_dir,
+            concurrency=args.concurrency,
+            extra_instruction=args.instruction,
+            max_requests=args.max_requests,
+            excludes=excludes,
+            use_gitignore=not args.no_gitignore,
+        )
+    else:
+        process_project(
+            args.directory,
+            allowed_exts,
+            extra_instruction=args.instruction,
+            excludes=excludes,
+            use_gitignore=not args.no_gitignore,
+            workers=args.workers,
+            rank=args.rank,
+            budget_tokens=args.budget,
+            max_requests=args.max_requests,
+            group_deps=args.group_deps,
+            dedupe=args.dedupe,
+            strip_comments=args.strip_comments,
+            line_map_path=args.line_map,
+        )
 
     # ---- TIMING END ---------------------------------------------------
     end_dt   = datetime.now()
@@ -435,6 +804,7 @@ def main() -> None:
 
     print(f"\n✅ Scan finished at {end_dt.strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"⏱️  Total elapsed wall‑clock time: {elapsed_hms} ({elapsed_seconds:.2f}s)")
+    tracer.finish()
 
 
 if __name__ == "__main__":
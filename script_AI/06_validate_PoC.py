@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+PoC validation harness.
+
+Takes the Markdown PoC files written by ``05_build_PoC.py --findings`` (or any
+Markdown reply), extracts their code fences with ``parse_blocks`` and runs every
+runnable block in its own throw‑away sandbox against a local target – e.g. the
+``playground_node_js`` container serving the application on port 3000.
+
+A PoC *passes* when its output contains a flag (``FLAG_[0-9a-zA-Z]+`` by default),
+even if it then hangs until the timeout.
+It *fails* when it ran but found none, and is an *error* when it could not run
+at all (missing interpreter, exit status 126 / 127, docker failure).
+Status, latency and captured flags are recorded per block:
+
+    python 06_validate_PoC.py poc/ --target http://127.0.0.1:3000 \\
+        --concurrency 4 --timeout 30 --results results.jsonl
+
+Sandboxes:
+
+* ``docker`` (default) – ``docker run --rm`` of ``--image`` with the PoC mounted
+  read‑only, no capabilities, memory / PID limits and host networking so the
+  target on localhost is reachable.  The default image ``ctf_poc_runner``
+  (``poc_runner/build_docker.sh``) provides python3, curl and node;
+  ``playground_node_js`` only serves the target and has neither python3 nor curl.
+* ``local`` – a subprocess in a temporary directory (for quick iteration only).
+
+The target URL is passed to every PoC as its first argument and as the
+``TARGET`` / ``TARGET_URL`` / ``TARGET_HOST`` / ``TARGET_PORT`` environment variables.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import socket
+import shutil
+import signal
+import asyncio
+import argparse
+import tempfile
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# ------------------------------------------------------------
+# 3rd‑party imports
+# ------------------------------------------------------------
+from markdown_it import MarkdownIt
+from rich.console import Console
+from rich.table import Table as RichTable
+
+# ------------------------------------------------------------
+# Local helpers shared by the script_AI tools
+# ------------------------------------------------------------
+from instrumentation import tracer
+
+# ------------------------------------------------------------
+# Configuration – adjust to your environment
+# ------------------------------------------------------------
+FLAG_REGEX = r"FLAG_[0-9a-zA-Z]+"
+DEFAULT_TARGET = "http://127.0.0.1:3000"
+DEFAULT_IMAGE = "ctf_poc_runner"        # built by poc_runner/build_docker.sh
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 30.0                  # seconds per PoC
+TARGET_WAIT = 15.0                      # seconds to wait for the target port
+OUTPUT_LIMIT = 1_000_000                # bytes of stdout / stderr kept per PoC
+
+# The PoC never ran: docker failed (125), not executable (126), not found (127)
+NOT_RUN_EXIT_CODES = (125, 126, 127)
+NOT_RUN_RE = re.compile(
+    r"(?i)command not found|executable file not found in \$PATH|\b(?:python3?|node|bash|sh|curl): not found|"
+    r"unable to find image|OCI runtime (?:create|exec) failed"
+)
+
+# fence info string → (file suffix, interpreter command)
+RUNNERS: Dict[str, Tuple[str, List[str]]] = {
+    "bash":       (".sh", ["bash"]),
+    "sh":         (".sh", ["sh"]),
+    "shell":      (".sh", ["bash"]),
+    "console":    (".sh", ["bash"]),
+    "python":     (".py", ["python3"]),
+    "py":         (".py", ["python3"]),
+    "python3":    (".py", ["python3"]),
+    "javascript": (".js", ["node"]),
+    "js":         (".js", ["node"]),
+    "node":       (".js", ["node"]),
+    "nodejs":     (".js", ["node"]),
+}
+
+
+# ------------------------------------------------------------
+# Markdown parsing helper (same as in the analysis scripts)
+# ------------------------------------------------------------
+def parse_blocks(md_text: str):
+    """Parse a markdown string into an ordered list of paragraph / code / table blocks."""
+    md = MarkdownIt().enable("table")
+    tokens = md.parse(md_text)
+
+    blocks = []
+    i = 0
+    while i < len(tokens):
+        t = tokens[i]
+
+        # Paragraph -------------------------------------------------------
+        if t.type == "paragraph_open":
+            content = ""
+            j = i + 1
+            while j < len(tokens) and tokens[j].type != "paragraph_close":
+                if tokens[j].type == "inline":
+                    content += tokens[j].content
+                j += 1
+            blocks.append({"type": "paragraph", "text": content.strip()})
+            i = j + 1
+            continue
+
+        # Fenced code ------------------------------------------------------
+        if t.type == "fence":
+            blocks.append(
+                {
+                    "type": "code",
+                    "info": t.info,
+                    "text": t.content,
+                }
+            )
+            i += 1
+            continue
+
+        # Table ------------------------------------------------------------
+        if t.type == "table_open":
+            rows = []
+            i += 1
+            while i < len(tokens) and tokens[i].type != "table_close":
+                if tokens[i].type == "tr_open":
+                    cells = []
+                    i += 1
+                    while i < len(tokens) and tokens[i].type != "tr_close":
+                        if tokens[i].type in ("th_open", "td_open"):
+                            j = i + 1
+                            txt = ""
+                            while j < len(tokens) and tokens[j].type != "inline":
+                                j += 1
+                            if j < len(tokens):
+                                txt = tokens[j].content.strip()
+                            cells.append(txt)
+                        i += 1
+                    rows.append(cells)
+                else:
+                    i += 1
+            blocks.append({"type": "table", "rows": rows})
+            while i < len(tokens) and tokens[i].type != "table_close":
+                i += 1
+            i += 1
+            continue
+
+        # Anything else – just move on ------------------------------------
+        i += 1
+
+    return blocks
+
+
+# ------------------------------------------------------------
+# PoC extraction
+# ------------------------------------------------------------
+@dataclass
+class PocBlock:
+    source: str                         # Markdown file the block came from
+    index: int                          # position among the file's code blocks
+    lang: str
+    code: str
+
+    @property
+    def name(self) -> str:
+        return f"{Path(self.source).name}#{self.index}"
+
+
+@dataclass
+class PocResult:
+    poc: str
+    lang: str
+    status: str                         # pass / fail / timeout / error
+    latency_s: float
+    flags: List[str] = field(default_factory=list)
+    returncode: Optional[int] = None
+    output_tail: str = ""
+
+
+def extract_poc_blocks(md_path: Path) -> List[PocBlock]:
+    """Return the runnable code fences of one Markdown file (``RUNNERS`` decides)."""
+    text = md_path.read_text(encoding="utf-8", errors="replace")
+    pocs = []
+    code_blocks = [b for b in parse_blocks(text) if b["type"] == "code"]
+    for i, blk in enumerate(code_blocks, start=1):
+        lang = (blk["info"] or "").split()[0].lower() if blk["info"] else ""
+        if lang in RUNNERS and blk["text"].strip():
+            pocs.append(PocBlock(str(md_path), i, lang, blk["text"]))
+    return pocs
+
+
+def collect_pocs(paths: List[str]) -> List[PocBlock]:
+    """Expand files / directories (``*.md``) into PoC blocks, in sorted order."""
+    pocs: List[PocBlock] = []
+    for p in paths:
+        path = Path(p)
+        files = sorted(path.glob("*.md")) if path.is_dir() else [path]
+        for f in files:
+            try:
+                pocs.extend(extract_poc_blocks(f))
+            except OSError as e:
+                print(f"[-] Could not read '{f}': {e}")
+    return pocs
+
+
+# ------------------------------------------------------------
+# Sandboxed execution
+# ------------------------------------------------------------
+def _target_env(target: str) -> Dict[str, str]:
+    u = urlparse(target)
+    return {
+        "TARGET": target,
+        "TARGET_URL": target,
+        "TARGET_HOST": u.hostname or "",
+        "TARGET_PORT": str(u.port or (443 if u.scheme == "https" else 80)),
+    }
+
+
+def wait_for_target(target: str, timeout: float = TARGET_WAIT) -> bool:
+    """Poll the target's TCP port until it accepts connections (or ``timeout``)."""
+    env = _target_env(target)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection((env["TARGET_HOST"], int(env["TARGET_PORT"])), timeout=1.0):
+                return True
+        except OSError:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.5)
+
+
+def _sandbox_command(
+    sandbox: str,
+    poc_file: Path,
+    interpreter: List[str],
+    target: str,
+    image: str,
+    container_name: str,
+) -> List[str]:
+    if sandbox == "local":
+        return interpreter + [str(poc_file), target]
+
+    cmd = [
+        "docker", "run", "--rm", "-i",
+        "--name", container_name,
+        "--network", "host",            # reach the target on localhost
+        "--cap-drop", "ALL",
+        "--security-opt", "no-new-privileges",
+        "--memory", "256m",
+        "--pids-limit", "128",
+        "--read-only", "--tmpfs", "/tmp",
+        "-v", f"{poc_file.parent}:/poc:ro",
+        "-w", "/tmp",
+    ]
+    for key, value in _target_env(target).items():
+        cmd += ["-e", f"{key}={value}"]
+    return cmd + [image] + interpreter + [f"/poc/{poc_file.name}", target]
+
+
+async def _collect_output(proc: asyncio.subprocess.Process, buf: bytearray) -> None:
+    """Append ``proc``'s output to ``buf`` as it arrives (last ``OUTPUT_LIMIT`` bytes kept)."""
+    while True:
+        chunk = await proc.stdout.read(65536)
+        if not chunk:
+            break
+        buf.extend(chunk)
+        if len(buf) > 2 * OUTPUT_LIMIT:
+            del buf[:-OUTPUT_LIMIT]
+    await proc.wait()
+
+
+async def run_poc(
+    poc: PocBlock,
+    semaphore: asyncio.Semaphore,
+    target: str,
+    flag_re: re.Pattern,
+    sandbox: str = "docker",
+    image: str = DEFAULT_IMAGE,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> PocResult:
+    """Run one PoC in a fresh sandbox and classify the outcome."""
+    suffix, interpreter = RUNNERS[poc.lang]
+    async with semaphore:
+        workdir = Path(tempfile.mkdtemp(prefix="poc_"))
+        os.chmod(workdir, 0o755)
+        poc_file = workdir / f"poc{suffix}"
+        poc_file.write_text(poc.code, encoding="utf-8")
+        os.chmod(poc_file, 0o644)
+        container_name = f"poc_{uuid.uuid4().hex[:12]}"
+        cmd = _sandbox_command(sandbox, poc_file, interpreter, target, image, container_name)
+
+        with tracer.span("run_poc", poc=poc.name, lang=poc.lang) as sp:
+            started = time.perf_counter()
+            proc = None
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT,
+                    cwd=str(workdir),
+                    env={**os.environ, **_target_env(target)},
+                    start_new_session=True,     # own process group – killed as a whole
+                )
+                buf = bytearray()
+                timed_out = False
+                try:
+                    await asyncio.wait_for(_collect_output(proc, buf), timeout=timeout)
+                except asyncio.TimeoutError:
+                    timed_out = True        # a flag printed before the hang still counts
+                output = bytes(buf[-OUTPUT_LIMIT:]).decode("utf-8", "replace")
+                flags = sorted(set(flag_re.findall(output)))
+                not_run = not timed_out and (proc.returncode in NOT_RUN_EXIT_CODES or (
+                    proc.returncode != 0 and NOT_RUN_RE.search(output[:2000]) is not None))
+                result = PocResult(
+                    poc=poc.name, lang=poc.lang,
+                    status="pass" if flags else "timeout" if timed_out else "error" if not_run else "fail",
+                    latency_s=round(time.perf_counter() - started, 3),
+                    flags=flags, returncode=proc.returncode,
+                    output_tail=output[-400:],
+                )
+            except OSError as e:
+                result = PocResult(poc.name, poc.lang, "error",
+                                   round(time.perf_counter() - started, 3), output_tail=str(e))
+            finally:
+                if proc is not None and proc.returncode is None:
+                    try:
+                        os.killpg(proc.pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                    await proc.wait()
+                    if sandbox == "docker":    # killing the client does not stop the container
+                        killer = await asyncio.create_subprocess_exec(
+                            "docker", "rm", "-f", container_name,
+                            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+                        )
+                        await killer.wait()
+                shutil.rmtree(workdir, ignore_errors=True)
+            sp.set("status", result.status)
+            if result.status in ("timeout", "error"):
+                sp.status = "ERROR"
+
+    mark = "[+]" if result.status == "pass" else "[-]"
+    flags = f"  {', '.join(result.flags)}" if result.flags else ""
+    print(f"{mark} {poc.name} ({poc.lang}): {result.status} in {result.latency_s:.2f}s{flags}")
+    return result
+
+
+async def validate_pocs(
+    pocs: List[PocBlock],
+    target: str,
+    flag_regex: str = FLAG_REGEX,
+    sandbox: str = "docker",
+    image: str = DEFAULT_IMAGE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> List[PocResult]:
+    """Run all PoCs with at most ``concurrency`` sandboxes alive at a time."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    flag_re = re.compile(flag_regex)
+    return await asyncio.gather(*(
+        run_poc(p, semaphore, target, flag_re, sandbox=sandbox, image=image, timeout=timeout)
+        for p in pocs
+    ))
+
+
+def print_results(results: List[PocResult]) -> None:
+    """Per‑PoC table plus a one‑line pass rate."""
+    rt = RichTable(title="PoC validation", show_header=True, header_style="bold magenta")
+    for col in ("PoC", "lang", "status", "latency s", "flags"):
+        rt.add_column(col, justify="right" if col == "latency s" else "left")
+    colour = {"pass": "green", "fail": "yellow", "timeout": "red", "error": "red"}
+    for r in results:
+        rt.add_row(r.poc, r.lang, f"[{colour[r.status]}]{r.status}[/]",
+                   f"{r.latency_s:.2f}", ", ".join(r.flags))
+    console = Console()
+    console.print(rt)
+    passed = sum(r.status == "pass" for r in results)
+    console.print(f"[bold]{passed}/{len(results)} PoC(s) captured a flag[/]")
+
+
+# ------------------------------------------------------------
+# CLI handling
+# ------------------------------------------------------------
+def parse_cli() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run generated PoCs in sandboxes against a local target and check for flags."
+    )
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        help="PoC Markdown files or directories containing them (e.g. the 05_build_PoC.py --out-dir).",
+    )
+    parser.add_argument(
+        "-t",
+        "--target",
+        default=DEFAULT_TARGET,
+        help=f"Base URL of the target service (default: {DEFAULT_TARGET}).",
+    )
+    parser.add_argument(
+        "--flag-regex",
+        default=FLAG_REGEX,
+        help=f"Regex that marks a successful exploit (default: {FLAG_REGEX}).",
+    )
+    parser.add_argument(
+        "--sandbox",
+        choices=("docker", "local"),
+        default="docker",
+        help="Run each PoC in a throw‑away container (default) or a local subprocess.",
+    )
+    parser.add_argument(
+        "--image",
+        default=DEFAULT_IMAGE,
+        help=f"Container image providing the interpreters (default: {DEFAULT_IMAGE}).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        metavar="N",
+        help=f"Number of sandboxes running at the same time (default: {DEFAULT_CONCURRENCY}).",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        metavar="SEC",
+        help=f"Per‑PoC timeout in seconds (default: {DEFAULT_TIMEOUT:g}).",
+    )
+    parser.add_argument(
+        "--results",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Append one JSON line per PoC (status, latency, flags) to FILE.",
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help=(
+            "Append per-stage spans (OpenTelemetry-shaped JSON lines) to FILE. "
+            "The CTF_TRACE_FILE environment variable does the same."
+        ),
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_cli()
+    tracer.configure(args.trace)
+
+    pocs = collect_pocs(args.paths)
+    if not pocs:
+        print("[-] No runnable code blocks found – exiting.")
+        return
+    print(f"[+] {len(pocs)} runnable PoC block(s) found")
+
+    if args.sandbox == "docker" and shutil.which("docker") is None:
+        print("[!] docker not found – use --sandbox local or install Docker.")
+        return
+    if not wait_for_target(args.target):
+        print(f"[!] Target {args.target} is not reachable – is the container running?")
+        return
+
+    # ---- TIMING START -------------------------------------------------
+    start_dt   = datetime.now()
+    start_perf = time.perf_counter()
+    print(f"\n🚀 Validation started at  {start_dt.strftime('%Y-%m-%d %H:%M:%S')}\n")
+
+    results = asyncio.run(validate_pocs(
+        pocs,
+        args.target,
+        flag_regex=args.flag_regex,
+        sandbox=args.sandbox,
+        image=args.image,
+        concurrency=args.concurrency,
+        timeout=args.timeout,
+    ))
+    print_results(results)
+
+    if args.results:
+        with open(args.results, "a", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps({"time": start_dt.isoformat(), **asdict(r)}, ensure_ascii=False) + "\n")
+        print(f"[+] Results written to: {args.results}")
+
+    # ---- TIMING END ---------------------------------------------------
+    elapsed_seconds = time.perf_counter() - start_perf
+    elapsed_hms     = time.strftime("%H:%M:%S", time.gmtime(elapsed_seconds))
+    print(f"\n✅ Validation finished at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"⏱️  Total elapsed wall‑clock time: {elapsed_hms} ({elapsed_seconds:.2f}s)")
+    tracer.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import argparse
 import shutil
 import logging
 from docling.document_converter import DocumentConverter
@@ -6,9 +7,15 @@ from docling.chunking import HybridChunker
 from transformers import AutoTokenizer
 from huggingface_hub import login
 from huggingface_hub import snapshot_download
-from sentence_transformers import SentenceTransformer
 import faiss
 
+from instrumentation import tracer
+from bm25 import BM25_FILE, BM25Index
+from embed_backend import BACKENDS
+from embed_pool import TOKENS_PER_BATCH, ParallelEncoder, default_workers
+from embedding_cache import EMBED_CACHE_DIR, EmbeddingCache
+from vector_store import MATRYOSHKA_DIMS, PRECISIONS, build_index, describe, recall_report
+
 DIR_READ = "./md.out"
 DIR_INDEX = "./vecstore.out"
 INDEX_FILE = "faiss_index.bin"
@@ -19,8 +26,24 @@ LOCAL_MODEL_NAME = EMBED_MODEL_NAME.replace("/", "--")
 MAX_TOKENS = 4096
 MODELS_DIR = "./models.work"
 MODEL_DIR = os.path.join(MODELS_DIR, LOCAL_MODEL_NAME)
+EMBED_CACHE_DTYPE = "float32"   # "float16" halves the cache on disk
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunk md.out and build the FAISS / BM25 indexes.")
+    parser.add_argument("--precision", choices=PRECISIONS, default="fp32",
+                        help="Vector storage: exact float32, float16 or 8‑bit scalar quantisation (default: fp32).")
+    parser.add_argument("--dim", type=int, choices=MATRYOSHKA_DIMS, default=None,
+                        help="Truncate vectors Matryoshka‑style to this many dimensions (default: full).")
+    parser.add_argument("--compare-recall", action="store_true",
+                        help="Log recall@10 and size of every precision / dimension against float32.")
+    parser.add_argument("--embed-workers", type=int, default=default_workers(),
+                        help="Encoder processes, each with its own model copy (default: %(default)s, from the core count).")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                        help="Embedding inference: PyTorch, ONNX Runtime or ONNX with int8 weights (default: torch).")
+    parser.add_argument("--tokens-per-batch", type=int, default=TOKENS_PER_BATCH,
+                        help="Padded tokens per length‑bucketed batch (default: %(default)s).")
+    args = parser.parse_args()
+
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
 
@@ -41,8 +64,8 @@ if __name__ == "__main__":
     else:
         logger.info(f"Local model found at path: {MODEL_DIR}")
 
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
-    embed_model = SentenceTransformer(MODEL_DIR)
+    with tracer.span("load_model"):
+        tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
 
     # Remove existing output directory if it exists
     if os.path.exists(DIR_INDEX):
@@ -76,30 +99,55 @@ if __name__ == "__main__":
             input_path = os.path.join(DIR_READ, filename)
             #output_path = os.path.join(DIR_INDEX, f"{os.path.splitext(filename)[0]}.md")
             logger.info(f"Chunking {input_path}")
-            doc = converter.convert(input_path).document
-            chunk_iterator = chunker.chunk(dl_doc=doc)
-            for i, chunk in enumerate(chunk_iterator):
-                logger.info(f"--- INDEX {index} : {filename} chunk {i+1} ---")
-                text = chunker.contextualize(chunk=chunk)
-                logger.info(text)
-                chunks.append(text)
+            with tracer.span("chunk_markdown", file=filename):
+                doc = converter.convert(input_path).document
+                chunk_iterator = chunker.chunk(dl_doc=doc)
+                for i, chunk in enumerate(chunk_iterator):
+                    logger.info(f"--- INDEX {index} : {filename} chunk {i+1} ---")
+                    text = chunker.contextualize(chunk=chunk)
+                    logger.info(text)
+                    chunks.append(text)
 
-                # Save each chunk as a separate file
-                chunked_path = os.path.join(DIR_CHUNKED, f"{index}.txt")
-                with open(chunked_path, "w", encoding="utf-8") as f:
-                    f.write(text)
-                index += 1
+                    # Save each chunk as a separate file
+                    chunked_path = os.path.join(DIR_CHUNKED, f"{index}.txt")
+                    with open(chunked_path, "w", encoding="utf-8") as f:
+                        f.write(text)
+                    index += 1
 
     logger.info(f"Total chunks created: {len(chunks)}")
 
-    # Create embeddings
+    # Create embeddings – unchanged chunk texts come from the persistent cache
     logger.info("Creating embeddings...")
-    embeddings = embed_model.encode(chunks, convert_to_numpy=True)
+    # Vectors of another backend are not interchangeable bit for bit – keep them apart
+    cache_key = EMBED_MODEL_NAME if args.backend == "torch" else f"{EMBED_MODEL_NAME}+{args.backend}"
+    embed_cache = EmbeddingCache(EMBED_CACHE_DIR, cache_key, dtype=EMBED_CACHE_DTYPE)
+    with tracer.span("embed", chunks=len(chunks)), \
+            ParallelEncoder(MODEL_DIR, tokenizer, workers=args.embed_workers, backend=args.backend,
+                            tokens_per_batch=args.tokens_per_batch) as encoder:
+        embeddings = embed_cache.encode(encoder, chunks)
+        embed_cache.save()
     logger.info(f"Embeddings created, shape: {embeddings.shape}")
+    logger.info(embed_cache.report())
+    logger.info(encoder.report())
     # Create FAISS index
-    dimension = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings.astype("float32"))
-    faiss_index_path = os.path.join(DIR_INDEX, INDEX_FILE)
-    faiss.write_index(index, faiss_index_path)
-    logger.info(f"FAISS index created and saved to {faiss_index_path}")
\ No newline at end of file
+    with tracer.span("build_index", precision=args.precision, dim=args.dim or embeddings.shape[1]):
+        index = build_index(embeddings, args.precision, args.dim)
+        faiss_index_path = os.path.join(DIR_INDEX, INDEX_FILE)
+        faiss.write_index(index, faiss_index_path)
+    logger.info(f"FAISS index ({describe(index)}) created and saved to {faiss_index_path}")
+    if args.compare_recall:
+        with tracer.span("compare_recall"):
+            dims = [None] + [d for d in MATRYOSHKA_DIMS if d < embeddings.shape[1]]
+            configs = [(p, d) for d in dims for p in PRECISIONS]
+            rows = recall_report(embeddings, configs)
+        logger.info("Recall@10 against exact float32 (chunk vectors as queries):")
+        for row in rows:
+            logger.info(f"  {row['precision']:>4} dim {row['dim']:>4}: recall {row['recall']:.3f}, "
+                        f"{row['bytes'] / 1e6:.2f} MB ({row['ratio']:.1f}× smaller)")
+    # Create sparse BM25 index over the same chunk ids (exact acronyms / numbers)
+    with tracer.span("build_bm25", chunks=len(chunks)):
+        bm25 = BM25Index.build(chunks)
+        bm25_path = os.path.join(DIR_INDEX, BM25_FILE)
+        bm25.save(bm25_path)
+    logger.info(f"BM25 index with {len(bm25.postings)} terms saved to {bm25_path}")
+    tracer.finish()
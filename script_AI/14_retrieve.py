@@ -1,7 +1,17 @@
 import os
+import argparse
+import contextvars
 import logging
-from sentence_transformers import SentenceTransformer
-import faiss
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from instrumentation import tracer
+from bm25 import BM25_FILE, BM25Index, reciprocal_rank_fusion
+from embed_backend import BACKENDS, PARITY_MIN_COSINE, compare_backends, load_model
+from vector_store import describe, fit_query, read_index, startup_benchmark
+from reranker import RERANK_BATCH, RERANK_MODEL_NAME, Reranker, ensure_model
 
 DIR_INDEX = "./vecstore.out"
 INDEX_FILE = "faiss_index.bin"
@@ -12,37 +22,204 @@ LOCAL_MODEL_NAME = EMBED_MODEL_NAME.replace("/", "--")
 MODELS_DIR = "./models.work"
 MODEL_DIR = os.path.join(MODELS_DIR, LOCAL_MODEL_NAME)
 
-if __name__ == "__main__":
+DEFAULT_QUERY = "What are requirements for good strqtegic communication?"
+FETCH_K = 30     # candidates taken from each retriever
+TOP_K = 8        # fused results returned
+RERANK_TOP_N = 5 # chunks kept after cross-encoder reranking
+CHECK_CHUNKS = 64  # chunks encoded by --check-backend
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Hit:
+    id: int
+    score: float                       # RRF score (hybrid) or the retriever's own score
+    dense_rank: Optional[int] = None
+    sparse_rank: Optional[int] = None
+    rerank_score: Optional[float] = None
+    first_rank: Optional[int] = None     # position before reranking
+
+
+def load_chunks(chunk_dir: str) -> List[str]:
+    """Chunk texts indexed by chunk id (``<id>.txt`` as written by 13_embedding.py)."""
+    ids = sorted(int(f[:-4]) for f in os.listdir(chunk_dir) if f.endswith(".txt") and f[:-4].isdigit())
+    chunks = [""] * (ids[-1] + 1 if ids else 0)
+    for chunk_id in ids:
+        with open(os.path.join(chunk_dir, f"{chunk_id}.txt"), "r", encoding="utf-8") as f:
+            chunks[chunk_id] = f.read()
+    return chunks
+
+
+def dense_search(embed_model, index, query: str, k: int) -> List[Tuple[int, float]]:
+    with tracer.span("encode_query"):
+        query_embedding = fit_query(index, embed_model.encode([query]))
+    with tracer.span("dense_search", k=k):
+        distances, indices = index.search(query_embedding, k)
+    return [(int(i), float(d)) for i, d in zip(indices[0], distances[0]) if i >= 0]
+
+
+def sparse_search(bm25: BM25Index, query: str, k: int) -> List[Tuple[int, float]]:
+    with tracer.span("sparse_search", k=k):
+        return bm25.search(query, k)
+
+
+def hybrid_search(embed_model, index, bm25: Optional[BM25Index], query: str,
+                  fetch_k: int = FETCH_K, top_k: int = TOP_K, mode: str = "hybrid") -> List[Hit]:
+    """Dense and BM25 search in parallel, fused with reciprocal-rank fusion."""
+    dense: List[Tuple[int, float]] = []
+    sparse: List[Tuple[int, float]] = []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        # FAISS and the encoder release the GIL, so BM25 runs while the query is embedded
+        dense_f = pool.submit(contextvars.copy_context().run, dense_search,
+                              embed_model, index, query, fetch_k) if mode != "sparse" else None
+        sparse_f = pool.submit(contextvars.copy_context().run, sparse_search,
+                               bm25, query, fetch_k) if mode != "dense" else None
+        if dense_f is not None:
+            dense = dense_f.result()
+        if sparse_f is not None:
+            sparse = sparse_f.result()
+
+    dense_rank = {i: r for r, (i, _) in enumerate(dense, start=1)}
+    sparse_rank = {i: r for r, (i, _) in enumerate(sparse, start=1)}
+    if mode == "dense":
+        scored = dense
+    elif mode == "sparse":
+        scored = sparse
+    else:
+        with tracer.span("fuse"):
+            scored = reciprocal_rank_fusion([[i for i, _ in dense], [i for i, _ in sparse]])
+    return [Hit(i, s, dense_rank.get(i), sparse_rank.get(i)) for i, s in scored[:top_k]]
+
+
+def parse_cli() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Retrieve doctrine chunks for a query.")
+    parser.add_argument("-q", "--query", default=DEFAULT_QUERY, help="Query text.")
+    parser.add_argument("-k", "--top-k", type=int, default=None,
+                        help=f"Number of chunks returned (default: {TOP_K}).")
+    parser.add_argument("--fetch-k", type=int, default=FETCH_K,
+                        help=f"Candidates taken from each retriever before fusion (default: {FETCH_K}).")
+    parser.add_argument("--mode", choices=("hybrid", "dense", "sparse"), default="hybrid",
+                        help="Dense (FAISS), sparse (BM25) or both fused with RRF (default: hybrid).")
+    parser.add_argument("--rerank", action="store_true",
+                        help=("Rescore the --fetch-k fused candidates with a cross‑encoder and keep "
+                              f"the best --top-k (default {RERANK_TOP_N} with --rerank)."))
+    parser.add_argument("--rerank-model", default=None, metavar="DIR",
+                        help=f"Local cross‑encoder directory (default: {RERANK_MODEL_NAME} in {MODELS_DIR}).")
+    parser.add_argument("--rerank-batch", type=int, default=RERANK_BATCH,
+                        help=f"Pairs per cross‑encoder batch on CPU (default: {RERANK_BATCH}).")
+    parser.add_argument("-i", "--interactive", action="store_true",
+                        help="Keep the models loaded and read further queries from stdin.")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                        help="Query encoder: PyTorch, ONNX Runtime or ONNX with int8 weights (default: torch).")
+    parser.add_argument("--check-backend", action="store_true",
+                        help=("Compare --backend against PyTorch (cosine parity, query latency, throughput) "
+                              "on the stored chunks and exit; exit status 1 if parity fails."))
+    parser.add_argument("--no-mmap", action="store_true",
+                        help="Copy the FAISS index into RAM instead of memory‑mapping it.")
+    parser.add_argument("--bench-startup", type=int, default=0, metavar="N",
+                        help="Compare index load time and memory of N parallel readers, copied vs mapped, and exit.")
+    parser.add_argument("--trace", type=str, default=None, metavar="FILE",
+                        help=("Append per‑stage spans (OpenTelemetry‑shaped JSON lines) to FILE. "
+                              "The CTF_TRACE_FILE environment variable does the same."))
+    args = parser.parse_args()
+    if args.top_k is None:
+        args.top_k = RERANK_TOP_N if args.rerank else TOP_K
+    return args
+
+
+def main() -> None:
+    args = parse_cli()
+    tracer.configure(args.trace)
     logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger(__name__)
-
-    # List to hold all chunks
-    chunks = []
-
-    # Read all chunks from chunked files
-    for filename in os.listdir(DIR_CHUNKED):
-        if filename.endswith(".txt"):
-            chunked_path = os.path.join(DIR_CHUNKED, filename)
-            with open(chunked_path, "r", encoding="utf-8") as f:
-                text = f.read()
-                chunks.append(text)
+
+    faiss_index_path = os.path.join(DIR_INDEX, INDEX_FILE)
+    if args.bench_startup:
+        logger.info(f"Startup benchmark: {args.bench_startup} process(es) loading {faiss_index_path}")
+        for row in startup_benchmark(faiss_index_path, args.bench_startup):
+            memory = ", ".join(f"{k[:-3].upper()} +{v:.1f} MB" for k, v in row.items() if k.endswith("_mb"))
+            logger.info(f"  {row['mode']:>4}: load {row['load_ms']:.1f} ms, first query "
+                        f"{row['first_query_ms']:.1f} ms, per process {memory}")
+        tracer.finish()
+        return
+
+    # Chunk texts, indexed by chunk id
+    with tracer.span("load_chunks"):
+        chunks = load_chunks(DIR_CHUNKED)
     logger.info(f"Total chunks loaded: {len(chunks)}")
 
-    # Load embedding model
-    embed_model = SentenceTransformer(MODEL_DIR)
-    logger.info(f"Embedding model loaded from {MODEL_DIR}")
+    if args.check_backend:
+        sample = [c for c in chunks if c][:CHECK_CHUNKS]
+        rows = compare_backends(MODEL_DIR, [args.backend], sample, args.query)
+        logger.info(f"Backend check on {len(sample)} chunk(s), query '{args.query}':")
+        for row in rows:
+            mark = "+" if row["parity"] else "!"
+            logger.info(f"  [{mark}] {row['backend']:>9}: load {row['load_s']:.1f}s, query p50 {row['p50_ms']:.1f} ms "
+                        f"/ p95 {row['p95_ms']:.1f} ms, {row['chunks_per_s']:.1f} chunks/s, cosine to torch "
+                        f"min {row['min_cos']:.5f} / mean {row['mean_cos']:.5f} "
+                        f"(needs ≥ {PARITY_MIN_COSINE[row['backend']]})")
+        tracer.finish()
+        sys.exit(0 if all(row["parity"] for row in rows) else 1)
 
-    # Read FAISS index
-    faiss_index_path = os.path.join(DIR_INDEX, INDEX_FILE)
-    index = faiss.read_index(faiss_index_path)
-    logger.info(f"FAISS index loaded from {faiss_index_path}")
-
-    # Example: Encode a query and search in the index
-    query = "What are requirements for good strqtegic communication?"
-    query_embedding = embed_model.encode([query]).astype("float32")
-    k = 30  # number of nearest neighbors
-    distances, indices = index.search(query_embedding, k)
-    logger.info(f"Top {k} nearest neighbors for the query '{query}':")
-    for i, (idx, dist) in enumerate(zip(indices[0], distances[0])):
-        logger.info(f"{i+1}: Chunk Index: {idx}, Distance: {dist}")
-        logger.info(f"Content: {chunks[idx]}")
\ No newline at end of file
+    # Sparse index (built by 13_embedding.py next to the FAISS index)
+    bm25 = None
+    bm25_path = os.path.join(DIR_INDEX, BM25_FILE)
+    if args.mode != "dense":
+        if os.path.exists(bm25_path):
+            with tracer.span("read_bm25"):
+                bm25 = BM25Index.load(bm25_path)
+            logger.info(f"BM25 index loaded from {bm25_path}")
+        else:
+            logger.warning(f"{bm25_path} not found – re-run 13_embedding.py; using dense search only")
+            args.mode = "dense"
+
+    embed_model = index = None
+    if args.mode != "sparse":
+        # Load embedding model
+        with tracer.span("load_model", backend=args.backend):
+            embed_model = load_model(MODEL_DIR, args.backend)
+        logger.info(f"Embedding model ({args.backend}) loaded from {MODEL_DIR}")
+
+        # Read FAISS index (memory-mapped: no copy, pages shared between processes)
+        with tracer.span("read_index", mmap=not args.no_mmap):
+            index = read_index(faiss_index_path, mmap=not args.no_mmap)
+        logger.info(f"FAISS index ({describe(index)}) loaded from {faiss_index_path}")
+
+    reranker = None
+    if args.rerank:
+        model_dir = args.rerank_model or ensure_model(MODELS_DIR)
+        reranker = Reranker(model_dir, batch_size=args.rerank_batch)
+        logger.info(f"Cross-encoder loaded from {model_dir}")
+
+    query = args.query
+    while query:
+        with tracer.span("retrieve", mode=args.mode, k=args.top_k, rerank=bool(reranker)):
+            first_k = args.fetch_k if reranker else args.top_k
+            hits = hybrid_search(embed_model, index, bm25, query,
+                                 fetch_k=args.fetch_k, top_k=first_k, mode=args.mode)
+            if reranker:
+                hits = reranker.rerank(query, hits, chunks, top_n=args.top_k)
+        logger.info(f"Top {len(hits)} chunks ({args.mode}{' + rerank' if reranker else ''}) "
+                    f"for the query '{query}':")
+        for i, hit in enumerate(hits):
+            ranks = f"dense #{hit.dense_rank or '-'}, sparse #{hit.sparse_rank or '-'}"
+            if hit.rerank_score is not None:
+                ranks += f", first stage #{hit.first_rank}, rerank {hit.rerank_score:.3f}"
+            logger.info(f"{i+1}: Chunk Index: {hit.id}, Score: {hit.score:.4f} ({ranks})")
+            logger.info(f"Content: {chunks[hit.id]}")
+        query = _next_query() if args.interactive else None
+
+    if reranker:
+        logger.info(reranker.report())
+    tracer.finish()
+
+
+def _next_query() -> Optional[str]:
+    try:
+        return input("query> ").strip() or None
+    except EOFError:
+        return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Flag breach detector that tails the rolling tcpdump files.
+
+Native replacement for ``script/04_detect_breach.sh`` +
+``script/04-01_select_target_stream.sh``.  The shell pair merges the capture
+files every ``CHECK_INTERVAL=60`` seconds and runs tshark over the whole merge
+(with a 10 second overlap), so a breach shows up up to a minute late.  This
+script instead:
+
+* polls ``pcap.out/pcap-*.pcap`` every ``--interval`` seconds and parses only
+  the records appended since the last poll (``pcap_stream.PcapTail``);
+* reassembles every TCP connection in memory and searches the server's
+  payload for ``FLAG_REGEX`` as it arrives, including flags split across
+  segments;
+* writes the connection as ``pcap.out/breach-<server port>_<YYYYmmdd-HHMMSS>.pcap``
+  once it is closed, or after ``--grace`` seconds without traffic.  This is
+  the same name and format the shell scripts produce, so
+  ``05_generate_replay_script.sh`` (or ``22_generate_replay_script.py``)
+  picks it up unchanged.
+
+The last packet time is stored in ``pcap.out/.checkpoint.txt``, in the same
+format ``04_detect_breach.sh`` uses, so either tool can continue from the
+other.
+
+    python 21_detect_breach.py -d pcap.out -s 10.60.3.1
+
+tcpdump buffers its output.  For detection within a second, run it with
+``-U`` (see the commented line in ``script/03_tcpdump.sh``).
+"""
+
+import os
+import re
+import glob
+import time
+import argparse
+import subprocess
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# ------------------------------------------------------------
+# Local helpers shared by the script_AI tools
+# ------------------------------------------------------------
+from instrumentation import tracer
+from pcap_stream import Endpoint, Packet, PcapTail, TcpStream, TCP_FIN, TCP_RST, stream_key
+
+# ------------------------------------------------------------
+# Configuration – same defaults as script/04_detect_breach.sh
+# ------------------------------------------------------------
+FLAG_REGEX = "FLAG_[0-9a-zA-Z]+"
+DIR_PCAP = "pcap.out"
+PCAP_PREFIX = "pcap"
+BREACH_PREFIX = "breach"
+CHECKPOINT_FILE = ".checkpoint.txt"
+CHECKPOINT_OFFSET = 10.0           # seconds re-read before the checkpoint on restart
+
+POLL_INTERVAL = 1.0
+GRACE_S = 2.0                      # wait this long for the rest of a breached stream
+IDLE_S = 120.0                     # forget connections silent for this long
+MAX_STREAM_BYTES = 16 * 1024 * 1024
+FLAG_CARRY = 256                   # bytes kept to catch a flag split across segments
+
+
+def message(text: str) -> None:
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S}  {text}", flush=True)
+
+
+def interface_address(interface: str) -> Optional[str]:
+    """IPv4 address of ``interface`` (what the shell scripts use as IP_SERVER)."""
+    try:
+        out = subprocess.run(["ip", "-4", "-o", "addr", "show", interface],
+                             capture_output=True, text=True, timeout=5).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    m = re.search(r"inet (\d+(?:\.\d+){3})", out)
+    return m.group(1) if m else None
+
+
+def _frame_time(ts: float) -> str:
+    return time.strftime("%Y%m%d-%H%M%S", time.localtime(ts))
+
+
+@dataclass
+class Breach:
+    flag: str
+    sender: Endpoint
+    receiver: Endpoint
+    flag_ts: float
+    lag_s: float
+    written: bool = False
+
+
+class BreachDetector:
+    """Feeds packets into ``TcpStream``s and dumps the ones carrying a flag."""
+
+    def __init__(
+        self,
+        out_dir: str,
+        flag_regex: str,
+        server_ip: Optional[str] = None,
+        prefix: str = BREACH_PREFIX,
+        grace_s: float = GRACE_S,
+        idle_s: float = IDLE_S,
+        max_stream_bytes: int = MAX_STREAM_BYTES,
+    ) -> None:
+        self.out_dir = out_dir
+        self.flag_re = re.compile(flag_regex.encode())
+        self.server_ip = server_ip
+        self.prefix = prefix
+        self.grace_s = grace_s
+        self.idle_s = idle_s
+        self.max_stream_bytes = max_stream_bytes
+
+        self.streams: Dict[Tuple[Endpoint, Endpoint], TcpStream] = {}
+        self.touched: Dict[Tuple[Endpoint, Endpoint], float] = {}
+        self.breaches: Dict[Tuple[Endpoint, Endpoint], Breach] = {}
+        self._carry: Dict[Tuple[Tuple[Endpoint, Endpoint], Endpoint], bytes] = {}
+
+        self.last_ts = 0.0
+        self.packets = 0
+        self.streams_seen = 0
+        self.dumps: List[str] = []
+        self.lags: List[float] = []
+
+    # --------------------------------------------------------------
+    # Packet intake
+    # --------------------------------------------------------------
+    def feed(self, header: bytes, pkt: Packet) -> None:
+        self.packets += 1
+        self.last_ts = max(self.last_ts, pkt.ts)
+        key = stream_key(pkt.src, pkt.dst)
+        st = self.streams.get(key)
+        if st is None:
+            if pkt.flags & (TCP_FIN | TCP_RST) and not pkt.payload:
+                return                            # tail of a connection already dumped
+            st = self.streams[key] = TcpStream(key, header, pkt.ts)
+            self.streams_seen += 1
+        data = st.add(pkt, self.max_stream_bytes)
+        self.touched[key] = time.monotonic()
+
+        if not data or key in self.breaches:
+            return
+        if self.server_ip is not None and pkt.src[0] != self.server_ip:
+            return
+        ck = (key, pkt.src)
+        buf = self._carry.get(ck, b"") + data
+        m = self.flag_re.search(buf)
+        if m is None:
+            self._carry[ck] = buf[-FLAG_CARRY:]
+            return
+
+        lag = max(0.0, time.time() - pkt.ts)
+        flag = m.group().decode("latin-1")
+        self.breaches[key] = Breach(flag, pkt.src, pkt.dst, pkt.ts, lag)
+        self.lags.append(lag)
+        message(f"[!] TARGET STRING {flag} SENT from {pkt.src[0]}:{pkt.src[1]} to "
+                f"{pkt.dst[0]} at {_frame_time(st.first_ts)} (detected {lag:.1f}s after capture)")
+
+    # --------------------------------------------------------------
+    # Dumping / eviction
+    # --------------------------------------------------------------
+    def _dump_path(self, st: TcpStream, breach: Breach) -> Optional[str]:
+        """Name as 04-01_select_target_stream.sh; None if this exact dump exists."""
+        base = f"{self.prefix}-{breach.sender[1]}_{_frame_time(st.first_ts)}"
+        data = st.to_pcap()
+        for n in range(1, 100):
+            path = os.path.join(self.out_dir, base + (f"-{n}" if n > 1 else "") + ".pcap")
+            if not os.path.exists(path):
+                return path
+            if os.path.getsize(path) == len(data):
+                with open(path, "rb") as f:
+                    if f.read() == data:          # re-detected after a restart
+                        return None
+        return None
+
+    def _write(self, st: TcpStream, breach: Breach) -> None:
+        breach.written = True
+        path = self._dump_path(st, breach)
+        if path is None:
+            return
+        with tracer.span("breach_dump", packets=len(st.records), bytes=st.record_bytes,
+                         lag_s=round(breach.lag_s, 3)):
+            tmp = os.path.join(self.out_dir, "." + os.path.basename(path) + ".tmp")
+            with open(tmp, "wb") as f:
+                f.write(st.to_pcap())
+            os.replace(tmp, path)                 # never expose a half-written dump
+        self.dumps.append(path)
+        note = " (truncated)" if st.truncated else ""
+        message(f"[+] stream dump kept as: {path}{note}")
+
+    def flush(self, final: bool = False) -> None:
+        """Write breached streams that are complete and forget stale ones."""
+        now = time.monotonic()
+        for key, st in list(self.streams.items()):
+            quiet = now - self.touched[key]
+            breach = self.breaches.get(key)
+            if breach is not None and not breach.written and (final or st.closed or quiet >= self.grace_s):
+                self._write(st, breach)
+            done = breach is None or breach.written
+            if final or quiet >= self.idle_s or (st.closed and done and quiet >= self.grace_s):
+                del self.streams[key], self.touched[key]
+                self.breaches.pop(key, None)
+                for half in st.halves:
+                    self._carry.pop((key, half), None)
+
+    def report(self) -> str:
+        line = (f"[+] {self.packets} packet(s), {self.streams_seen} TCP stream(s), "
+                f"{len(self.dumps)} breach dump(s)")
+        if self.lags:
+            line += f", detection lag mean {sum(self.lags) / len(self.lags):.1f}s / max {max(self.lags):.1f}s"
+        return line
+
+
+# ------------------------------------------------------------
+# Checkpoint compatible with 04_detect_breach.sh
+# ------------------------------------------------------------
+def read_checkpoint(path: str) -> float:
+    try:
+        with open(path, "r") as f:
+            return float(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0.0
+
+
+def write_checkpoint(path: str, ts: float) -> None:
+    with open(path, "w") as f:
+        f.write(f"{ts:.9f}\n")
+
+
+def watch(args: argparse.Namespace, detector: BreachDetector) -> None:
+    checkpoint_path = os.path.join(args.dir, CHECKPOINT_FILE)
+    checkpoint = read_checkpoint(checkpoint_path)
+    min_ts = max(0.0, checkpoint - CHECKPOINT_OFFSET) if checkpoint else 0.0
+    if checkpoint:
+        message(f"[+] checkpoint restored from {checkpoint_path}: {_frame_time(checkpoint)}")
+
+    tails: Dict[str, Optional[PcapTail]] = {}
+    saved_ts = checkpoint
+    try:
+        while True:
+            files = sorted(glob.glob(os.path.join(args.dir, f"{args.pcap_prefix}-*.pcap")))
+            for path in files:
+                if path not in tails:
+                    # rolled-over files older than the checkpoint are done
+                    stale = min_ts and os.path.getmtime(path) < min_ts
+                    tails[path] = None if stale else PcapTail(path)
+                tail = tails[path]
+                if tail is None:
+                    continue
+                for pkt in tail.read_new(min_ts):
+                    detector.feed(tail.header, pkt)
+            for path in set(tails) - set(files):  # removed by the operator
+                del tails[path]
+
+            detector.flush()
+            if detector.last_ts > saved_ts:
+                write_checkpoint(checkpoint_path, detector.last_ts)
+                saved_ts = detector.last_ts
+            if args.once:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        message("[!] interrupted")
+    finally:
+        detector.flush(final=True)
+        if detector.last_ts > saved_ts:
+            write_checkpoint(checkpoint_path, detector.last_ts)
+        message(f"[+] checkpoint {_frame_time(detector.last_ts or checkpoint or time.time())} "
+                f"has been taken and exiting...")
+
+
+# ------------------------------------------------------------
+# CLI handling
+# ------------------------------------------------------------
+def parse_cli() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Tail rolling tcpdump files and dump TCP streams that leak a flag."
+    )
+    parser.add_argument("-d", "--dir", default=DIR_PCAP,
+                        help=f"Directory with the capture files; breach dumps go there too (default: {DIR_PCAP}).")
+    parser.add_argument("--pcap-prefix", default=PCAP_PREFIX,
+                        help=f"Prefix of the capture files (default: {PCAP_PREFIX}).")
+    parser.add_argument("-p", "--prefix", default=BREACH_PREFIX,
+                        help=f"Prefix of the breach dump files (default: {BREACH_PREFIX}).")
+    parser.add_argument("-t", "--flag-regex", default=FLAG_REGEX,
+                        help=f"Flag in regular expression form (default: {FLAG_REGEX}).")
+    parser.add_argument("-s", "--server", default=None, metavar="IP",
+                        help="IP address that may send the flag. Default: the address of --interface.")
+    parser.add_argument("-i", "--interface", default="eth0",
+                        help="Interface whose IPv4 address is the server when -s is not given (default: eth0).")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, metavar="SEC",
+                        help=f"Seconds between polls of the capture files (default: {POLL_INTERVAL}).")
+    parser.add_argument("--grace", type=float, default=GRACE_S, metavar="SEC",
+                        help=(f"Seconds without traffic before a breached stream that is still open "
+                              f"is dumped (default: {GRACE_S})."))
+    parser.add_argument("--idle", type=float, default=IDLE_S, metavar="SEC",
+                        help=f"Forget connections without traffic for this long (default: {IDLE_S}).")
+    parser.add_argument("--max-stream-mb", type=float, default=MAX_STREAM_BYTES / 2**20, metavar="MB",
+                        help="Packets kept per stream for the dump (default: 16).")
+    parser.add_argument("--once", action="store_true",
+                        help="Process what is on disk now and exit instead of following the files.")
+    parser.add_argument("--trace", type=str, default=None, metavar="FILE",
+                        help=("Append per‑stage spans (OpenTelemetry‑shaped JSON lines) to FILE. "
+                              "The CTF_TRACE_FILE environment variable does the same."))
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_cli()
+    tracer.configure(args.trace)
+
+    if not os.path.isdir(args.dir):
+        message(f"[-] {args.dir} does not exist.  exiting...")
+        return
+    server = args.server or interface_address(args.interface)
+    if server is None:
+        message("[!] WARNING: sender IP not specified and all TCP traffic will be analyzed")
+    else:
+        message(f"[+] flags sent by {server} matching '{args.flag_regex}' are detected")
+
+    detector = BreachDetector(
+        out_dir=args.dir,
+        flag_regex=args.flag_regex,
+        server_ip=server,
+        prefix=args.prefix,
+        grace_s=args.grace,
+        idle_s=args.idle,
+        max_stream_bytes=int(args.max_stream_mb * 2**20),
+    )
+    watch(args, detector)
+    print(detector.report())
+    tracer.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Replay-script generator for breach stream dumps, powered by LM Studio.
+
+Python counterpart of ``script/05_generate_replay_script.sh``.  The shell
+version polls every 60 seconds and sends each breach stream to ChatGPT
+through ``chatgpt.sh``, one stream at a time.  This script:
+
+* watches ``pcap.out/breach*.pcap`` (written by ``21_detect_breach.py`` or
+  ``04-01_select_target_stream.sh``) every ``--interval`` seconds;
+* turns each dump into the same ``client:`` / ``client-hex:`` / ``server:``
+  record as ``format_breach`` and embeds it in ``05_prompt_user.txt``, with
+  ``05_prompt_system.txt`` as the system prompt, without tshark;
+* fingerprints the stream by the *shape* of its client requests (method,
+  path, parameter and header names, bodies with numbers and tokens masked).
+  Breaches replaying the same exploit share one LLM request, and a script
+  generated once is cached in ``replay.out/cache/<fingerprint>.py`` across
+  runs;
+* condenses the stream first (``stream_condense``).  HTTP requests are kept,
+  while bulky bodies and repeated keep-alive exchanges are replaced with
+  size-annotated placeholders, which keeps prompts short.  ``--no-condense``
+  sends the full record;
+* sends the remaining prompts concurrently to the local server, behind the
+  adaptive concurrency limit of ``concurrency_limiter``.
+
+Output names follow the shell script (``breach-80_…pcap`` →
+``replay.out/prompt-80_…txt`` and ``replay.out/replay-80_…py``).  A dump
+whose replay script already exists is skipped.  A failed request is retried
+on a later poll, after a back-off that doubles each time, and a request
+shape is given up after ``RETRY_LIMIT`` failed attempts.
+
+    python 22_generate_replay_script.py -d pcap.out -o replay.out --concurrency 4
+"""
+
+import os
+import re
+import glob
+import time
+import asyncio
+import hashlib
+import argparse
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# ------------------------------------------------------------
+# 3rd‑party imports
+# ------------------------------------------------------------
+from openai import AsyncOpenAI
+
+# ------------------------------------------------------------
+# Local helpers shared by the script_AI tools
+# ------------------------------------------------------------
+from instrumentation import tracer
+from concurrency_limiter import AdaptiveLimit, AsyncLimiter, async_limited_chat_completion
+from pcap_stream import read_pcap, stream_turns
+from stream_condense import StreamCondenser, request_shape
+
+# ------------------------------------------------------------
+# Configuration – adjust to your environment / model limits
+# ------------------------------------------------------------
+BASE_URL = "http://192.168.192.11:1234/v1"    # LM Studio endpoint
+API_KEY = "lmstudio"                          # dummy key required by SDK
+
+FLAG_REGEX = "FLAG_[0-9a-zA-Z]+"
+DIR_READ = "pcap.out"
+BREACH_PREFIX = "breach"
+DIR_WRITE = "replay.out"
+PROMPT_PREFIX = "prompt"
+REPLAY_PREFIX = "replay"
+CACHE_DIR = "cache"
+
+# Prompts shared with script/05_generate_replay_script.sh
+SHELL_SCRIPT_DIR = Path(__file__).resolve().parent.parent / "script"
+PROMPT_TEMPLATE = SHELL_SCRIPT_DIR / "05_prompt_user.txt"
+PROMPT_SYSTEM = SHELL_SCRIPT_DIR / "05_prompt_system.txt"
+
+POLL_INTERVAL = 2.0
+DEFAULT_CONCURRENCY = 4
+MAX_RESPONSE_TOKENS = 8192
+RETRY_LIMIT = 3                  # failed LLM requests per request shape before giving up
+RETRY_BACKOFF = 30.0             # seconds before the first retry, doubled after each failure
+
+
+def message(text: str) -> None:
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S}  {text}", flush=True)
+
+
+# ------------------------------------------------------------
+# Stream record and prompt (format_breach / generate_prompt)
+# ------------------------------------------------------------
+def _prefixed_lines(prefix: str, data: bytes) -> List[str]:
+    text = data.decode("utf-8", "replace")
+    lines = text.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    return [f"{prefix}{line.rstrip(chr(13))}" for line in lines]
+
+
+def format_record(turns: List[Tuple[bool, bytes]]) -> str:
+    """Readable stream record in the layout ``05_prompt_user.txt`` describes."""
+    out: List[str] = []
+    for from_server, data in turns:
+        if from_server:
+            out += _prefixed_lines("server: ", data)
+        else:
+            out += _prefixed_lines("client: ", data)
+            out.append(f"client-hex: {data.hex()}")
+        out.append("")
+    return "\n".join(out) + "\n"
+
+
+def build_prompt(template: str, record: str, flag_regex: str) -> str:
+    """``05_prompt_user.txt`` with $FLAG_REGEX filled in, the record and a closing fence."""
+    return template.replace("$FLAG_REGEX", f'"{flag_regex}"') + record + "```\n"
+
+
+# ------------------------------------------------------------
+# Request-shape fingerprint
+# ------------------------------------------------------------
+def stream_fingerprint(turns: List[Tuple[bool, bytes]], server_port: Optional[int]) -> str:
+    h = hashlib.sha256(str(server_port).encode())
+    for from_server, data in turns:
+        if not from_server:
+            h.update(b"\0")
+            h.update(request_shape(data))
+    return h.hexdigest()[:16]
+
+
+# ------------------------------------------------------------
+# Reply post-processing (the awk / perl / gawk pipeline of the shell script)
+# ------------------------------------------------------------
+_PYTHON_FENCE_RE = re.compile(r"^```python[ \t]*\n(.*?)^```[ \t]*$", re.MULTILINE | re.DOTALL)
+_ANY_FENCE_RE = re.compile(r"^```[^\n]*\n(.*?)^```[ \t]*$", re.MULTILINE | re.DOTALL)
+
+
+def _compiles(code: str) -> bool:
+    try:
+        compile(code, "<replay>", "exec")
+        return True
+    except (SyntaxError, ValueError):
+        return False
+
+
+def _fix_quoted_newlines(code: str) -> str:
+    """Escape CR/LF the model embedded literally before a closing quote, then
+    drop the remaining newlines inside double-quoted strings."""
+    code = re.sub(r"\r\n(?=\")", r"\\r\\n", code)
+    code = re.sub(r"\n(?=\")", r"\\n", code)
+    parts = code.split('"')
+    return '"'.join(p.replace("\n", "") if i % 2 else p for i, p in enumerate(parts))
+
+
+def extract_replay_code(reply: str) -> Optional[str]:
+    """The Python code of the reply; the shell fix-ups only if it does not compile."""
+    m = _PYTHON_FENCE_RE.search(reply) or _ANY_FENCE_RE.search(reply)
+    if m is None:
+        return None
+    code = m.group(1)
+    if not _compiles(code):
+        fixed = _fix_quoted_newlines(code)
+        if _compiles(fixed):
+            return fixed
+        print("[!] Generated replay script does not compile – kept as is.")
+    return code
+
+
+# ------------------------------------------------------------
+# Pipeline
+# ------------------------------------------------------------
+@dataclass
+class BreachJob:
+    path: str
+    prompt: str
+    prompt_path: str
+    replay_path: str
+    fingerprint: str
+    seen_at: float
+
+
+class ReplayGenerator:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.template = PROMPT_TEMPLATE.read_text(encoding="utf-8")
+        self.system_prompt = PROMPT_SYSTEM.read_text(encoding="utf-8")
+        self.cache_dir = os.path.join(args.out_dir, CACHE_DIR)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.aclient: Optional[AsyncOpenAI] = None
+        self.limiter = AsyncLimiter(AdaptiveLimit(initial=min(2, args.concurrency),
+                                                  max_limit=max(1, args.concurrency)))
+        self.generations: Dict[str, asyncio.Task] = {}     # fingerprint → LLM request
+        self.handled: set = set()
+        self.failures: Dict[str, int] = {}                  # fingerprint → failed requests
+        self.retry_at: Dict[str, float] = {}                # dump path → earliest retry
+        self.tasks: set = set()
+        self.condenser = None if args.no_condense else StreamCondenser(args.flag_regex)
+        self.stats = {"breaches": 0, "generated": 0, "deduped": 0, "cached": 0, "failed": 0}
+        self.ready_s: List[float] = []
+
+    def _names(self, path: str) -> Tuple[str, str]:
+        base = os.path.basename(path).replace(self.args.prefix, "", 1)
+        stem = os.path.splitext(base)[0]
+        return (os.path.join(self.args.out_dir, f"{PROMPT_PREFIX}{stem}.txt"),
+                os.path.join(self.args.out_dir, f"{REPLAY_PREFIX}{stem}.py"))
+
+    @tracer.timed("prepare_breach")
+    def prepare(self, path: str) -> Optional[BreachJob]:
+        prompt_path, replay_path = self._names(path)
+        _, packets = read_pcap(path)
+        if not packets:
+            print(f"[-] {path}: no TCP packets – skipped")
+            return None
+        m = re.search(r"-(\d+)_", os.path.basename(path))
+        port = int(m.group(1)) if m else None
+        turns = stream_turns(packets, self.args.server, port)
+        fingerprint = stream_fingerprint(turns, port)
+        note = ""
+        if self.condenser is not None:
+            raw_bytes = sum(len(d) for _, d in turns)
+            turns = self.condenser.condense_turns(turns)
+            note = f" (stream condensed {raw_bytes:,} → {sum(len(d) for _, d in turns):,} bytes)"
+        record = format_record(turns)
+        prompt = build_prompt(self.template, record, self.args.flag_regex)
+        with open(prompt_path, "w", encoding="utf-8") as f:
+            f.write(prompt)
+        message(f"[+] prompt generated: {prompt_path}{note}")
+        return BreachJob(path, prompt, prompt_path, replay_path, fingerprint, time.time())
+
+    async def _generate(self, job: BreachJob) -> Optional[str]:
+        """One LLM request per fingerprint; the result goes to the cache."""
+        cached = os.path.join(self.cache_dir, f"{job.fingerprint}.py")
+        if os.path.exists(cached):
+            self.stats["cached"] += 1
+            with open(cached, "r", encoding="utf-8") as f:
+                return f.read()
+        with tracer.span("generate_replay", fingerprint=job.fingerprint,
+                         prompt_bytes=len(job.prompt.encode("utf-8"))) as sp:
+            try:
+                reply = await async_limited_chat_completion(
+                    self.limiter,
+                    self.aclient,
+                    model=self.args.model,
+                    messages=[
+                        {"role": "system", "content": self.system_prompt},
+                        {"role": "user",   "content": job.prompt},
+                    ],
+                    max_tokens=self.args.max_tokens,
+                    temperature=0.2,
+                )
+            except Exception as e:
+                sp.status = "ERROR"
+                print(f"[!] {job.path}: OpenAI request failed: {e}")
+                return None
+        code = extract_replay_code(reply or "")
+        if code is None:
+            print(f"[-] {job.path}: no Python code in the reply")
+            return None
+        self.stats["generated"] += 1
+        tmp = cached + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(code)
+        os.replace(tmp, cached)
+        return code
+
+    async def _deliver(self, job: BreachJob, generation: asyncio.Task) -> None:
+        code = await generation
+        if code is None:
+            # forget the failed request so a later poll can retry this shape
+            if self.generations.get(job.fingerprint) is generation:
+                del self.generations[job.fingerprint]
+                self.failures[job.fingerprint] = self.failures.get(job.fingerprint, 0) + 1
+            failures = self.failures.get(job.fingerprint, 0)
+            if failures >= RETRY_LIMIT:
+                self.stats["failed"] += 1
+                message(f"[-] {job.path}: giving up after {failures} failed attempt(s)")
+                return
+            delay = RETRY_BACKOFF * 2 ** (failures - 1)
+            self.retry_at[job.path] = time.time() + delay
+            self.handled.discard(job.path)
+            message(f"[-] {job.path}: retrying in {delay:.0f}s")
+            return
+        with open(job.replay_path, "w", encoding="utf-8") as f:
+            f.write(code)
+        ready = time.time() - os.path.getmtime(job.path)
+        self.ready_s.append(ready)
+        message(f"[+] replay script generated: {job.replay_path} "
+                f"(fingerprint {job.fingerprint}, {ready:.1f}s after the breach dump)")
+
+    def poll(self) -> None:
+        pattern = os.path.join(self.args.dir, f"{self.args.prefix}*.pcap")
+        for path in sorted(glob.glob(pattern)):
+            if path in self.handled or time.time() < self.retry_at.get(path, 0.0):
+                continue
+            self.handled.add(path)
+            _, replay_path = self._names(path)
+            if os.path.exists(replay_path):
+                continue
+            message(f"[+] processing {path}...")
+            job = self.prepare(path)
+            if job is None or self.args.prompt_only:
+                continue
+            if path not in self.retry_at:
+                self.stats["breaches"] += 1
+            if self.failures.get(job.fingerprint, 0) >= RETRY_LIMIT:
+                self.stats["failed"] += 1
+                print(f"[-] {path}: request shape {job.fingerprint} failed {RETRY_LIMIT} time(s) – skipped")
+                continue
+            generation = self.generations.get(job.fingerprint)
+            if generation is None:
+                generation = asyncio.create_task(self._generate(job))
+                self.generations[job.fingerprint] = generation
+            else:
+                self.stats["deduped"] += 1
+                print(f"[+] {path}: same request shape as an earlier breach ({job.fingerprint})")
+            task = asyncio.create_task(self._deliver(job, generation))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run(self) -> None:
+        self.aclient = AsyncOpenAI(base_url=self.args.base_url, api_key=API_KEY)
+        try:
+            while True:
+                self.poll()
+                if self.args.once:
+                    if self.tasks:
+                        await asyncio.gather(*list(self.tasks))
+                    break
+                await asyncio.sleep(self.args.interval)
+        finally:
+            await self.aclient.close()
+
+    def report(self) -> str:
+        s = self.stats
+        line = (f"[+] {s['breaches']} breach(es): {s['generated']} script(s) generated, "
+                f"{s['deduped']} deduplicated, {s['cached']} from cache, {s['failed']} failed")
+        if self.ready_s:
+            line += f"; ready {sum(self.ready_s) / len(self.ready_s):.1f}s after the dump on average"
+        return line
+
+
+# ------------------------------------------------------------
+# CLI handling
+# ------------------------------------------------------------
+def parse_cli() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Generate replay scripts for breach stream dumps with the local LLM."
+    )
+    parser.add_argument("-d", "--dir", default=DIR_READ,
+                        help=f"Directory with the breach dumps (default: {DIR_READ}).")
+    parser.add_argument("-p", "--prefix", default=BREACH_PREFIX,
+                        help=f"Prefix of the breach dump files (default: {BREACH_PREFIX}).")
+    parser.add_argument("-o", "--out-dir", default=DIR_WRITE,
+                        help=f"Directory for prompts, replay scripts and the cache (default: {DIR_WRITE}).")
+    parser.add_argument("-s", "--server", default=None, metavar="IP",
+                        help="Server IP address. Default: the side whose port is in the dump name.")
+    parser.add_argument("-t", "--flag-regex", default=FLAG_REGEX,
+                        help=f"Flag in regular expression form (default: {FLAG_REGEX}).")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=(f"Upper bound for parallel LLM requests; the actual limit adapts "
+                              f"to the server's latency (default: {DEFAULT_CONCURRENCY})."))
+    parser.add_argument("--model", default="default", help="Model name on the server (default: default).")
+    parser.add_argument("--base-url", default=BASE_URL, help=f"OpenAI‑compatible endpoint (default: {BASE_URL}).")
+    parser.add_argument("--max-tokens", type=int, default=MAX_RESPONSE_TOKENS,
+                        help=f"max_tokens per reply (default: {MAX_RESPONSE_TOKENS}).")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, metavar="SEC",
+                        help=f"Seconds between polls for new breach dumps (default: {POLL_INTERVAL}).")
+    parser.add_argument("--once", action="store_true",
+                        help="Process the dumps on disk now and exit.")
+    parser.add_argument("--no-condense", action="store_true",
+                        help="Put the whole stream into the prompt instead of the condensed HTTP structure.")
+    parser.add_argument("--prompt-only", action="store_true",
+                        help="Only write the prompts (what the shell script does without an API key).")
+    parser.add_argument("--trace", type=str, default=None, metavar="FILE",
+                        help=("Append per‑stage spans (OpenTelemetry‑shaped JSON lines) to FILE. "
+                              "The CTF_TRACE_FILE environment variable does the same."))
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_cli()
+    tracer.configure(args.trace)
+
+    if not os.path.isdir(args.dir):
+        message(f"[-] {args.dir} does not exist.  exiting...")
+        return
+    os.makedirs(args.out_dir, exist_ok=True)
+    message(f"[+] waiting for breach record in {args.dir}")
+
+    generator = ReplayGenerator(args)
+    try:
+        asyncio.run(generator.run())
+    except KeyboardInterrupt:
+        message("[!] interrupted")
+    print(generator.limiter.limit.report())
+    print(generator.report())
+    if generator.condenser is not None:
+        print(generator.condenser.stats.report())
+    tracer.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Attack/defence replay runner.
+
+Runs every replay script written by ``22_generate_replay_script.py`` (or
+``05_generate_replay_script.sh``) against every opposing team once per tick:
+
+    python 23_run_replay.py replay.out --targets teams.txt \\
+        --tick 120 --deadline 100 --per-host 2 --concurrency 32
+
+* Scripts are started as ``python replay-….py --target_server <host>``, the
+  interface ``05_prompt_user.txt`` asks for.  Each runs in its own process
+  group, and the whole group is killed on ``--timeout`` or when the tick's
+  ``--deadline`` passes.  Attempts not started by the deadline are skipped.
+* ``--per-host`` bounds the number of simultaneous connections to one team,
+  and ``--concurrency`` bounds all of them together.
+* Identical scripts (``22`` writes the same code for deduplicated breaches)
+  run only once per target.  Scripts that captured flags before go first.
+* Flags found in the output go into a deduplicated submission queue.  A flag
+  that appears literally in the script is the recorded one and is ignored.
+  New flags are appended to ``--flags`` (JSONL).  With ``--submit-cmd`` they
+  are handed to the game server's submit tool, e.g.
+  ``--submit-cmd 'curl -s -d flag={flag} http://10.10.0.1/submit'``.
+  Submission runs alongside the ticks.  Failed submissions are retried with
+  back-off, and flags never submitted successfully are queued again on restart.
+* Output is read while the script runs, so a script that prints a flag and
+  then hangs (pwntools ``recvall()`` on a keep-alive connection) still
+  yields the flag when it is killed.
+* Latency, timeouts and flags are recorded per target and shown after every
+  tick and as a table at the end.
+
+For a dry run, ``--mock-server 127.0.0.1:8080`` starts a local TCP server
+that answers every request with a fresh flag.
+"""
+
+import os
+import re
+import glob
+import json
+import time
+import shlex
+import signal
+import asyncio
+import hashlib
+import secrets
+import argparse
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+# ------------------------------------------------------------
+# 3rd‑party imports
+# ------------------------------------------------------------
+from rich.console import Console
+from rich.table import Table as RichTable
+
+# ------------------------------------------------------------
+# Local helpers shared by the script_AI tools
+# ------------------------------------------------------------
+from instrumentation import tracer
+
+# ------------------------------------------------------------
+# Configuration
+# ------------------------------------------------------------
+FLAG_REGEX = "FLAG_[0-9a-zA-Z]+"
+DIR_REPLAY = "replay.out"
+REPLAY_PREFIX = "replay"
+DEFAULT_FLAGS_FILE = "flags.jsonl"
+
+TICK_S = 120.0
+TIMEOUT_S = 20.0                 # per attempt
+PER_HOST = 2                     # simultaneous scripts against one team
+DEFAULT_CONCURRENCY = 32
+SUBMIT_TIMEOUT_S = 10.0
+SUBMIT_RETRIES = 3               # extra submission attempts per flag and run
+SUBMIT_RETRY_S = 5.0             # first retry delay, doubled each time
+OUTPUT_LIMIT = 1_000_000         # bytes of script output searched for flags
+
+
+def message(text: str) -> None:
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S}  {text}", flush=True)
+
+
+@dataclass
+class ReplayScript:
+    path: str
+    digest: str
+    known_flags: Set[str]        # flags recorded in the script itself
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+
+@dataclass
+class Attempt:
+    tick: int
+    script: str
+    target: str
+    status: str                  # flag | noflag | timeout | error | skipped
+    latency_s: float = 0.0
+    flags: List[str] = field(default_factory=list)
+    returncode: Optional[int] = None
+
+
+@dataclass
+class TargetStats:
+    attempts: int = 0
+    flags: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    skipped: int = 0
+    latencies: List[float] = field(default_factory=list)
+
+    def add(self, a: Attempt) -> None:
+        if a.status == "skipped":
+            self.skipped += 1
+            return
+        self.attempts += 1
+        self.latencies.append(a.latency_s)
+        self.flags += len(a.flags)
+        self.timeouts += a.status == "timeout"
+        self.errors += a.status == "error"
+
+
+# ------------------------------------------------------------
+# Script / target discovery
+# ------------------------------------------------------------
+def load_scripts(replay_dir: str, prefix: str, flag_re: re.Pattern) -> List[ReplayScript]:
+    """Distinct replay scripts (by content) in ``replay_dir``."""
+    by_digest: Dict[str, ReplayScript] = {}
+    for path in sorted(glob.glob(os.path.join(replay_dir, f"{prefix}*.py"))):
+        try:
+            with open(path, "rb") as f:
+                code = f.read()
+        except OSError:
+            continue
+        digest = hashlib.sha256(code).hexdigest()[:16]
+        if digest not in by_digest:
+            known = set(flag_re.findall(code.decode("utf-8", "replace")))
+            by_digest[digest] = ReplayScript(path, digest, known)
+    return list(by_digest.values())
+
+
+def load_targets(path: Optional[str], extra: List[str]) -> List[str]:
+    targets = list(extra)
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    targets.append(line)
+    return list(dict.fromkeys(targets))
+
+
+# ------------------------------------------------------------
+# Flag submission queue
+# ------------------------------------------------------------
+class FlagQueue:
+    """Deduplicated flags; persisted as JSONL and optionally submitted.
+
+    A flag is logged as ``queued`` when found and ``submitted`` / ``failed``
+    after each submission attempt.  On start-up every flag whose last entry is
+    not ``submitted`` goes back into the queue (with ``--submit-cmd``).
+    """
+
+    def __init__(self, path: str, submit_cmd: Optional[str] = None) -> None:
+        self.path = path
+        self.submit_cmd = submit_cmd
+        self.seen: Set[str] = set()
+        self.submitted = 0
+        self.failed = 0
+        self.requeued = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._retries: Set[asyncio.Task] = set()
+        last: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        last[entry["flag"]] = entry
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        self.seen.update(last)
+        if submit_cmd:
+            for flag, entry in last.items():
+                if entry.get("status") != "submitted":
+                    self._queue.put_nowait((flag, entry.get("target", ""), 0))
+                    self.requeued += 1
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def _log(self, entry: dict) -> None:
+        entry["time"] = round(time.time(), 3)
+        self._fh.write(json.dumps(entry) + "\n")
+        self._fh.flush()
+
+    def put(self, flag: str, target: str, script: str) -> bool:
+        """Queue ``flag`` unless it was seen before; True when it is new."""
+        if flag in self.seen:
+            return False
+        self.seen.add(flag)
+        self._log({"flag": flag, "target": target, "script": script, "status": "queued"})
+        self._queue.put_nowait((flag, target, 0))
+        return True
+
+    async def _submit(self, flag: str, target: str) -> bool:
+        cmd = self.submit_cmd.replace("{flag}", shlex.quote(flag)).replace("{target}", shlex.quote(target))
+        with tracer.span("submit_flag", target=target) as sp:
+            proc = None
+            try:
+                proc = await asyncio.create_subprocess_shell(
+                    cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+                out, _ = await asyncio.wait_for(proc.communicate(), timeout=SUBMIT_TIMEOUT_S)
+                ok = proc.returncode == 0
+                reply = out.decode("utf-8", "replace").strip()[-200:]
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                ok, reply = False, "timeout"
+            except OSError as e:
+                ok, reply = False, str(e)
+            if not ok:
+                sp.status = "ERROR"
+        self._log({"flag": flag, "target": target, "status": "submitted" if ok else "failed", "reply": reply})
+        return ok
+
+    async def _retry(self, flag: str, target: str, attempt: int) -> None:
+        await asyncio.sleep(SUBMIT_RETRY_S * 2 ** (attempt - 1))
+        self._queue.put_nowait((flag, target, attempt))
+
+    async def run(self) -> None:
+        """Consumer task: submit flags one by one, in the order they were found."""
+        while True:
+            flag, target, attempt = await self._queue.get()
+            try:
+                if self.submit_cmd:
+                    if await self._submit(flag, target):
+                        self.submitted += 1
+                    elif attempt < SUBMIT_RETRIES:
+                        task = asyncio.create_task(self._retry(flag, target, attempt + 1))
+                        self._retries.add(task)
+                        task.add_done_callback(self._retries.discard)
+                    else:
+                        self.failed += 1
+            finally:
+                self._queue.task_done()
+
+    async def drain(self) -> None:
+        """Wait until every queued flag, retries included, has been handled."""
+        while True:
+            await self._queue.join()
+            if not self._retries:
+                return
+            await asyncio.gather(*self._retries)
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+# ------------------------------------------------------------
+# Running one script against one target
+# ------------------------------------------------------------
+async def run_replay(
+    script: ReplayScript,
+    target: str,
+    tick: int,
+    args: argparse.Namespace,
+    flag_re: re.Pattern,
+    deadline: float,
+) -> Attempt:
+    loop = asyncio.get_running_loop()
+    remaining = deadline - loop.time()
+    if remaining <= 0:
+        return Attempt(tick, script.name, target, "skipped")
+    timeout = min(args.timeout, remaining)
+
+    with tracer.span("replay", script=script.name, target=target) as sp:
+        started = time.perf_counter()
+        proc = None
+        buf = bytearray()
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                args.python, script.path, "--target_server", target,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                env={**os.environ, "PWNLIB_NOTERM": "1"},   # pwntools without a tty
+                start_new_session=True,
+            )
+            timed_out = False
+            try:
+                await asyncio.wait_for(_collect_output(proc, buf), timeout=timeout)
+            except asyncio.TimeoutError:
+                timed_out = True            # what was printed so far still counts
+            output = bytes(buf[-OUTPUT_LIMIT:]).decode("utf-8", "replace")
+            flags = sorted(set(flag_re.findall(output)) - script.known_flags)
+            status = "flag" if flags else "timeout" if timed_out else "noflag"
+            attempt = Attempt(tick, script.name, target, status,
+                              round(time.perf_counter() - started, 3), flags, proc.returncode)
+        except OSError:
+            attempt = Attempt(tick, script.name, target, "error", round(time.perf_counter() - started, 3))
+        finally:
+            if proc is not None and proc.returncode is None:
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                await proc.wait()
+        if attempt.status in ("timeout", "error"):
+            sp.status = "ERROR"
+        sp.set("flags", len(attempt.flags))
+    return attempt
+
+
+async def _collect_output(proc: asyncio.subprocess.Process, buf: bytearray) -> None:
+    """Append ``proc``'s output to ``buf`` as it arrives (last ``OUTPUT_LIMIT`` bytes kept)."""
+    while True:
+        chunk = await proc.stdout.read(65536)
+        if not chunk:
+            break
+        buf.extend(chunk)
+        if len(buf) > 2 * OUTPUT_LIMIT:
+            del buf[:-OUTPUT_LIMIT]
+    await proc.wait()
+
+
+class ReplayRunner:
+    def __init__(self, args: argparse.Namespace, targets: List[str], flags: FlagQueue) -> None:
+        self.args = args
+        self.targets = targets
+        self.flags = flags
+        self.flag_re = re.compile(args.flag_regex)
+        self.stats: Dict[str, TargetStats] = {t: TargetStats() for t in targets}
+        self.script_hits: Dict[str, int] = {}      # digest → flags captured so far
+        self.results_fh = open(args.results, "a", encoding="utf-8") if args.results else None
+
+    async def tick(self, n: int) -> None:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.args.deadline
+        scripts = load_scripts(self.args.dir, self.args.prefix, self.flag_re)
+        if not scripts:
+            message(f"[-] Tick {n}: no replay scripts in {self.args.dir}")
+            return
+        scripts.sort(key=lambda s: -self.script_hits.get(s.digest, 0))
+
+        overall = asyncio.Semaphore(self.args.concurrency)
+        per_host = {t: asyncio.Semaphore(self.args.per_host) for t in self.targets}
+
+        async def one(script: ReplayScript, target: str) -> Attempt:
+            async with per_host[target], overall:
+                return await run_replay(script, target, n, self.args, self.flag_re, deadline)
+
+        digests = {s.name: s.digest for s in scripts}
+        jobs = [asyncio.create_task(one(s, t)) for s in scripts for t in self.targets]
+        new_flags = 0
+        statuses: Counter = Counter()
+        for done in asyncio.as_completed(jobs):
+            a = await done
+            statuses[a.status] += 1
+            self.stats[a.target].add(a)
+            digest = digests[a.script]
+            self.script_hits[digest] = self.script_hits.get(digest, 0) + len(a.flags)
+            for flag in a.flags:
+                if self.flags.put(flag, a.target, a.script):
+                    new_flags += 1
+                    message(f"[!] {flag} from {a.target} via {a.script} ({a.latency_s:.2f}s)")
+            if self.results_fh:
+                self.results_fh.write(json.dumps(asdict(a)) + "\n")
+        if self.results_fh:
+            self.results_fh.flush()
+
+        detail = ", ".join(f"{v} {k}" for k, v in sorted(statuses.items()))
+        message(f"[+] Tick {n}: {len(scripts)} script(s) × {len(self.targets)} target(s) "
+                f"in {loop.time() - started:.1f}s – {new_flags} new flag(s) ({detail})")
+
+    async def run(self) -> None:
+        if self.flags.requeued:
+            message(f"[+] {self.flags.requeued} flag(s) from an earlier run not yet submitted – re-queued")
+        consumer = asyncio.create_task(self.flags.run())
+        loop = asyncio.get_running_loop()
+        n = 0
+        try:
+            while True:
+                n += 1
+                tick_start = loop.time()
+                await self.tick(n)                  # submissions run alongside in ``consumer``
+                if self.args.ticks and n >= self.args.ticks:
+                    await self.flags.drain()
+                    break
+                await asyncio.sleep(max(0.0, tick_start + self.args.tick - loop.time()))
+        finally:
+            consumer.cancel()
+            if self.results_fh:
+                self.results_fh.close()
+
+    def print_stats(self) -> None:
+        rt = RichTable(title="Replay targets", show_header=True, header_style="bold magenta")
+        for col in ("target", "attempts", "flags", "timeouts", "errors", "skipped", "mean s", "max s"):
+            rt.add_column(col, justify="left" if col == "target" else "right")
+        for target, st in self.stats.items():
+            lat = st.latencies
+            rt.add_row(target, str(st.attempts), str(st.flags), str(st.timeouts), str(st.errors),
+                       str(st.skipped),
+                       f"{sum(lat) / len(lat):.2f}" if lat else "-",
+                       f"{max(lat):.2f}" if lat else "-")
+        console = Console()
+        console.print(rt)
+        console.print(f"[bold]{len(self.flags.seen)} distinct flag(s) known, "
+                      f"{self.flags.submitted} submitted, {self.flags.failed} given up after {SUBMIT_RETRIES + 1} failed attempt(s)[/]")
+
+
+# ------------------------------------------------------------
+# Mock server for dry runs
+# ------------------------------------------------------------
+async def start_mock_server(spec: str) -> asyncio.AbstractServer:
+    """TCP server that answers each request with a fresh flag (HTTP‑shaped)."""
+    host, _, port = spec.rpartition(":")
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while await reader.read(65536):
+                body = f"FLAG_{secrets.token_hex(8)}\n".encode()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n"
+                             b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host or "127.0.0.1", int(port))
+    message(f"[+] mock server listening on {host or '127.0.0.1'}:{port}")
+    return server
+
+
+# ------------------------------------------------------------
+# CLI handling
+# ------------------------------------------------------------
+def parse_cli() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run replay scripts against all target hosts every tick and collect flags."
+    )
+    parser.add_argument("dir", nargs="?", default=DIR_REPLAY,
+                        help=f"Directory with the replay scripts (default: {DIR_REPLAY}).")
+    parser.add_argument("-p", "--prefix", default=REPLAY_PREFIX,
+                        help=f"Prefix of the replay scripts (default: {REPLAY_PREFIX}).")
+    parser.add_argument("--targets", default=None, metavar="FILE",
+                        help="File with one target host per line ('#' starts a comment).")
+    parser.add_argument("-T", "--target", action="append", default=[], metavar="HOST",
+                        help="Target host; may be repeated and combined with --targets.")
+    parser.add_argument("-t", "--flag-regex", default=FLAG_REGEX,
+                        help=f"Flag in regular expression form (default: {FLAG_REGEX}).")
+    parser.add_argument("--tick", type=float, default=TICK_S, metavar="SEC",
+                        help=f"Length of a game tick (default: {TICK_S}).")
+    parser.add_argument("--deadline", type=float, default=None, metavar="SEC",
+                        help="Stop starting / kill attempts this long after the tick began (default: tick − 10 %%).")
+    parser.add_argument("--ticks", type=int, default=0,
+                        help="Number of ticks to run; 0 runs until interrupted (default: 0).")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_S, metavar="SEC",
+                        help=f"Per‑attempt timeout (default: {TIMEOUT_S}).")
+    parser.add_argument("--per-host", type=int, default=PER_HOST,
+                        help=f"Simultaneous scripts against one target (default: {PER_HOST}).")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Simultaneous scripts in total (default: {DEFAULT_CONCURRENCY}).")
+    parser.add_argument("--python", default="python3",
+                        help="Interpreter with pwntools installed (default: python3).")
+    parser.add_argument("--flags", default=DEFAULT_FLAGS_FILE, metavar="FILE",
+                        help=f"JSONL log of captured flags, also used for deduplication (default: {DEFAULT_FLAGS_FILE}).")
+    parser.add_argument("--submit-cmd", default=None, metavar="CMD",
+                        help="Shell command run for every new flag; {flag} and {target} are substituted.")
+    parser.add_argument("--results", default=None, metavar="FILE",
+                        help="Append every attempt as a JSON line to FILE.")
+    parser.add_argument("--mock-server", default=None, metavar="[HOST:]PORT",
+                        help="Start a local server that answers with fresh flags (dry runs / tests).")
+    parser.add_argument("--trace", type=str, default=None, metavar="FILE",
+                        help=("Append per‑stage spans (OpenTelemetry‑shaped JSON lines) to FILE. "
+                              "The CTF_TRACE_FILE environment variable does the same."))
+    args = parser.parse_args()
+    if args.deadline is None:
+        args.deadline = args.tick * 0.9
+    return args
+
+
+async def _serve(args: argparse.Namespace, runner: ReplayRunner) -> None:
+    mock = await start_mock_server(args.mock_server) if args.mock_server else None
+    try:
+        await runner.run()
+    finally:
+        if mock is not None:
+            mock.close()
+            await mock.wait_closed()
+
+
+def main() -> None:
+    args = parse_cli()
+    tracer.configure(args.trace)
+
+    targets = load_targets(args.targets, args.target)
+    if not targets:
+        message("[-] no targets – give --targets FILE or -T HOST")
+        return
+    message(f"[+] {len(targets)} target(s), tick {args.tick:.0f}s, deadline {args.deadline:.0f}s, "
+            f"{args.per_host} per host, {args.concurrency} in total")
+
+    flags = FlagQueue(args.flags, args.submit_cmd)
+    runner = ReplayRunner(args, targets, flags)
+    try:
+        asyncio.run(_serve(args, runner))
+    except KeyboardInterrupt:
+        message("[!] interrupted")
+    finally:
+        flags.close()
+    runner.print_stats()
+    tracer.finish()
+
+
+if __name__ == "__main__":
+    main()
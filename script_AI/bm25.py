@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Sparse BM25 index over the chunk store, and reciprocal-rank fusion.
+
+Dense embeddings are weak on exact tokens: acronyms (``AJP-10.1``,
+``StratCom``), paragraph numbers (``0123``), code words.  ``13_embedding.py``
+builds this inverted index next to the FAISS index, and ``14_retrieve.py``
+queries both and fuses the two rankings:
+
+    bm25 = BM25Index.build(chunks)            # chunk id == position in the list
+    bm25.save("vecstore.out/bm25_index.json")
+    ...
+    hits = BM25Index.load(path).search("AJP-10.1 StratCom", k=30)
+    fused = reciprocal_rank_fusion([dense_ids, [i for i, _ in hits]])
+
+Tokens are lower-cased.  Compound tokens such as ``ajp-10.1`` are indexed
+whole *and* as their parts (``ajp``, ``10``, ``1``), so an exact reference
+scores highest but partial matches still count.  Numbers keep their leading
+zeros.  Only the standard library is used, and the index is plain JSON.
+"""
+
+import heapq
+import json
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+BM25_FILE = "bm25_index.json"
+K1 = 1.2
+B = 0.75
+RRF_K = 60                       # rank constant from Cormack et al. (2009)
+
+_TERM_RE = re.compile(r"[^\W_]+(?:[-./:][^\W_]+)*")
+_SPLIT_RE = re.compile(r"[-./:]")
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can could do does for from had has have how if in into is it
+its may might must no not of on or shall should so such than that the their them then there these
+they this those to was were what when where which while who why will with would
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Index / query terms of ``text`` (compound tokens plus their parts)."""
+    terms: List[str] = []
+    for m in _TERM_RE.finditer(text):
+        token = m.group().lower()
+        parts = _SPLIT_RE.split(token)
+        if len(parts) > 1:
+            terms.append(token)
+        terms.extend(p for p in parts if p not in STOPWORDS)
+    return terms
+
+
+class BM25Index:
+    """Okapi BM25 over an in-memory inverted index (term → [(doc, tf), …])."""
+
+    def __init__(self, k1: float = K1, b: float = B) -> None:
+        self.k1 = k1
+        self.b = b
+        self.doc_len: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._avg_len = 0.0
+
+    @classmethod
+    def build(cls, docs: Iterable[str], k1: float = K1, b: float = B) -> "BM25Index":
+        index = cls(k1, b)
+        for doc_id, text in enumerate(docs):
+            counts = Counter(tokenize(text))
+            index.doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                index.postings.setdefault(term, []).append((doc_id, tf))
+        index._update_stats()
+        return index
+
+    def _update_stats(self) -> None:
+        self._avg_len = (sum(self.doc_len) / len(self.doc_len)) if self.doc_len else 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1.0 + (len(self.doc_len) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Top ``k`` ``(doc_id, score)`` pairs, best first."""
+        scores: Dict[int, float] = {}
+        avg = self._avg_len or 1.0
+        for term, qtf in Counter(tokenize(query)).items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_id, tf in postings:
+                norm = self.k1 * (1.0 - self.b + self.b * self.doc_len[doc_id] / avg)
+                scores[doc_id] = scores.get(doc_id, 0.0) + qtf * idf * tf * (self.k1 + 1.0) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    # --------------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------------
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "doc_len": self.doc_len,
+                       "postings": self.postings}, f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(data["k1"], data["b"])
+        index.doc_len = data["doc_len"]
+        index.postings = {t: [tuple(p) for p in plist] for t, plist in data["postings"].items()}
+        index._update_stats()
+        return index
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]],
+    k: int = RRF_K,
+    weights: Optional[Sequence[float]] = None,
+) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists: ``score(d) = Σ w / (k + rank(d))``, best first."""
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
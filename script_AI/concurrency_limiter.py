@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Adaptive concurrency limit for requests to the LM Studio server.
+
+A fixed worker count either leaves a big GPU server idle or queues requests
+on a small one until time-to-first-token explodes.  ``AdaptiveLimit`` follows
+the AIMD flavour of Netflix' *concurrency-limits*:
+
+* every finished request reports its latency – the time to first token, which
+  is where server-side queueing shows up;
+* while latency stays within ``tolerance`` × the best latency seen and the
+  limit is actually used, the limit grows by one (additive increase);
+* latency above that shrinks it by ``latency_backoff``, and an overload signal
+  (HTTP 429 / 503, timeouts) by ``backoff`` (multiplicative decrease).
+
+``ThreadLimiter`` and ``AsyncLimiter`` gate threads and asyncio tasks;
+``limited_chat_completion`` / ``async_limited_chat_completion`` wrap the timed
+completion calls and put the current limit on the span
+(``concurrency_limit`` – shown as *limit* in the timing summary);
+``limited_call`` does the same for any other blocking request.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+from instrumentation import async_timed_chat_completion, timed_chat_completion, tracer
+
+OVERLOAD_STATUS = (429, 503)
+BASELINE_DRIFT = 0.02          # lets a stale minimum latency creep up slowly
+
+T = TypeVar("T")
+
+
+class AdaptiveLimit:
+    """The limit itself – no locking, fed by the limiter wrappers below."""
+
+    def __init__(
+        self,
+        initial: int = 2,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        tolerance: float = 2.0,
+        latency_backoff: float = 0.9,
+        backoff: float = 0.5,
+    ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.limit = float(min(max(initial, min_limit), self.max_limit))
+        self.tolerance = tolerance
+        self.latency_backoff = latency_backoff
+        self.backoff = backoff
+        self.baseline: Optional[float] = None
+        self.samples = 0
+        self.drops = 0
+        self.peak = self.current
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    def on_sample(self, latency_s: float, overloaded: bool, inflight: int) -> None:
+        self.samples += 1
+        if overloaded:
+            self.drops += 1
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            return
+
+        if self.baseline is None or latency_s < self.baseline:
+            self.baseline = latency_s
+        else:
+            self.baseline += BASELINE_DRIFT * (latency_s - self.baseline)
+
+        if latency_s > self.baseline * self.tolerance:
+            self.limit = max(self.min_limit, self.limit * self.latency_backoff)
+        elif inflight * 2 >= self.limit:          # only grow a limit that is being used
+            self.limit = min(self.max_limit, self.limit + 1)
+        self.peak = max(self.peak, self.current)
+
+    def report(self) -> str:
+        base = f"{self.baseline:.2f}s" if self.baseline is not None else "-"
+        return (f"[+] Concurrency: limit {self.current} (peak {self.peak}, bounds "
+                f"{self.min_limit}-{self.max_limit}), {self.samples} sample(s), "
+                f"{self.drops} overload signal(s), baseline latency {base}")
+
+
+def is_overload(exc: BaseException) -> bool:
+    """429 / 503 responses and timeouts mean: back off."""
+    status = getattr(exc, "status_code", None)
+    return status in OVERLOAD_STATUS or type(exc).__name__ in ("APITimeoutError", "TimeoutError")
+
+
+class ThreadLimiter:
+    """Blocks threads while ``inflight`` ≥ the adaptive limit."""
+
+    def __init__(self, limit: AdaptiveLimit) -> None:
+        self.limit = limit
+        self.inflight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.inflight >= self.limit.current:
+                self._cond.wait()
+            self.inflight += 1
+
+    def release(self, latency_s: float, overloaded: bool = False) -> None:
+        with self._cond:
+            self.limit.on_sample(latency_s, overloaded, self.inflight)
+            self.inflight -= 1
+            self._cond.notify_all()
+
+
+class AsyncLimiter:
+    """Same as ``ThreadLimiter`` for asyncio tasks (one event loop)."""
+
+    def __init__(self, limit: AdaptiveLimit) -> None:
+        self.limit = limit
+        self.inflight = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.inflight < self.limit.current)
+            self.inflight += 1
+
+    async def release(self, latency_s: float, overloaded: bool = False) -> None:
+        async with self._cond:
+            self.limit.on_sample(latency_s, overloaded, self.inflight)
+            self.inflight -= 1
+            self._cond.notify_all()
+
+
+def _latency(started: float) -> float:
+    """Time to first token from the current span, else the whole call."""
+    sp = tracer.current()
+    ttft = sp.attributes.get("ttft_s") if sp is not None else None
+    return ttft if ttft is not None else time.perf_counter() - started
+
+
+def _mark_span(limiter) -> None:
+    sp = tracer.current()
+    if sp is not None:
+        sp.set("concurrency_limit", limiter.limit.current)
+        sp.set("inflight", limiter.inflight)
+
+
+def limited_call(limiter: ThreadLimiter, func: Callable[..., T], *args, **kwargs) -> T:
+    """``func(*args, **kwargs)`` behind an adaptive ``ThreadLimiter`` slot (any blocking request)."""
+    limiter.acquire()
+    _mark_span(limiter)
+    started = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as exc:
+        limiter.release(time.perf_counter() - started, overloaded=is_overload(exc))
+        raise
+    limiter.release(_latency(started))
+    return result
+
+
+def limited_chat_completion(limiter: ThreadLimiter, client, **create_kwargs) -> Optional[str]:
+    """``timed_chat_completion`` behind an adaptive ``ThreadLimiter`` slot."""
+    return limited_call(limiter, timed_chat_completion, client, **create_kwargs)
+
+
+async def async_limited_chat_completion(limiter: AsyncLimiter, client, **create_kwargs) -> Optional[str]:
+    """``async_timed_chat_completion`` behind an adaptive ``AsyncLimiter`` slot."""
+    await limiter.acquire()
+    _mark_span(limiter)
+    started = time.perf_counter()
+    try:
+        reply = await async_timed_chat_completion(client, **create_kwargs)
+    except Exception as exc:
+        await limiter.release(time.perf_counter() - started, overloaded=is_overload(exc))
+        raise
+    await limiter.release(_latency(started))
+    return reply
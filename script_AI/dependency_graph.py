@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Import / require / include dependency graph for a set of source files.
+
+Cross-file vulnerabilities (a route passing ``req.query`` into a helper that
+builds SQL, a template included with unescaped data …) are only visible to
+the model when both files are in the same prompt.  This module:
+
+* extracts import edges with small per-language parsers, registered by file
+  extension through ``register_import_parser`` – JS/TS/EJS are built in,
+  Python and PHP are provided as plugins of the same kind;
+* resolves them to the files that were actually collected;
+* finds strongly connected components (Tarjan) and weakly connected
+  clusters;
+* packs clusters into size-limited bins (first-fit decreasing) so that a
+  cluster shares a chunk whenever it fits, and is split along dependency
+  order otherwise.
+
+Only the standard library is used.
+"""
+
+import os
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+Entry = Tuple[str, str]                       # (relative_path, content)
+ImportParser = Callable[[str, str], List[str]]
+
+# extension (lower-case, with dot) → parser returning raw import specifiers
+IMPORT_PARSERS: Dict[str, ImportParser] = {}
+
+
+def register_import_parser(*exts: str) -> Callable[[ImportParser], ImportParser]:
+    """
+    Decorator: register ``func(rel_path, content) -> [specifier, ...]`` for the
+    given extensions.  Relative specifiers (``./x``, ``../y``) are resolved by
+    the caller; parsers only have to return what is written in the source.
+    Bare specifiers (``express``, ``app/models``) only resolve to the file at
+    exactly that path, so a parser whose language resolves paths relative to
+    the including file should return them with a ``./`` prefix.
+    """
+    def decorator(func: ImportParser) -> ImportParser:
+        for ext in exts:
+            IMPORT_PARSERS[ext.lower()] = func
+        return func
+    return decorator
+
+
+# ------------------------------------------------------------
+# Built-in parsers
+# ------------------------------------------------------------
+_JS_IMPORT_RE = re.compile(
+    r"""\brequire\s*\(\s*['"`]([^'"`]+)['"`]\s*\)"""                     # require('x')
+    r"""|\bimport\s*\(\s*['"`]([^'"`]+)['"`]\s*\)"""                     # import('x')
+    r"""|\b(?:import|export)\s+(?:[\w*{}\s,$]+?\s+from\s+)?['"]([^'"]+)['"]"""  # import/export … from 'x'
+)
+_EJS_INCLUDE_RE = re.compile(
+    r"""\binclude\s*\(\s*['"]([^'"]+)['"]"""                              # <%- include('x') %>
+    r"""|<%[-=_]?\s*include\s+([^\s%]+)"""                               # legacy <% include x %>
+)
+
+
+@register_import_parser(".js", ".mjs", ".cjs", ".jsx", ".ts", ".tsx")
+def parse_js_imports(rel_path: str, content: str) -> List[str]:
+    specs = [next(g for g in m.groups() if g) for m in _JS_IMPORT_RE.finditer(content)]
+    # A bare name is an npm package or a Node built-in ('express', 'path'), never a local file
+    return [spec for spec in specs if "/" in spec]
+
+
+def _relative(spec: str) -> str:
+    return spec if spec.startswith((".", "/")) else "./" + spec
+
+
+@register_import_parser(".ejs")
+def parse_ejs_imports(rel_path: str, content: str) -> List[str]:
+    # include() paths are relative to the including template
+    specs = [_relative(next(g for g in m.groups() if g)) for m in _EJS_INCLUDE_RE.finditer(content)]
+    # Scriptlets may still require() helpers
+    return specs + parse_js_imports(rel_path, content)
+
+
+# --- Python plugin --------------------------------------------------------
+_PY_IMPORT_RE = re.compile(r"^\s*import\s+([\w.]+(?:\s*,\s*[\w.]+)*)", re.MULTILINE)
+_PY_FROM_RE = re.compile(r"^\s*from\s+(\.*)([\w.]*)\s+import\s+\(?\s*([\w\s,]+)", re.MULTILINE)
+
+
+@register_import_parser(".py")
+def parse_python_imports(rel_path: str, content: str) -> List[str]:
+    specs: List[str] = []
+    for m in _PY_IMPORT_RE.finditer(content):
+        for name in m.group(1).split(","):
+            specs.append(name.strip().replace(".", "/"))
+    for m in _PY_FROM_RE.finditer(content):
+        dots, module, names = m.groups()
+        prefix = ("./" if len(dots) == 1 else "../" * (len(dots) - 1)) if dots else ""
+        base = prefix + module.replace(".", "/")
+        if module:
+            specs.append(base)
+        # ``from pkg import mod`` may import sub-modules
+        for name in names.split(","):
+            name = name.strip()
+            if name:
+                specs.append(f"{base}/{name}" if module else f"{prefix}{name}")
+    return specs
+
+
+# --- PHP plugin -----------------------------------------------------------
+_PHP_INCLUDE_RE = re.compile(
+    r"""\b(?:include|require)(?:_once)?\s*\(?\s*(?:__DIR__\s*\.\s*)?['"]([^'"]+)['"]"""
+)
+
+
+@register_import_parser(".php", ".phtml", ".inc")
+def parse_php_imports(rel_path: str, content: str) -> List[str]:
+    return [_relative(m.group(1)) for m in _PHP_INCLUDE_RE.finditer(content)]
+
+
+# ------------------------------------------------------------
+# Graph construction
+# ------------------------------------------------------------
+def module_keys(rel_path: str) -> List[str]:
+    """Paths under which ``rel_path`` can be imported, e.g. ``lib/index.js`` → ``lib/index``, ``lib``."""
+    stem, _ = os.path.splitext(rel_path.replace(os.sep, "/"))
+    keys = [stem]
+    if os.path.basename(stem) in ("index", "__init__"):
+        parent = os.path.dirname(stem)
+        if parent:
+            keys.append(parent)
+    return keys
+
+
+def import_targets(rel_path: str, content: str) -> List[Tuple[str, bool]]:
+    """
+    Extension-less import targets of one file as ``(path, relative)``.
+    Relative specifiers are resolved against the importing file's directory.
+    """
+    parser = IMPORT_PARSERS.get(os.path.splitext(rel_path)[1].lower())
+    if parser is None:
+        return []
+    base = os.path.dirname(rel_path.replace(os.sep, "/"))
+    targets = []
+    for spec in parser(rel_path, content):
+        spec = spec.replace("\\", "/")
+        if spec.startswith("/"):
+            spec = spec.lstrip("/")
+        stem, ext = os.path.splitext(spec)
+        if ext.lower() not in IMPORT_PARSERS and ext.lower() not in (".json", ".html"):
+            stem = spec                      # "jquery.min" style names keep their dot
+        relative = stem.startswith(".")
+        if relative:
+            stem = os.path.normpath(os.path.join(base, stem)).replace(os.sep, "/")
+        targets.append((stem, relative))
+    return targets
+
+
+def build_dependency_graph(entries: Sequence[Entry]) -> List[Set[int]]:
+    """
+    Return adjacency sets ``edges[i] = {j, ...}`` meaning *entry i imports entry j*.
+    Unresolvable imports (packages, missing files) are ignored.
+
+    A relative import that misses its exact path falls back to any file of the
+    same name (the collected tree may be rooted elsewhere than the app); bare
+    specifiers such as ``require('path')`` never do, or every package would
+    resolve to a local ``path.js``.
+    """
+    key_to_idx: Dict[str, int] = {}
+    name_to_idx: Dict[str, int] = {}
+    for idx, (path, _content) in enumerate(entries):
+        for key in module_keys(path):
+            key_to_idx.setdefault(key, idx)
+            name_to_idx.setdefault(os.path.basename(key), idx)
+
+    edges: List[Set[int]] = [set() for _ in entries]
+    for idx, (path, content) in enumerate(entries):
+        for target, relative in import_targets(path, content):
+            hit = key_to_idx.get(target)
+            if hit is None and relative:
+                hit = name_to_idx.get(os.path.basename(target))
+            if hit is not None and hit != idx:
+                edges[idx].add(hit)
+    return edges
+
+
+def strongly_connected_components(edges: Sequence[Set[int]]) -> List[List[int]]:
+    """Iterative Tarjan; components are returned in reverse topological order."""
+    index: Dict[int, int] = {}
+    low: Dict[int, int] = {}
+    on_stack: Set[int] = set()
+    stack: List[int] = []
+    components: List[List[int]] = []
+    counter = 0
+
+    for root in range(len(edges)):
+        if root in index:
+            continue
+        work = [(root, iter(sorted(edges[root])))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, it = work[-1]
+            advanced = False
+            for nxt in it:
+                if nxt not in index:
+                    index[nxt] = low[nxt] = counter
+                    counter += 1
+                    stack.append(nxt)
+                    on_stack.add(nxt)
+                    work.append((nxt, iter(sorted(edges[nxt]))))
+                    advanced = True
+                    break
+                if nxt in on_stack:
+                    low[node] = min(low[node], index[nxt])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                comp = []
+                while True:
+                    w = stack.pop()
+                    on_stack.discard(w)
+                    comp.append(w)
+                    if w == node:
+                        break
+                components.append(sorted(comp))
+    return components
+
+
+def dependency_clusters(edges: Sequence[Set[int]]) -> List[List[int]]:
+    """
+    Group entries into weakly connected clusters.  Inside a cluster, files are
+    ordered importer-first (depth-first over the SCC condensation, starting at
+    files nobody imports), with every strongly connected component kept
+    contiguous – so splitting a cluster never separates a cycle.
+    """
+    n = len(edges)
+    sccs = strongly_connected_components(edges)
+    comp_of = [0] * n
+    for c, members in enumerate(sccs):
+        for m in members:
+            comp_of[m] = c
+
+    comp_edges: List[Set[int]] = [set() for _ in sccs]
+    comp_indeg = [0] * len(sccs)
+    for i in range(n):
+        for j in edges[i]:
+            a, b = comp_of[i], comp_of[j]
+            if a != b and b not in comp_edges[a]:
+                comp_edges[a].add(b)
+                comp_indeg[b] += 1
+
+    # Weakly connected components via union-find over the condensation
+    parent = list(range(len(sccs)))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, outs in enumerate(comp_edges):
+        for b in outs:
+            parent[find(a)] = find(b)
+
+    # DFS emission order: roots first, ordered by their smallest entry index
+    comp_order = sorted(range(len(sccs)), key=lambda c: (comp_indeg[c] != 0, sccs[c][0]))
+    emitted: Set[int] = set()
+    by_cluster: Dict[int, List[int]] = {}
+    for start in comp_order:
+        if start in emitted:
+            continue
+        todo = [start]
+        while todo:
+            c = todo.pop()
+            if c in emitted:
+                continue
+            emitted.add(c)
+            by_cluster.setdefault(find(c), []).extend(sccs[c])
+            todo.extend(sorted(comp_edges[c], key=lambda x: sccs[x][0], reverse=True))
+
+    clusters = list(by_cluster.values())
+    clusters.sort(key=min)
+    return clusters
+
+
+def pack_by_dependencies(
+    entries: Sequence[Entry],
+    max_bytes: int,
+    size_of: Callable[[Entry], int],
+    priority: Optional[Sequence[float]] = None,
+) -> List[List[Entry]]:
+    """
+    Pack ``entries`` into bins of at most ``max_bytes`` (as measured by
+    ``size_of``) so that dependency clusters share a bin whenever possible.
+
+    * Clusters that fit are placed first-fit-decreasing.
+    * Oversized clusters are cut along their importer-first order.
+    * Bins are returned ordered by their best ``priority`` (e.g. relevance
+      scores aligned with ``entries``); without priorities the original
+      entry order decides.
+    """
+    edges = build_dependency_graph(entries)
+    sizes = [size_of(e) for e in entries]
+
+    pieces: List[List[int]] = []
+    for cluster in dependency_clusters(edges):
+        piece: List[int] = []
+        used = 0
+        for i in cluster:
+            if piece and used + sizes[i] > max_bytes:
+                pieces.append(piece)
+                piece, used = [], 0
+            piece.append(i)
+            used += sizes[i]
+        if piece:
+            pieces.append(piece)
+
+    bins: List[List[int]] = []
+    bin_used: List[int] = []
+    for piece in sorted(pieces, key=lambda p: -sum(sizes[i] for i in p)):
+        need = sum(sizes[i] for i in piece)
+        for b, used in enumerate(bin_used):
+            if used + need <= max_bytes:
+                bins[b].extend(piece)
+                bin_used[b] += need
+                break
+        else:
+            bins.append(list(piece))
+            bin_used.append(need)
+
+    if priority is not None:
+        bins.sort(key=lambda b: -max(priority[i] for i in b))
+    else:
+        bins.sort(key=min)
+    return [[entries[i] for i in b] for b in bins]
+
+
+def count_cross_edges(bins: Iterable[Sequence[Entry]]) -> Tuple[int, int]:
+    """Return ``(edges inside a bin, edges crossing bins)`` – handy for reporting."""
+    bins = [list(b) for b in bins]
+    flat = [e for b in bins for e in b]
+    bin_of = [k for k, b in enumerate(bins) for _ in b]
+    edges = build_dependency_graph(flat)
+    inside = crossing = 0
+    for i, outs in enumerate(edges):
+        for j in outs:
+            if bin_of[i] == bin_of[j]:
+                inside += 1
+            else:
+                crossing += 1
+    return inside, crossing
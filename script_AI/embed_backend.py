@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Inference backend of the embedding model (PyTorch, ONNX Runtime, int8).
+
+On machines without a GPU, ``SentenceTransformer(MODEL_DIR)`` runs
+embeddinggemma-300m in plain PyTorch FP32, and query encoding dominates
+retrieval latency.  sentence-transformers (>= 3.2) can run the same model on
+ONNX Runtime instead.  ``load_model`` selects the backend:
+
+* ``torch``     – as before;
+* ``onnx``      – FP32 graph on ONNX Runtime;
+* ``onnx-int8`` – the ONNX graph with dynamic int8 quantisation of the
+  weights, for the instruction set of this CPU (AVX2 / AVX-512 / VNNI / ARM64).
+
+The export happens once, on first use.  It is written next to the local
+model, in ``models.work/<model>-onnx``, and the original model directory is
+left untouched.  It needs ``pip install "sentence-transformers[onnx]"``
+(optimum + onnxruntime).
+
+``compare_backends`` is the parity check and benchmark used by
+``14_retrieve.py --check-backend``.  It reports the cosine similarity of
+each backend's embeddings against PyTorch, single-query latency, and batch
+throughput.
+"""
+
+import os
+import platform
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from instrumentation import tracer
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+# Minimum cosine similarity to the PyTorch embedding that still counts as parity
+PARITY_MIN_COSINE = {"torch": 1.0, "onnx": 0.999, "onnx-int8": 0.98}
+LATENCY_RUNS = 20
+
+
+def onnx_dir(model_dir: str) -> str:
+    return model_dir.rstrip("/\\") + "-onnx"
+
+
+def quantization_config() -> str:
+    """Dynamic-quantisation target matching this CPU."""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            flags = f.read()
+    except OSError:
+        return "avx2"
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512f" in flags:
+        return "avx512"
+    return "avx2"
+
+
+def prepare(model_dir: str, backend: str = "torch") -> Tuple[str, Dict]:
+    """Model path and ``SentenceTransformer`` kwargs for ``backend``, exporting on first use."""
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend {backend!r} (use one of {BACKENDS})")
+    if backend == "torch":
+        return model_dir, {}
+
+    from sentence_transformers import SentenceTransformer
+
+    target = onnx_dir(model_dir)
+    if not os.path.exists(os.path.join(target, "onnx", "model.onnx")):
+        with tracer.span("export_onnx"):
+            SentenceTransformer(model_dir, backend="onnx", device="cpu").save_pretrained(target)
+    if backend == "onnx":
+        return target, {"backend": "onnx"}
+
+    config = quantization_config()
+    file_name = f"onnx/model_qint8_{config}.onnx"
+    if not os.path.exists(os.path.join(target, file_name)):
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        with tracer.span("quantize_onnx", config=config):
+            export_dynamic_quantized_onnx_model(
+                SentenceTransformer(target, backend="onnx", device="cpu"), config, target)
+    return target, {"backend": "onnx", "model_kwargs": {"file_name": file_name}}
+
+
+def load_model(model_dir: str, backend: str = "torch", threads: Optional[int] = None):
+    """``SentenceTransformer`` on CPU; ``threads`` caps ONNX Runtime's intra-op pool."""
+    from sentence_transformers import SentenceTransformer
+
+    path, kwargs = prepare(model_dir, backend)
+    if threads and backend != "torch":
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        kwargs.setdefault("model_kwargs", {})["session_options"] = options
+    return SentenceTransformer(path, device="cpu", **kwargs)
+
+
+# ------------------------------------------------------------
+# Parity check / benchmark
+# ------------------------------------------------------------
+def _cosines(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+
+def _latency_ms(model, query: str, runs: int) -> List[float]:
+    model.encode([query])                        # warm-up (graph / kernel caches)
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        model.encode([query])
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def compare_backends(
+    model_dir: str,
+    backends: Sequence[str],
+    texts: Sequence[str],
+    query: str,
+    runs: int = LATENCY_RUNS,
+) -> List[Dict]:
+    """Parity with PyTorch, query latency and throughput of every backend."""
+    rows = []
+    reference = None
+    for backend in ["torch"] + [b for b in backends if b != "torch"]:
+        with tracer.span("load_backend", backend=backend):
+            started = time.perf_counter()
+            model = load_model(model_dir, backend)
+            load_s = time.perf_counter() - started
+        latency = _latency_ms(model, query, runs)
+        with tracer.span("encode_chunks", backend=backend, chunks=len(texts)):
+            started = time.perf_counter()
+            vectors = model.encode(list(texts), convert_to_numpy=True, show_progress_bar=False)
+            batch_s = time.perf_counter() - started
+        if reference is None:
+            reference = vectors
+        cos = _cosines(reference, vectors)
+        rows.append({
+            "backend": backend,
+            "load_s": load_s,
+            "p50_ms": float(np.percentile(latency, 50)),
+            "p95_ms": float(np.percentile(latency, 95)),
+            "chunks_per_s": len(texts) / batch_s,
+            "min_cos": float(cos.min()),
+            "mean_cos": float(cos.mean()),
+            "parity": bool(cos.min() >= PARITY_MIN_COSINE[backend] - 1e-6),
+        })
+        del model
+    return rows
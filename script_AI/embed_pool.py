@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Length-bucketed, multi-process CPU embedding for ``13_embedding.py``.
+
+Doctrine chunks range from a few tokens to ``MAX_TOKENS`` (4096).  Plain
+``embed_model.encode(chunks)`` uses fixed batches of 32 ordered by character
+count.  That pads short chunks up to their longest neighbour's length, and
+it keeps every batch in one process, even when torch intra-op threading
+stops scaling well beyond a few cores.  ``ParallelEncoder`` changes both:
+
+* token lengths come from the model's own tokenizer.  Chunks are sorted by
+  length and cut into batches under a *token budget* (``tokens_per_batch``):
+  many short chunks per batch, few long ones, and almost no padding;
+* batches are spread over ``workers`` processes, each with its own model
+  copy and ``threads`` torch threads.  The longest batches go first, so the
+  pool drains evenly;
+* the vectors are put back in the original chunk order.
+
+It has the same ``encode(texts, convert_to_numpy=True)`` call as
+``SentenceTransformer``, so it slots into ``EmbeddingCache.encode``:
+
+    with ParallelEncoder(MODEL_DIR, tokenizer, workers=4) as encoder:
+        embeddings = embed_cache.encode(encoder, chunks)
+    logger.info(encoder.report())
+
+The pool is only started when something actually needs encoding.  Every
+model copy holds its weights in RAM (about 1.2 GB for embeddinggemma-300m
+in float32), so size ``workers`` to memory as well as to cores.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embed_backend import load_model, prepare
+from instrumentation import tracer
+
+TOKENS_PER_BATCH = 16384         # padded tokens per batch (batch size × longest chunk)
+MAX_BATCH = 64                   # chunks per batch, however short
+THREADS_PER_WORKER = 4
+
+logger = logging.getLogger(__name__)
+
+
+def default_workers(threads: int = THREADS_PER_WORKER) -> int:
+    return max(1, (os.cpu_count() or 1) // threads)
+
+
+def token_lengths(tokenizer, texts: Sequence[str], max_length: Optional[int] = None) -> List[int]:
+    """Token count of every text as the model will see it (capped at ``max_length``)."""
+    ids = tokenizer(list(texts), add_special_tokens=True, truncation=False)["input_ids"]
+    return [min(len(i), max_length) if max_length else len(i) for i in ids]
+
+
+def length_batches(
+    lengths: Sequence[int],
+    tokens_per_batch: int = TOKENS_PER_BATCH,
+    max_batch: int = MAX_BATCH,
+) -> List[List[int]]:
+    """Positions grouped into batches of similar length, longest batches first.
+
+    A batch grows while ``len(batch) × longest`` stays within the token
+    budget; a single chunk longer than the budget gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda n: lengths[n], reverse=True)
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    for n in order:
+        longest = lengths[batch[0]] if batch else lengths[n]
+        if batch and ((len(batch) + 1) * longest > tokens_per_batch or len(batch) >= max_batch):
+            batches.append(batch)
+            batch = []
+        batch.append(n)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+# ------------------------------------------------------------
+# Worker processes
+# ------------------------------------------------------------
+_worker_model = None
+
+
+def _init_worker(model_dir: str, backend: str, threads: int) -> None:
+    global _worker_model
+    import torch
+    torch.set_num_threads(threads)
+    _worker_model = load_model(model_dir, backend, threads=threads)
+
+
+def _encode_batch(texts: List[str]) -> Tuple[np.ndarray, float, int]:
+    started = time.perf_counter()
+    vectors = _worker_model.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                                   show_progress_bar=False)
+    return vectors, time.perf_counter() - started, os.getpid()
+
+
+# ------------------------------------------------------------
+# Encoder
+# ------------------------------------------------------------
+@dataclass
+class BatchStat:
+    size: int
+    longest: int
+    tokens: int                  # real tokens
+    seconds: float
+    worker: int
+
+
+@dataclass
+class EncodeStats:
+    batches: List[BatchStat] = field(default_factory=list)
+    wall_s: float = 0.0
+
+    @property
+    def chunks(self) -> int:
+        return sum(b.size for b in self.batches)
+
+    @property
+    def tokens(self) -> int:
+        return sum(b.tokens for b in self.batches)
+
+    @property
+    def padded(self) -> int:
+        return sum(b.size * b.longest for b in self.batches)
+
+
+class ParallelEncoder:
+    def __init__(
+        self,
+        model_dir: str,
+        tokenizer,
+        workers: int = 1,
+        backend: str = "torch",
+        threads: int = THREADS_PER_WORKER,
+        tokens_per_batch: int = TOKENS_PER_BATCH,
+        max_length: Optional[int] = None,
+    ) -> None:
+        self.model_dir = model_dir
+        self.tokenizer = tokenizer
+        self.backend = backend
+        self.workers = max(1, workers)
+        self.threads = threads
+        self.tokens_per_batch = tokens_per_batch
+        self.max_length = max_length
+        self.stats = EncodeStats()
+        self._model = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "ParallelEncoder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _start(self) -> None:
+        if self.workers == 1:
+            if self._model is None:
+                with tracer.span("load_model", workers=1, backend=self.backend):
+                    self._model = load_model(self.model_dir, self.backend)
+            if self.max_length is None:
+                self.max_length = self._model.max_seq_length
+            return
+        if self._pool is None:
+            import multiprocessing
+            # Export / quantise once here rather than racing in every worker
+            prepare(self.model_dir, self.backend)
+            # spawn: torch / OpenMP state must not be inherited through fork
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(self.model_dir, self.backend, self.threads))
+
+    def _run(self, batches: List[List[str]]):
+        """Yield ``(batch number, vectors, seconds, worker)`` as batches finish."""
+        if self._pool is None:
+            for n, texts in enumerate(batches):
+                started = time.perf_counter()
+                vectors = self._model.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                                             show_progress_bar=False)
+                yield n, vectors, time.perf_counter() - started, os.getpid()
+            return
+        futures = {self._pool.submit(_encode_batch, texts): n for n, texts in enumerate(batches)}
+        for future in as_completed(futures):
+            yield (futures[future], *future.result())
+
+    def encode(self, texts: Sequence[str], convert_to_numpy: bool = True, **_ignored) -> np.ndarray:
+        """Embeddings of ``texts`` in their original order (float32)."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        self._start()
+        lengths = token_lengths(self.tokenizer, texts, self.max_length)
+        batches = length_batches(lengths, self.tokens_per_batch)
+        out: Optional[np.ndarray] = None
+        started = time.perf_counter()
+        with tracer.span("encode_batches", chunks=len(texts), batches=len(batches), workers=self.workers):
+            for n, vectors, seconds, worker in self._run([[texts[p] for p in b] for b in batches]):
+                if out is None:
+                    out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+                out[batches[n]] = vectors
+                stat = BatchStat(len(batches[n]), lengths[batches[n][0]],
+                                 sum(lengths[p] for p in batches[n]), seconds, worker)
+                self.stats.batches.append(stat)
+                logger.info(f"Batch {len(self.stats.batches)}/{len(batches)}: {stat.size} chunk(s) "
+                            f"≤ {stat.longest} tokens in {seconds:.2f}s "
+                            f"({stat.tokens / seconds:,.0f} tok/s, pid {worker})")
+        self.stats.wall_s += time.perf_counter() - started
+        return out
+
+    def report(self) -> str:
+        st = self.stats
+        if not st.batches:
+            return "[+] Encoder: nothing encoded"
+        busy = sum(b.seconds for b in st.batches)
+        padding = 100.0 * (1 - st.tokens / st.padded) if st.padded else 0.0
+        pool = f"{self.workers} worker(s) × {self.threads} thread(s)" if self.workers > 1 else "1 process"
+        pool += f", {self.backend}"
+        return (f"[+] Encoder: {st.chunks} chunk(s) / {st.tokens:,} tokens in {len(st.batches)} batch(es) "
+                f"on {pool}: {st.wall_s:.1f}s wall, "
+                f"{st.chunks / st.wall_s:.1f} chunks/s, {st.tokens / st.wall_s:,.0f} tok/s, "
+                f"{padding:.0f} % padding, workers busy {100.0 * busy / (st.wall_s * self.workers):.0f} %")
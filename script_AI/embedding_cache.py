@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Persistent content-hash → vector cache for ``13_embedding.py``.
+
+Re-running the embedding step re-encodes every chunk with
+embeddinggemma-300m on CPU.  Usually most chunk texts are byte-identical to
+the last run (one markdown file changed, or the chunker was tweaked for a few
+documents).  ``EmbeddingCache`` keeps every vector it has seen, keyed by the
+SHA-256 of the chunk text, and only the novel chunks reach the model:
+
+    cache = EmbeddingCache(EMBED_CACHE_DIR, EMBED_MODEL_NAME)
+    embeddings = cache.encode(embed_model, chunks)   # float32, one row per chunk
+    cache.save()
+    logger.info(cache.report())
+
+On disk the cache is a directory with two files:
+
+* ``vectors.bin`` – raw rows of ``dim`` × ``dtype``, appended, memory-mapped
+  read-only when looked up;
+* ``meta.json``   – model name, dim, dtype and the row order of the hashes.
+  It is replaced atomically after the rows are written, so an interrupted
+  run at worst leaves unreferenced bytes at the end of ``vectors.bin``.
+
+A different model name, dimension or dtype starts an empty cache.  The cache
+lives outside ``vecstore.out`` (which 13 wipes) and is never pruned; delete
+the directory to reset it.
+"""
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from instrumentation import tracer
+
+EMBED_CACHE_DIR = "./embcache.work"
+VECTORS_FILE = "vectors.bin"
+META_FILE = "meta.json"
+CACHE_DTYPES = ("float32", "float16")
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    chunks: int = 0
+    hits: int = 0
+    duplicates: int = 0          # repeated texts inside this run, encoded once
+    encoded: int = 0
+    encode_s: float = 0.0
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir: str, model_name: str, dtype: str = "float32") -> None:
+        if dtype not in CACHE_DTYPES:
+            raise ValueError(f"unsupported cache dtype {dtype!r} (use one of {CACHE_DTYPES})")
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.dim = 0
+        self.rows: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._pending: Dict[str, np.ndarray] = {}
+        self.stats = CacheStats()
+        self._load_meta()
+
+    # --------------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------------
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.cache_dir, VECTORS_FILE)
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.cache_dir, META_FILE)
+
+    def _load_meta(self) -> None:
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return
+        if meta.get("model") != self.model_name or meta.get("dtype") != self.dtype.name:
+            return
+        keys = meta.get("keys", [])
+        row_bytes = meta["dim"] * self.dtype.itemsize
+        if not os.path.exists(self._vectors_path) or os.path.getsize(self._vectors_path) < len(keys) * row_bytes:
+            return
+        self.dim = meta["dim"]
+        self._keys = keys
+        self.rows = {key: row for row, key in enumerate(keys)}
+
+    def _mapped(self) -> np.ndarray:
+        if not self._keys:
+            return np.empty((0, self.dim), dtype=self.dtype)
+        return np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(len(self._keys), self.dim))
+
+    def save(self) -> None:
+        """Append the vectors encoded since the last save and rewrite the index."""
+        if not self._pending:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fresh = not self._keys
+        with open(self._vectors_path, "wb" if fresh else "r+b") as f:
+            # Drop bytes from an interrupted run before appending
+            f.truncate(len(self._keys) * self.dim * self.dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            for key, vector in self._pending.items():
+                f.write(vector.astype(self.dtype).tobytes())
+                self.rows[key] = len(self._keys)
+                self._keys.append(key)
+        self._pending.clear()
+
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_name, "dim": self.dim, "dtype": self.dtype.name,
+                       "keys": self._keys}, f)
+        os.replace(tmp_path, self._meta_path)
+
+    # --------------------------------------------------------------
+    # Lookup / encode
+    # --------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._keys) + len(self._pending)
+
+    def encode(self, embed_model, texts: Sequence[str], **encode_kwargs) -> np.ndarray:
+        """Embeddings of ``texts`` as float32; only uncached texts are encoded."""
+        keys = [text_key(t) for t in texts]
+        novel: Dict[str, int] = {}          # key → first position in texts
+        hits = 0
+        for pos, key in enumerate(keys):
+            if key in self.rows or key in self._pending:
+                hits += 1
+            else:
+                novel.setdefault(key, pos)
+        st = self.stats
+        st.chunks += len(texts)
+        st.hits += hits
+        st.duplicates += len(texts) - hits - len(novel)
+
+        if novel:
+            started = time.perf_counter()
+            with tracer.span("encode", chunks=len(novel), cached=len(texts) - len(novel)):
+                fresh = embed_model.encode([texts[pos] for pos in novel.values()],
+                                           convert_to_numpy=True, **encode_kwargs)
+            st.encode_s += time.perf_counter() - started
+            st.encoded += len(novel)
+            if not self.dim:
+                self.dim = fresh.shape[1]
+            elif fresh.shape[1] != self.dim:
+                raise ValueError(f"model returned dim {fresh.shape[1]}, cache holds dim {self.dim}")
+            for key, vector in zip(novel, fresh):
+                self._pending[key] = vector.astype(self.dtype)
+
+        with tracer.span("read_cache", chunks=len(texts)):
+            mapped = self._mapped()
+            out = np.empty((len(texts), self.dim), dtype=np.float32)
+            for pos, key in enumerate(keys):
+                row = self.rows.get(key)
+                out[pos] = mapped[row] if row is not None else self._pending[key]
+        return out
+
+    def report(self) -> str:
+        st = self.stats
+        hit_rate = 100.0 * st.hits / st.chunks if st.chunks else 0.0
+        per_chunk = f", {st.encode_s / st.encoded * 1000:.0f} ms/chunk" if st.encoded else ""
+        dupes = f" ({st.duplicates} repeated text(s) reused)" if st.duplicates else ""
+        return (f"[+] Embedding cache: {st.hits}/{st.chunks} chunk(s) cached ({hit_rate:.0f} % hits), "
+                f"{st.encoded} encoded in {st.encode_s:.1f}s{per_chunk}{dupes}; "
+                f"{len(self)} vector(s) of dim {self.dim} ({self.dtype.name}) in {self.cache_dir}")
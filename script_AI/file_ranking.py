@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cheap security-relevance ranking of source files.
+
+When a project does not fit into one prompt, the order in which files are
+packed decides what the model sees first.  ``rank_file_entries`` scores every
+``(path, content)`` pair with a handful of regexes for well-known sinks and
+sources (``eval(``, ``child_process``, ``res.render``, raw SQL strings …) plus
+the number of other files that import it, and returns the entries sorted so
+that the most interesting code lands in the earliest chunks.
+
+``select_within_budget`` then trims the ranked list to an approximate token
+budget.  No model call is involved – scoring a few thousand files takes
+milliseconds.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from dependency_graph import build_dependency_graph
+
+# 1 token ≈ 4 characters – same rule of thumb as the chunk size constants
+BYTES_PER_TOKEN = 4
+
+# (label, regex, weight).  Each pattern counts at most MAX_HITS_PER_PATTERN times
+# so that one huge generated file cannot dominate the ranking.
+SIGNAL_PATTERNS: Sequence[Tuple[str, re.Pattern, float]] = (
+    # Code execution / injection sinks
+    ("eval",            re.compile(r"\beval\s*\("), 8.0),
+    ("new Function",    re.compile(r"\bnew\s+Function\s*\("), 8.0),
+    ("child_process",   re.compile(r"\bchild_process\b|\b(?:exec|execSync|spawn|spawnSync|execFile)\s*\("), 8.0),
+    ("vm",              re.compile(r"\bvm\.(?:runIn\w+|Script)\b"), 6.0),
+    ("deserialize",     re.compile(r"\b(?:unserialize|deserialize|pickle\.loads|yaml\.load|node-serialize)\b"), 7.0),
+    ("php exec",        re.compile(r"\b(?:system|passthru|shell_exec|popen|proc_open|assert)\s*\("), 6.0),
+    ("dynamic include", re.compile(r"\b(?:include|require)(?:_once)?\s*\(?\s*\$_(?:GET|POST|REQUEST|COOKIE)"), 8.0),
+    # Template rendering / XSS
+    ("res.render",      re.compile(r"\bres\.render\s*\("), 5.0),
+    ("unescaped ejs",   re.compile(r"<%-"), 5.0),
+    ("innerHTML",       re.compile(r"\.(?:innerHTML|outerHTML)\s*=|document\.write\s*\(|dangerouslySetInnerHTML"), 4.0),
+    ("res.send",        re.compile(r"\bres\.(?:send|write|end)\s*\("), 2.0),
+    # Data stores
+    ("sql string",      re.compile(r"(?i)\b(?:select\s+[\w\*,\s]+\s+from|insert\s+into|update\s+\w+\s+set|delete\s+from)\b"), 5.0),
+    ("query call",      re.compile(r"\.(?:query|raw|execute)\s*\(\s*[`'\"]?[^)]*(?:\+|\$\{)"), 6.0),
+    ("nosql operator",  re.compile(r"\$where|\$regex|\$ne\b"), 3.0),
+    # Files / network
+    ("fs access",       re.compile(r"\bfs\.(?:readFile|writeFile|createReadStream|unlink|readdir)\w*\s*\(|\bopen\s*\("), 3.0),
+    ("path join",       re.compile(r"\bpath\.(?:join|resolve)\s*\([^)]*req\."), 5.0),
+    ("outbound request",re.compile(r"\b(?:axios|fetch|request|http\.get|urllib|requests\.(?:get|post))\s*\("), 2.0),
+    # Untrusted sources and entry points
+    ("request input",   re.compile(r"\breq\.(?:query|body|params|cookies|headers|files)\b|\$_(?:GET|POST|REQUEST|COOKIE)\b|request\.(?:args|form|json)"), 2.0),
+    ("route handler",   re.compile(r"\b(?:app|router)\.(?:get|post|put|patch|delete|all|use)\s*\(|@app\.route|@(?:Get|Post)Mapping"), 3.0),
+    ("auth / crypto",   re.compile(r"(?i)\b(?:jwt|session|password|passwd|secret|token|crypto\.|md5|sha1)\b"), 1.0),
+    ("flag",            re.compile(r"(?i)\bflag\b"), 3.0),
+)
+MAX_HITS_PER_PATTERN = 5
+
+CENTRALITY_WEIGHT = 2.0          # score per importing file
+MAX_CENTRALITY_BONUS = 20.0
+
+# Path hints – small nudges, never enough on their own to beat a real sink
+PATH_BONUS = (
+    (re.compile(r"(?i)(?:^|/)(?:routes?|controllers?|handlers?|api|views?|templates?|middlewares?)/"), 3.0),
+    (re.compile(r"(?i)(?:^|/)(?:app|server|index|main)\.\w+$"), 2.0),
+    (re.compile(r"(?i)\.(?:ejs|pug|hbs|php)$"), 1.0),
+)
+PATH_PENALTY = (
+    (re.compile(r"(?i)(?:^|/)(?:tests?|__tests__|spec|fixtures?|mocks?|examples?|docs?)/|\.(?:test|spec)\.\w+$"), -6.0),
+    (re.compile(r"(?i)(?:^|/)(?:vendor|third_party|public/lib)/"), -6.0),
+    (re.compile(r"(?i)(?:config|\.config|eslint|webpack|babel|jest|gulpfile|gruntfile)[^/]*$"), -2.0),
+)
+
+
+@dataclass
+class FileScore:
+    path: str
+    score: float
+    size: int
+    hits: Dict[str, int] = field(default_factory=dict)
+    importers: int = 0
+
+    @property
+    def est_tokens(self) -> int:
+        return max(1, self.size // BYTES_PER_TOKEN)
+
+
+def score_file(rel_path: str, content: str) -> FileScore:
+    """Score one file on sink/source patterns and path hints (no centrality)."""
+    fs = FileScore(path=rel_path, score=0.0, size=len(content))
+    for label, regex, weight in SIGNAL_PATTERNS:
+        n = 0
+        for _ in regex.finditer(content):
+            n += 1
+            if n >= MAX_HITS_PER_PATTERN:
+                break
+        if n:
+            fs.hits[label] = n
+            fs.score += weight * n
+
+    norm = rel_path.replace(os.sep, "/")
+    for regex, bonus in PATH_BONUS + PATH_PENALTY:
+        if regex.search(norm):
+            fs.score += bonus
+    return fs
+
+
+def rank_file_entries(
+    file_entries: Iterable[Tuple[str, str]],
+) -> Tuple[List[Tuple[str, str]], List[FileScore]]:
+    """
+    Return ``(ranked_entries, scores)`` – both sorted by descending relevance.
+
+    Ties keep the original (walk) order, so the result is deterministic.
+    """
+    entries = list(file_entries)
+    scores = [score_file(path, content) for path, content in entries]
+
+    # Import-graph centrality: how many *other* files import this one
+    for outs in build_dependency_graph(entries):
+        for target in outs:
+            scores[target].importers += 1
+    for fs in scores:
+        fs.score += min(MAX_CENTRALITY_BONUS, CENTRALITY_WEIGHT * fs.importers)
+
+    order = sorted(range(len(entries)), key=lambda i: -scores[i].score)
+    return [entries[i] for i in order], [scores[i] for i in order]
+
+
+def select_within_budget(
+    ranked_entries: List[Tuple[str, str]],
+    scores: List[FileScore],
+    budget_tokens: Optional[int],
+) -> Tuple[List[Tuple[str, str]], List[FileScore]]:
+    """
+    Keep the highest-ranked files whose estimated token sum fits into
+    ``budget_tokens``.  A file that does not fit is skipped, but smaller,
+    lower-ranked files may still fill the remaining budget.
+    """
+    if not budget_tokens:
+        return ranked_entries, scores
+
+    kept_entries, kept_scores = [], []
+    used = 0
+    for entry, fs in zip(ranked_entries, scores):
+        if used + fs.est_tokens > budget_tokens:
+            continue
+        kept_entries.append(entry)
+        kept_scores.append(fs)
+        used += fs.est_tokens
+    return kept_entries, kept_scores
+
+
+def print_ranking(scores: List[FileScore], top: int = 15) -> None:
+    """Print the head of the ranking in the scripts' ``[+]`` log style."""
+    for i, fs in enumerate(scores[:top], start=1):
+        hits = ", ".join(f"{k}×{v}" for k, v in fs.hits.items()) or "-"
+        print(f"[+] #{i:<3} score {fs.score:6.1f}  {fs.path}  ({hits}; imported by {fs.importers})")
+    if len(scores) > top:
+        print(f"[+] ... {len(scores) - top} more file(s)")
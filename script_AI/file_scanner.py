@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Streaming, parallel source-tree scanner for the ``script_AI`` tools.
+
+``os.walk`` + sequential reads are far too slow on monorepos that ship a
+``node_modules`` directory.  This module provides:
+
+* ``IgnoreRules`` – a small ``.gitignore`` pattern engine (``*``, ``**``,
+  ``?``, ``[...]``, ``!negation``, ``dir/`` and ``/anchored`` patterns).
+* ``walk_source_files()`` – an ``os.scandir`` based walk that prunes ignored
+  directories *before* descending and honours every ``.gitignore`` it meets.
+* ``parallel_read()`` – reads files on a thread pool and yields results
+  lazily, in walk order, while the walk is still running in the background.
+* ``read_source_file()`` – single-pass reader: one ``fstat``, ``mmap`` for
+  larger files, UTF‑8 decoded straight from the mapping, binary sniffing,
+  and the UTF‑8 size carried on the returned ``SourceText``.
+
+Only the standard library is used.
+"""
+
+import codecs
+import mmap
+import os
+import queue
+import re
+import stat
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Directories / files that never contain code worth sending to the model
+DEFAULT_EXCLUDES: Tuple[str, ...] = (
+    ".git/",
+    "node_modules/",
+    "bower_components/",
+    "dist/",
+    "build/",
+    "coverage/",
+    "*.min.js",
+    "*.min.css",
+    "*.bundle.js",
+    "*.chunk.js",
+    "*.map",
+)
+
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)   # reads are I/O bound
+MAX_IN_FLIGHT = 256                                    # caps memory held by pending reads
+
+MMAP_THRESHOLD = 64 * 1024        # smaller files are cheaper to read() than to map
+BINARY_SNIFF_BYTES = 8192         # a NUL byte in this prefix marks a binary file
+
+
+# ------------------------------------------------------------
+# .gitignore-style pattern matching
+# ------------------------------------------------------------
+def _glob_to_regex(glob: str) -> str:
+    """Translate one gitignore glob (without ``!`` / trailing ``/``) to a regex body."""
+    out: List[str] = []
+    i, n = 0, len(glob)
+    while i < n:
+        c = glob[i]
+        if glob.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("/**", i) and i + 3 == n:
+            out.append("/.*")
+            i += 3
+        elif glob.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = glob.find("]", i + 1)
+            if j == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = glob[i + 1:j].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = j + 1
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(glob[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """
+    An ordered list of gitignore patterns rooted at ``base`` (a path relative
+    to the scan root, ``""`` for the root itself).  The last matching pattern
+    wins, exactly like git.
+    """
+
+    def __init__(self, patterns: Iterable[str], base: str = "") -> None:
+        self.base = base.strip("/")
+        self.rules: List[Tuple[re.Pattern, bool, bool]] = []   # (regex, negate, dir_only)
+        for raw in patterns:
+            line = raw.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            line = line.lstrip("/")
+            body = _glob_to_regex(line)
+            if not anchored:
+                body = "(?:.*/)?" + body
+            self.rules.append((re.compile(f"^{body}$"), negate, dir_only))
+
+    @classmethod
+    def from_file(cls, path: str, base: str = "") -> "IgnoreRules":
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                return cls(f.readlines(), base)
+        except OSError:
+            return cls([], base)
+
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """
+        Return ``True`` (ignored), ``False`` (explicitly re-included) or
+        ``None`` (no pattern applies) for ``rel_path`` relative to the scan root.
+        """
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return None
+            rel_path = rel_path[len(self.base) + 1:]
+
+        verdict: Optional[bool] = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                verdict = not negate
+        return verdict
+
+
+def is_ignored(rules: Sequence[IgnoreRules], rel_path: str, is_dir: bool) -> bool:
+    """Apply a stack of rule sets (outermost first); deeper files override."""
+    ignored = False
+    for r in rules:
+        verdict = r.match(rel_path, is_dir)
+        if verdict is not None:
+            ignored = verdict
+    return ignored
+
+
+# ------------------------------------------------------------
+# Walking
+# ------------------------------------------------------------
+def walk_source_files(
+    root_dir: str,
+    allowed_exts: Set[str],
+    excludes: Iterable[str] = DEFAULT_EXCLUDES,
+    use_gitignore: bool = True,
+) -> Iterator[str]:
+    """
+    Yield absolute paths of whitelisted files below ``root_dir``.
+
+    The walk is depth-first with entries sorted by name, so the order is
+    deterministic across runs.  Ignored directories are never entered.
+    Symlinks are not followed (same default as ``os.walk``).
+    """
+    root = os.path.abspath(os.path.expanduser(root_dir))
+    base_rules = [IgnoreRules(excludes)]
+
+    # Stack of (absolute dir, relative dir, applicable rule sets)
+    stack: List[Tuple[str, str, List[IgnoreRules]]] = [(root, "", base_rules)]
+    while stack:
+        abs_dir, rel_dir, rules = stack.pop()
+
+        if use_gitignore:
+            gi = os.path.join(abs_dir, ".gitignore")
+            if os.path.isfile(gi):
+                rules = rules + [IgnoreRules.from_file(gi, rel_dir)]
+
+        try:
+            with os.scandir(abs_dir) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as exc:
+            print(f"[-] Could not list '{abs_dir}': {exc}")
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not is_ignored(rules, rel, True):
+                        subdirs.append((entry.path, rel, rules))
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+            except OSError:
+                continue
+
+            _, ext = os.path.splitext(entry.name)
+            if ext.lower() in allowed_exts and not is_ignored(rules, rel, False):
+                yield entry.path
+
+        # Reverse so the alphabetically first sub-directory is popped first
+        stack.extend(reversed(subdirs))
+
+
+def _background_iter(items: Iterable[T], maxsize: int = MAX_IN_FLIGHT) -> Iterator[T]:
+    """Drive ``items`` on a daemon thread so producing overlaps with consuming."""
+    done = object()
+    q: "queue.Queue" = queue.Queue(maxsize=maxsize)
+
+    def producer():
+        try:
+            for item in items:
+                q.put(item)
+        except BaseException as exc:      # surface walk errors to the consumer
+            q.put(exc)
+        finally:
+            q.put(done)
+
+    threading.Thread(target=producer, name="scan-walker", daemon=True).start()
+    while True:
+        item = q.get()
+        if item is done:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+# ------------------------------------------------------------
+# Reading
+# ------------------------------------------------------------
+def parallel_read(
+    paths: Iterable[str],
+    reader: Callable[[str], T],
+    workers: int = DEFAULT_WORKERS,
+    max_in_flight: int = MAX_IN_FLIGHT,
+) -> Iterator[Tuple[str, Optional[T], Optional[BaseException]]]:
+    """
+    Apply ``reader`` to every path on a thread pool and yield
+    ``(path, result, error)`` tuples **in input order** as soon as the head
+    of the queue is ready.
+
+    ``paths`` is consumed on a background thread, so reading starts while
+    the directory walk is still in progress.  At most ``max_in_flight``
+    results are buffered at any time.
+    """
+    pending: "deque[Tuple[str, Future]]" = deque()
+
+    def drain_head():
+        path, fut = pending.popleft()
+        exc = fut.exception()
+        return path, (None if exc else fut.result()), exc
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scan-read") as pool:
+        for path in _background_iter(paths, max_in_flight):
+            pending.append((path, pool.submit(reader, path)))
+            # Hand out finished head items early – keeps the pipeline moving
+            while pending and (pending[0][1].done() or len(pending) >= max_in_flight):
+                yield drain_head()
+        while pending:
+            yield drain_head()
+
+
+# ------------------------------------------------------------
+# Reading single files
+# ------------------------------------------------------------
+class SourceText(str):
+    """
+    ``str`` that also remembers its UTF‑8 size (``nbytes``) and whether the
+    file was cut at the byte limit (``truncated``), so nobody has to
+    re‑encode the text just to measure it.
+    """
+
+    nbytes: int
+    truncated: bool
+
+
+def _source_text(text: str, nbytes: int, truncated: bool) -> SourceText:
+    st = SourceText(text)
+    st.nbytes = nbytes
+    st.truncated = truncated
+    return st
+
+
+def utf8_size(text: str) -> int:
+    """UTF‑8 byte length of ``text`` – free for ``SourceText``, one encode otherwise."""
+    nbytes = getattr(text, "nbytes", None)
+    return nbytes if nbytes is not None else len(text.encode("utf-8"))
+
+
+def _decode(buf, truncated: bool) -> SourceText:
+    """Decode a bytes‑like buffer (bytes or a memoryview over an mmap)."""
+    if b"\x00" in bytes(buf[:BINARY_SNIFF_BYTES]):
+        raise ValueError("looks like a binary file (NUL byte found).")
+    try:
+        # ``final=False`` drops a multi‑byte character cut in half by the byte limit
+        # instead of rejecting the whole file.
+        text, consumed = codecs.utf_8_decode(buf, "strict", not truncated)
+        return _source_text(text, consumed, truncated)
+    except UnicodeDecodeError:
+        # latin‑1 never fails; its UTF‑8 size differs, so measure it once here
+        text, _ = codecs.latin_1_decode(buf)
+        return _source_text(text, len(text.encode("utf-8")), truncated)
+
+
+def read_source_file(filepath: str, max_bytes: int) -> SourceText:
+    """
+    Return the (possibly truncated) text of ``filepath`` as ``SourceText``.
+
+    * One non-blocking ``open`` + ``fstat``; only regular files are accepted
+      (a FIFO or device is rejected without waiting on it).
+    * Files of ``MMAP_THRESHOLD`` bytes or more are memory‑mapped and decoded
+      straight from the mapping – no intermediate ``bytes`` copy.
+    * At most ``max_bytes`` bytes are decoded.
+    * UTF‑8 first, latin‑1 as a safe fallback; files with NUL bytes are rejected.
+
+    Raises:
+        FileNotFoundError, PermissionError – for obvious OS problems.
+        ValueError – when the file is not a regular file or looks binary.
+    """
+    # O_NONBLOCK: opening a FIFO for reading would otherwise block until a writer appears
+    nonblock = getattr(os, "O_NONBLOCK", 0)
+    fd = os.open(os.path.expanduser(filepath), os.O_RDONLY | nonblock | getattr(os, "O_BINARY", 0))
+    try:
+        st = os.fstat(fd)
+        if not stat.S_ISREG(st.st_mode):
+            raise ValueError(f"'{filepath}' is not a regular file.")
+        if nonblock:
+            os.set_blocking(fd, True)
+
+        size = st.st_size
+        n = min(size, max_bytes)
+        truncated = size > max_bytes
+        if n == 0:
+            return _source_text("", 0, False)
+
+        if n >= MMAP_THRESHOLD:
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)[:min(n, len(mm))]
+                try:
+                    return _decode(view, truncated)
+                finally:
+                    view.release()
+
+        chunks = []
+        remaining = n
+        while remaining > 0:
+            block = os.read(fd, remaining)
+            if not block:
+                break
+            chunks.append(block)
+            remaining -= len(block)
+        return _decode(b"".join(chunks) if len(chunks) != 1 else chunks[0], truncated)
+    finally:
+        os.close(fd)
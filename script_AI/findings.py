@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Structured findings exchanged between the analysis and PoC scripts.
+
+``04_analyze_application.py --findings-out findings.jsonl`` asks the model to
+end its reply with a fenced ``json`` block listing what it found; the block is
+pulled out of the reply (via ``parse_blocks``) and appended to the JSONL file,
+one finding per line:
+
+    {"id": 3, "title": "SQL injection in /login", "severity": "high",
+     "files": ["routes/auth.js", "lib/db.js"], "lines": "12-30",
+     "description": "...", "chunk": 1}
+
+``05_build_PoC.py --findings findings.jsonl`` then generates one PoC per
+finding, sending only the files the finding names.
+
+``03_analyze_files.py --samples N`` uses the same JSON block to merge N
+completions per file into a confidence-ranked list (``aggregate_findings``).
+"""
+
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Appended to the analysis prompt when findings are to be recorded
+FINDINGS_INSTRUCTION = (
+    "After your analysis, end the reply with one fenced ```json code block that "
+    "contains a JSON array with one object per vulnerability, using the keys "
+    "\"title\", \"severity\" (critical/high/medium/low), \"files\" (list of the "
+    "file paths exactly as given in the BEGIN FILE headers), \"lines\" and "
+    "\"description\".  Use an empty array if nothing was found."
+)
+
+SEVERITY_ORDER = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+
+
+def _as_int(value: Any) -> Optional[int]:
+    """``value`` as an int if it is one (or a digit string), else ``None``."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return None
+
+
+@dataclass
+class Finding:
+    title: str
+    files: List[str]
+    severity: str = "medium"
+    lines: str = ""
+    description: str = ""
+    chunk: Optional[int] = None
+    id: int = 0
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Finding":
+        files = d.get("files") or d.get("file") or []
+        if not isinstance(files, (list, tuple)):
+            files = [files]
+        known = {"title", "files", "file", "severity", "lines", "description", "chunk", "id", "extra"}
+        extra = dict(d["extra"]) if isinstance(d.get("extra"), dict) else {}
+        extra.update((k, v) for k, v in d.items() if k not in known)
+        finding_id = _as_int(d.get("id"))
+        if finding_id is None and d.get("id") not in (None, ""):
+            extra["model_id"] = d["id"]           # e.g. "VULN-1" – keep it, we number ourselves
+        return cls(
+            title=str(d.get("title") or d.get("name") or "untitled finding"),
+            files=[str(f).strip() for f in files if str(f).strip()],
+            severity=str(d.get("severity") or "medium").lower(),
+            lines=str(d.get("lines") or ""),
+            description=str(d.get("description") or ""),
+            chunk=_as_int(d.get("chunk")),
+            id=finding_id or 0,
+            extra=extra,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        if not d["extra"]:
+            del d["extra"]
+        return d
+
+    @property
+    def slug(self) -> str:
+        """File-name friendly short form of the title."""
+        return re.sub(r"[^0-9a-zA-Z]+", "_", self.title).strip("_").lower()[:48] or "finding"
+
+    def as_prompt(self) -> str:
+        """Render the finding as the text block sent to the PoC model."""
+        lines = [
+            f"Title: {self.title}",
+            f"Severity: {self.severity}",
+            f"Files: {', '.join(self.files) or '-'}",
+        ]
+        if self.lines:
+            lines.append(f"Lines: {self.lines}")
+        if self.description:
+            lines.append(f"Description: {self.description}")
+        return "\n".join(lines)
+
+
+def extract_findings(blocks: Iterable[Dict[str, Any]], chunk: Optional[int] = None) -> List[Finding]:
+    """
+    Return the findings contained in the ``json`` code blocks of a reply
+    (as produced by ``parse_blocks``).  Blocks that do not parse, and items
+    that cannot be turned into a ``Finding``, are skipped.
+    """
+    found: List[Finding] = []
+    for blk in blocks:
+        if blk.get("type") != "code" or blk.get("info", "").strip().lower() not in ("json", ""):
+            continue
+        try:
+            data = json.loads(blk["text"])
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            data = data.get("findings", [data])
+        if not isinstance(data, list):
+            continue
+        for item in data:
+            if isinstance(item, dict) and (item.get("title") or item.get("files")):
+                try:
+                    f = Finding.from_dict(item)
+                except (TypeError, ValueError, AttributeError):
+                    continue
+                f.chunk = chunk if f.chunk is None else f.chunk
+                found.append(f)
+    return found
+
+
+def save_findings(path: str, findings: Iterable[Finding], start_id: int = 1) -> int:
+    """Append findings to ``path`` (JSONL), numbering them from ``start_id``; return the next id."""
+    next_id = start_id
+    with open(path, "a", encoding="utf-8") as f:
+        for finding in findings:
+            finding.id = next_id
+            next_id += 1
+            f.write(json.dumps(finding.to_dict(), ensure_ascii=False) + "\n")
+    return next_id
+
+
+def load_findings(path: str) -> List[Finding]:
+    """Read a findings JSONL file, most severe first (file order breaks ties)."""
+    findings = []
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                finding = Finding.from_dict(json.loads(line))
+            except (TypeError, ValueError, AttributeError) as exc:
+                print(f"[-] {path}:{n}: malformed finding skipped ({exc})")
+                continue                    # torn or hand-edited line
+            finding.id = finding.id or n
+            findings.append(finding)
+    findings.sort(key=lambda x: SEVERITY_ORDER.get(x.severity, len(SEVERITY_ORDER)))
+    return findings
+
+
+# ------------------------------------------------------------
+# Self-consistency – merge the findings of several samples
+# ------------------------------------------------------------
+_STOPWORDS = {"a", "an", "the", "in", "of", "on", "to", "via", "and", "or", "for", "with", "from", "by", "at"}
+
+
+def _title_tokens(finding: Finding) -> set:
+    return set(re.findall(r"[a-z0-9]+", finding.title.lower())) - _STOPWORDS
+
+
+def aggregate_findings(
+    samples: List[List[Finding]],
+    similarity: float = 0.5,
+) -> List[Tuple[Finding, Set[int]]]:
+    """
+    Cluster the findings of ``samples`` (one list per completion) by title
+    similarity (token Jaccard ≥ ``similarity``) and return ``(finding, voters)``
+    pairs, where *voters* are the indices of the samples that reported it –
+    most agreed-upon first, then by severity.
+    """
+    clusters: List[Tuple[Finding, set, set]] = []        # (representative, tokens, sample ids)
+    for s_idx, findings in enumerate(samples):
+        for f in findings:
+            tokens = _title_tokens(f)
+            best, best_score = None, 0.0
+            for cluster in clusters:
+                union = tokens | cluster[1]
+                score = len(tokens & cluster[1]) / len(union) if union else 1.0
+                if score > best_score:
+                    best, best_score = cluster, score
+            if best is not None and best_score >= similarity:
+                best[2].add(s_idx)
+                for path in f.files:
+                    if path not in best[0].files:
+                        best[0].files.append(path)
+                # keep the most severe rating seen
+                if SEVERITY_ORDER.get(f.severity, 9) < SEVERITY_ORDER.get(best[0].severity, 9):
+                    best[0].severity = f.severity
+            else:
+                clusters.append((f, set(tokens), {s_idx}))
+
+    ranked = [(rep, voters) for rep, _tokens, voters in clusters]
+    ranked.sort(key=lambda fv: (-len(fv[1]), SEVERITY_ORDER.get(fv[0].severity, len(SEVERITY_ORDER))))
+    return ranked
+
+
+def format_consensus(ranked: List[Tuple[Finding, Set[int]]], n_samples: int) -> str:
+    """Markdown table of aggregated findings with their confidence (votes / samples)."""
+    if not ranked:
+        return f"**No findings in any of the {n_samples} samples.**"
+    rows = [
+        f"**Consensus over {n_samples} samples**",
+        "",
+        "| # | confidence | severity | finding | lines |",
+        "|---|---|---|---|---|",
+    ]
+    for i, (f, voters) in enumerate(ranked, start=1):
+        votes = len(voters)
+        title = f.title.replace("|", "\\|")
+        rows.append(f"| {i} | {votes}/{n_samples} ({votes / n_samples:.0%}) | {f.severity} | {title} | {f.lines or '-'} |")
+    return "\n".join(rows)
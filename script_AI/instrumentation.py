@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared timing / token-usage instrumentation for the ``script_AI`` tools.
+
+Every script used to print only the total wall-clock time.  This module adds
+light-weight *spans* so we can see where the minutes of a CTF round go:
+
+    from instrumentation import tracer
+
+    with tracer.span("build_prompt_chunks", files=len(entries)) as sp:
+        chunks = build_prompt_chunks(entries)
+        sp.set("chunks", len(chunks))
+
+    @tracer.timed("render_with_rich")
+    def render_with_rich(...): ...
+
+    tracer.print_summary()            # per-stage table at the end of a run
+
+Spans nest automatically (``contextvars`` – works across threads and asyncio
+tasks) and can be exported as JSON lines whose field names follow the
+OpenTelemetry span data model (``trace_id``, ``span_id``, ``parent_span_id``,
+``start_time_unix_nano`` …), so they can be fed into any OTLP-aware viewer.
+
+Only the standard library is required; Rich is imported lazily for the
+summary table.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Environment variable that enables JSONL trace export without touching the CLI
+TRACE_FILE_ENV = "CTF_TRACE_FILE"
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Span:
+    """One timed unit of work.  Attributes are free-form key/value pairs."""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_span_id",
+        "start_ns", "end_ns", "attributes", "status",
+    )
+
+    def __init__(self, name: str, trace_id: str, parent: Optional["Span"] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.status = "OK"
+
+    def set(self, key: str, value: Any) -> None:
+        """Attach an attribute (e.g. token counts) to the span."""
+        self.attributes[key] = value
+
+    def add(self, key: str, value: float) -> None:
+        """Accumulate a numeric attribute."""
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    @property
+    def duration_s(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e9
+
+    def to_otel(self) -> Dict[str, Any]:
+        """Return the span as an OpenTelemetry-shaped dict."""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """
+    Collects spans for one process run.
+
+    * ``span()`` – context manager that times a block.
+    * ``timed()`` – decorator flavour of the same thing.
+    * ``print_summary()`` – aggregated table per span name.
+    * ``export_jsonl()`` – one JSON object per span.
+    """
+
+    # Numeric attributes that are summed up in the summary table
+    SUMMED_ATTRIBUTES = (
+        "prompt_tokens", "completion_tokens", "ttft_s", "generation_s",
+    )
+    # Numeric attributes reported with their latest value (e.g. the adaptive concurrency limit)
+    GAUGE_ATTRIBUTES = ("concurrency_limit",)
+
+    def __init__(self) -> None:
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self.trace_path: Optional[str] = os.environ.get(TRACE_FILE_ENV) or None
+        self._lock = threading.Lock()
+
+    def configure(self, trace_path: Optional[str] = None) -> None:
+        """Set (or override) the JSONL file written by ``finish()``."""
+        if trace_path:
+            self.trace_path = trace_path
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        parent = _current_span.get()
+        sp = Span(name, self.trace_id, parent)
+        sp.attributes.update(attributes)
+        token = _current_span.set(sp)
+        try:
+            yield sp
+        except BaseException as exc:
+            sp.status = "ERROR"
+            sp.set("exception", f"{type(exc).__name__}: {exc}")
+            raise
+        finally:
+            sp.end_ns = time.time_ns()
+            _current_span.reset(token)
+            with self._lock:
+                self.spans.append(sp)
+
+    def timed(self, name: Optional[str] = None) -> Callable:
+        """Decorator: wrap every call of the function in a span."""
+        def decorator(func: Callable) -> Callable:
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        """Return the innermost active span (or ``None``)."""
+        return _current_span.get()
+
+    # --------------------------------------------------------------
+    # Reporting
+    # --------------------------------------------------------------
+    def summary_rows(self) -> List[Dict[str, Any]]:
+        """Aggregate finished spans by name, in order of first appearance."""
+        with self._lock:
+            spans = list(self.spans)
+        spans.sort(key=lambda s: s.start_ns)
+
+        rows: Dict[str, Dict[str, Any]] = {}
+        for sp in spans:
+            row = rows.setdefault(sp.name, {
+                "name": sp.name, "count": 0, "total_s": 0.0, "max_s": 0.0,
+                "errors": 0, **{k: 0 for k in self.SUMMED_ATTRIBUTES},
+                **{k: None for k in self.GAUGE_ATTRIBUTES},
+            })
+            row["count"] += 1
+            row["total_s"] += sp.duration_s
+            row["max_s"] = max(row["max_s"], sp.duration_s)
+            row["errors"] += sp.status != "OK"
+            for key in self.SUMMED_ATTRIBUTES:
+                value = sp.attributes.get(key)
+                if isinstance(value, (int, float)):
+                    row[key] += value
+            for key in self.GAUGE_ATTRIBUTES:
+                if sp.attributes.get(key) is not None:
+                    row[key] = sp.attributes[key]
+        return list(rows.values())
+
+    def print_summary(self, title: str = "Per-stage timing") -> None:
+        """Render the aggregated spans as a Rich table."""
+        rows = self.summary_rows()
+        if not rows:
+            return
+
+        from rich.console import Console
+        from rich.table import Table as RichTable
+
+        rt = RichTable(title=title, show_header=True, header_style="bold magenta")
+        for col in ("stage", "calls", "total s", "mean s", "max s",
+                    "wait s", "gen s", "prompt tok", "compl. tok", "limit", "errors"):
+            rt.add_column(col, justify="left" if col == "stage" else "right")
+        for row in rows:
+            rt.add_row(
+                row["name"],
+                str(row["count"]),
+                f"{row['total_s']:.2f}",
+                f"{row['total_s'] / row['count']:.3f}",
+                f"{row['max_s']:.3f}",
+                f"{row['ttft_s']:.2f}" if row["ttft_s"] else "",
+                f"{row['generation_s']:.2f}" if row["generation_s"] else "",
+                str(row["prompt_tokens"] or ""),
+                str(row["completion_tokens"] or ""),
+                "" if row["concurrency_limit"] is None else str(row["concurrency_limit"]),
+                str(row["errors"] or ""),
+            )
+        Console().print(rt)
+
+    def export_jsonl(self, path: str) -> None:
+        """Append all finished spans to ``path`` as JSON lines."""
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, "a", encoding="utf-8") as f:
+            for sp in spans:
+                f.write(json.dumps(sp.to_otel(), ensure_ascii=False, default=str) + "\n")
+
+    def finish(self) -> None:
+        """Print the summary and, when configured, write the trace file."""
+        self.print_summary()
+        if self.trace_path:
+            self.export_jsonl(self.trace_path)
+            print(f"[+] Trace written to: {self.trace_path}")
+
+
+# Process-wide default tracer shared by all scripts
+tracer = Tracer()
+
+
+def timed_chat_completion(client, **create_kwargs) -> Optional[str]:
+    """
+    Run ``client.chat.completions.create`` in streaming mode and record the
+    network wait (time-to-first-token), generation time and token usage on
+    the current span.
+
+    Returns the concatenated assistant message text.  Exceptions from the
+    OpenAI SDK are propagated so callers keep their own error handling.
+    """
+    sp = tracer.current()
+    started = time.perf_counter()
+    first_token_at: Optional[float] = None
+    parts: List[str] = []
+
+    stream = client.chat.completions.create(
+        stream=True,
+        stream_options={"include_usage": True},
+        **create_kwargs,
+    )
+    for chunk in stream:
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(delta)
+        usage = getattr(chunk, "usage", None)
+        if usage and sp is not None:
+            sp.set("prompt_tokens", usage.prompt_tokens)
+            sp.set("completion_tokens", usage.completion_tokens)
+
+    finished = time.perf_counter()
+    if sp is not None:
+        ttft = (first_token_at or finished) - started
+        sp.set("ttft_s", round(ttft, 4))
+        sp.set("generation_s", round(finished - (first_token_at or finished), 4))
+    return "".join(parts)
+
+
+async def async_timed_chat_completion(client, **create_kwargs) -> Optional[str]:
+    """
+    ``timed_chat_completion`` for ``openai.AsyncOpenAI`` clients – same span
+    attributes, usable from concurrently running asyncio tasks.
+    """
+    sp = tracer.current()
+    started = time.perf_counter()
+    first_token_at: Optional[float] = None
+    parts: List[str] = []
+
+    stream = await client.chat.completions.create(
+        stream=True,
+        stream_options={"include_usage": True},
+        **create_kwargs,
+    )
+    async for chunk in stream:
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(delta)
+        usage = getattr(chunk, "usage", None)
+        if usage and sp is not None:
+            sp.set("prompt_tokens", usage.prompt_tokens)
+            sp.set("completion_tokens", usage.completion_tokens)
+
+    finished = time.perf_counter()
+    if sp is not None:
+        ttft = (first_token_at or finished) - started
+        sp.set("ttft_s", round(ttft, 4))
+        sp.set("generation_s", round(finished - (first_token_at or finished), 4))
+    return "".join(parts)
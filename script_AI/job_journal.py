@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Append-only job journal for resumable scans.
+
+Every unit of work (a file in ``03_analyze_files.py``, a prompt chunk in
+``04_analyze_application.py``) is identified by a content hash and logged as a
+JSON line *before* the request is sent (``started``) and after it finished
+(``done`` with the location of the saved reply, or ``failed``):
+
+    {"key": "9f2c…", "name": "routes/auth.js", "status": "started", "time": …}
+    {"key": "9f2c…", "name": "routes/auth.js", "status": "done",
+     "result": "analyze_files_journal_results/9f2c….md", "time": …}
+
+Lines are flushed and fsync'ed, so a crash loses at most the request in
+flight.  With ``resume=True`` units whose last state is ``done`` are skipped;
+a changed file or chunk gets a new hash and is analysed again, and so is a
+unit whose saved reply has gone missing.
+
+The journal is opt-in (``--journal`` / ``--resume``); each script has its own
+default file so that runs of 03 and 04 do not truncate each other's journal.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+
+def unit_key(*parts: str) -> str:
+    """Stable hash of the text that defines a unit of work."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8", "surrogatepass"))
+        h.update(b"\0")
+    return h.hexdigest()[:32]
+
+
+class JobJournal:
+    def __init__(self, path: str, resume: bool = False) -> None:
+        self.path = path
+        self.results_dir = os.path.splitext(path)[0] + "_results"
+        self.state: Dict[str, dict] = {}
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+        if resume and os.path.exists(path):
+            self._load()
+            done = sum(1 for key in self.state if self.is_done(key))
+            print(f"[+] Journal '{path}': {done} unit(s) already done, "
+                  f"{len(self.state) - done} unfinished")
+        self._fh = open(path, "a" if resume else "w", encoding="utf-8")
+        if resume and self._torn_tail():
+            self._fh.write("\n")           # never glue the next entry onto a torn line
+        os.makedirs(self.results_dir, exist_ok=True)
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue                # torn last line after a crash
+                self.state[entry["key"]] = entry
+
+    def _torn_tail(self) -> bool:
+        """True when the file is non-empty and does not end with a newline."""
+        with open(self.path, "rb") as f:
+            if f.seek(0, os.SEEK_END) == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def _append(self, entry: dict) -> None:
+        entry["time"] = round(time.time(), 3)
+        with self._lock:
+            self.state[entry["key"]] = entry
+            self._fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    # --------------------------------------------------------------
+    # Unit life cycle
+    # --------------------------------------------------------------
+    def is_done(self, key: str) -> bool:
+        entry = self.state.get(key)
+        return (entry is not None and entry["status"] == "done"
+                and os.path.isfile(entry.get("result") or ""))
+
+    def result_path(self, key: str) -> Optional[str]:
+        entry = self.state.get(key)
+        return entry.get("result") if entry else None
+
+    def skip(self, key: str, name: str) -> bool:
+        """True (and counted) when ``key`` was completed by an earlier run."""
+        if self.is_done(key):
+            self.skipped += 1
+            print(f"[+] Journal: '{name}' already done – reply in '{self.result_path(key)}'")
+            return True
+        return False
+
+    def start(self, key: str, name: str) -> None:
+        self._append({"key": key, "name": name, "status": "started"})
+
+    def finish(self, key: str, name: str, reply: str) -> str:
+        """Save ``reply`` next to the journal and mark the unit done."""
+        result = os.path.join(self.results_dir, f"{key}.md")
+        with open(result, "w", encoding="utf-8") as f:
+            f.write(reply)
+        self._append({"key": key, "name": name, "status": "done", "result": result})
+        return result
+
+    def fail(self, key: str, name: str, error: str = "") -> None:
+        self._append({"key": key, "name": name, "status": "failed", "error": error})
+
+    def close(self) -> None:
+        self._fh.close()
+        if self.skipped:
+            print(f"[+] Journal: {self.skipped} unit(s) skipped as already done")
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Optional prompt-payload optimisation for source files.
+
+Sending files verbatim wastes context tokens (and prefill time) on vendored
+copies of the same library, licence headers, comment banners and blank
+lines.  ``PayloadOptimizer`` rewrites a stream of ``(path, content)``
+entries before they are chunked:
+
+* **Exact duplicates** (same SHA‑256 after whitespace normalisation) are
+  replaced by a one-line ``same as <path>`` reference.
+* **Near duplicates** are found with MinHash + LSH banding over word
+  shingles and sent as a reference plus a compact diff, so the differing
+  lines – which may be exactly where a patched-in vulnerability lives – are
+  still visible.  Falls back to the full text when the diff is not small.
+* **Comment / blank-line stripping** for JS/TS/EJS/HTML/CSS, Python and PHP
+  that is string-aware.  Comments mentioning flags, TODOs, passwords etc. are
+  kept.  For every file a *line map* (output line → original line) is kept
+  on the side, so line numbers reported by the model can be mapped back.
+
+Savings are tracked in ``PayloadStats``.  Only the standard library is used.
+"""
+
+import difflib
+import hashlib
+import os
+import re
+import struct
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from file_scanner import utf8_size
+
+Entry = Tuple[str, str]
+
+BYTES_PER_TOKEN = 4                       # 1 token ≈ 4 characters
+
+# Comments matching this are worth their tokens
+KEEP_COMMENT_RE = re.compile(
+    r"(?i)flag|todo|fixme|xxx|hack|bug|vuln|secur|unsafe|sanitiz|password|secret|token|auth|admin|debug"
+)
+
+# MinHash / LSH parameters: 16 bands × 4 rows detects pairs with Jaccard ≥ ~0.8
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+SHINGLE_WORDS = 5
+NEAR_DUP_THRESHOLD = 0.9                  # estimated Jaccard similarity
+MAX_DIFF_RATIO = 0.3                      # diff must be < 30 % of the file
+MIN_DEDUPE_BYTES = 256                    # tiny files are cheaper to resend
+
+_MERSENNE = (1 << 61) - 1
+_PERMS = [
+    (
+        int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE | 1,
+        int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE,
+    )
+    for i in range(NUM_PERM)
+]
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+# ------------------------------------------------------------
+# Comment stripping
+# ------------------------------------------------------------
+def _strip_c_like(text: str, hash_comments: bool = False, regex_literals: bool = True) -> str:
+    """
+    Remove ``//`` and ``/* */`` comments (and ``#`` comments when
+    ``hash_comments``) while leaving string, template and regex literals
+    intact.  Newlines inside removed block comments are preserved so the
+    line structure does not change.
+    """
+    out: List[str] = []
+    i, n = 0, len(text)
+    last_sig = ""                          # last significant (non-space) char emitted
+    while i < n:
+        c = text[i]
+        nxt = text[i + 1] if i + 1 < n else ""
+
+        # Strings / template literals
+        if c in "'\"`":
+            j = i + 1
+            while j < n and text[j] != c:
+                if text[j] == "\\":
+                    j += 1
+                elif text[j] == "\n" and c != "`":
+                    break
+                j += 1
+            out.append(text[i:j + 1])
+            last_sig = c
+            i = j + 1
+            continue
+
+        # Line comments
+        if (c == "/" and nxt == "/") or (hash_comments and c == "#"):
+            j = text.find("\n", i)
+            j = n if j == -1 else j
+            comment = text[i:j]
+            if KEEP_COMMENT_RE.search(comment):
+                out.append(comment)
+            i = j
+            continue
+
+        # Block comments
+        if c == "/" and nxt == "*":
+            j = text.find("*/", i + 2)
+            j = n if j == -1 else j + 2
+            comment = text[i:j]
+            if KEEP_COMMENT_RE.search(comment):
+                out.append(comment)
+            else:
+                out.append("\n" * comment.count("\n"))
+            i = j
+            continue
+
+        # Regex literals – a '/' where an operand is expected
+        if regex_literals and c == "/" and (last_sig == "" or last_sig in "(,=:[!&|?{};+-*%<>~^"):
+            j = i + 1
+            in_class = False
+            while j < n and text[j] != "\n":
+                if text[j] == "\\":
+                    j += 2
+                    continue
+                if text[j] == "[":
+                    in_class = True
+                elif text[j] == "]":
+                    in_class = False
+                elif text[j] == "/" and not in_class:
+                    break
+                j += 1
+            if j < n and text[j] == "/":
+                out.append(text[i:j + 1])
+                last_sig = "/"
+                i = j + 1
+                continue
+
+        out.append(c)
+        if not c.isspace():
+            last_sig = c
+        i += 1
+    return "".join(out)
+
+
+def _strip_python(text: str) -> str:
+    """Remove ``#`` comments; strings (including triple-quoted) are kept."""
+    out: List[str] = []
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if c in "'\"":
+            quote = text[i:i + 3] if text[i:i + 3] in ('"""', "'''") else c
+            j = i + len(quote)
+            while j < n and not text.startswith(quote, j):
+                if text[j] == "\\":
+                    j += 1
+                elif text[j] == "\n" and len(quote) == 1:
+                    break
+                j += 1
+            j = min(n, j + len(quote))
+            out.append(text[i:j])
+            i = j
+            continue
+        if c == "#":
+            j = text.find("\n", i)
+            j = n if j == -1 else j
+            comment = text[i:j]
+            if KEEP_COMMENT_RE.search(comment) or text[i:i + 2] == "#!":
+                out.append(comment)
+            i = j
+            continue
+        out.append(c)
+        i += 1
+    return "".join(out)
+
+
+_HTML_COMMENT_RE = re.compile(r"<!--(?!\[if).*?-->", re.DOTALL)
+_EJS_COMMENT_RE = re.compile(r"<%#.*?%>", re.DOTALL)
+_SCRIPT_BLOCK_RE = re.compile(r"(<script\b[^>]*>)(.*?)(</script>)", re.DOTALL | re.IGNORECASE)
+
+
+def _keep_newlines(m: re.Match) -> str:
+    text = m.group(0)
+    return text if KEEP_COMMENT_RE.search(text) else "\n" * text.count("\n")
+
+
+def _strip_markup(text: str) -> str:
+    text = _EJS_COMMENT_RE.sub(_keep_newlines, text)
+    text = _HTML_COMMENT_RE.sub(_keep_newlines, text)
+    return _SCRIPT_BLOCK_RE.sub(lambda m: m.group(1) + _strip_c_like(m.group(2)) + m.group(3), text)
+
+
+def strip_comments(rel_path: str, content: str) -> str:
+    """Dispatch on file extension; unknown types are returned unchanged."""
+    ext = os.path.splitext(rel_path)[1].lower()
+    if ext in (".js", ".mjs", ".cjs", ".jsx", ".ts", ".tsx"):
+        return _strip_c_like(content)
+    if ext in (".css", ".scss", ".less", ".java", ".c", ".h", ".cpp", ".go", ".cs", ".rs"):
+        return _strip_c_like(content, regex_literals=False)
+    if ext in (".php", ".phtml", ".inc"):
+        return _strip_c_like(content, hash_comments=True, regex_literals=False)
+    if ext == ".py":
+        return _strip_python(content)
+    if ext in (".ejs", ".html", ".htm", ".hbs", ".vue"):
+        return _strip_markup(content)
+    return content
+
+
+def compact(rel_path: str, content: str, strip: bool = True) -> Tuple[str, List[int]]:
+    """
+    Strip comments, trailing whitespace and blank lines; with ``strip=False``
+    the content is returned unchanged.
+
+    Returns ``(text, line_map)`` where ``line_map[k]`` is the 1-based original
+    line number of output line ``k + 1``.
+    """
+    if not strip:
+        return content, list(range(1, content.count("\n") + 2))
+    stripped = strip_comments(rel_path, content)
+    kept: List[str] = []
+    line_map: List[int] = []
+    for lineno, line in enumerate(stripped.split("\n"), start=1):
+        line = line.rstrip()
+        if line:
+            kept.append(line)
+            line_map.append(lineno)
+    return "\n".join(kept), line_map
+
+
+# ------------------------------------------------------------
+# Duplicate detection
+# ------------------------------------------------------------
+def _normalised_hash(content: str) -> str:
+    return hashlib.sha256(" ".join(content.split()).encode("utf-8")).hexdigest()
+
+
+def minhash_signature(content: str) -> Optional[Tuple[int, ...]]:
+    """MinHash over word shingles; ``None`` for texts too short to shingle."""
+    words = _WORD_RE.findall(content)
+    if len(words) < SHINGLE_WORDS:
+        return None
+    shingles = {
+        struct.unpack("<Q", hashlib.blake2b(
+            " ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"), digest_size=8
+        ).digest())[0]
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+    return tuple(min((a * x + b) % _MERSENNE for x in shingles) for a, b in _PERMS)
+
+
+def estimated_similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+@dataclass
+class PayloadStats:
+    files: int = 0
+    exact_duplicates: int = 0
+    near_duplicates: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.bytes_before - self.bytes_after) // BYTES_PER_TOKEN
+
+    def report(self) -> str:
+        pct = 100.0 * (1 - self.bytes_after / self.bytes_before) if self.bytes_before else 0.0
+        return (
+            f"[+] Payload optimisation: {self.files} file(s), "
+            f"{self.exact_duplicates} exact / {self.near_duplicates} near duplicate(s), "
+            f"{self.bytes_before // 1024} KB → {self.bytes_after // 1024} KB "
+            f"(-{pct:.1f} %, ~{self.tokens_saved} tokens saved)"
+        )
+
+
+class PayloadOptimizer:
+    """
+    Streaming optimiser: ``process()`` takes and yields ``(path, content)``
+    entries, comparing each file only with files seen before it – so the
+    first copy in the order given is the one sent in full.  Feed it the final
+    send order (after ranking, budget selection and dependency packing).
+    """
+
+    def __init__(self, dedupe: bool = True, strip: bool = True,
+                 near_threshold: float = NEAR_DUP_THRESHOLD) -> None:
+        self.dedupe = dedupe
+        self.strip = strip
+        self.near_threshold = near_threshold
+        self.stats = PayloadStats()
+        self.line_maps: Dict[str, List[int]] = {}
+        self._exact: Dict[str, str] = {}                       # hash → path
+        self._bands: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        self._seen: List[Tuple[str, str, Tuple[int, ...]]] = []  # (path, text, signature)
+
+    def _near_duplicate(self, sig: Tuple[int, ...]) -> Optional[Tuple[int, float]]:
+        candidates = set()
+        for b in range(LSH_BANDS):
+            candidates.update(self._bands.get((b, sig[b * LSH_ROWS:(b + 1) * LSH_ROWS]), ()))
+        best = None
+        for idx in candidates:
+            sim = estimated_similarity(sig, self._seen[idx][2])
+            if sim >= self.near_threshold and (best is None or sim > best[1]):
+                best = (idx, sim)
+        return best
+
+    def _remember(self, path: str, text: str, sig: Tuple[int, ...]) -> None:
+        idx = len(self._seen)
+        self._seen.append((path, text, sig))
+        for b in range(LSH_BANDS):
+            self._bands.setdefault((b, sig[b * LSH_ROWS:(b + 1) * LSH_ROWS]), []).append(idx)
+
+    def optimise(self, rel_path: str, content: str) -> str:
+        self.stats.files += 1
+        self.stats.bytes_before += getattr(content, "nbytes", None) or len(content.encode("utf-8"))
+
+        text, line_map = compact(rel_path, content, strip=self.strip)
+        result = text
+
+        if self.dedupe and utf8_size(text) >= MIN_DEDUPE_BYTES:
+            digest = _normalised_hash(text)
+            original = self._exact.get(digest)
+            if original is not None:
+                self.stats.exact_duplicates += 1
+                result = f"[identical to {original} – content omitted]"
+                line_map = []
+            else:
+                self._exact[digest] = rel_path
+                sig = minhash_signature(text)
+                near = self._near_duplicate(sig) if sig else None
+                if near is not None:
+                    ref_path, ref_text, _ = self._seen[near[0]]
+                    diff = "\n".join(difflib.unified_diff(
+                        ref_text.split("\n"), text.split("\n"),
+                        fromfile=ref_path, tofile=rel_path, n=0, lineterm="",
+                    ))
+                    if len(diff) < MAX_DIFF_RATIO * len(text):
+                        self.stats.near_duplicates += 1
+                        result = (
+                            f"[near-duplicate of {ref_path} (~{near[1]:.0%} similar) – "
+                            f"only the differences are shown]\n{diff}"
+                        )
+                if sig:
+                    self._remember(rel_path, text, sig)
+
+        self.line_maps[rel_path] = line_map
+        self.stats.bytes_after += len(result.encode("utf-8"))
+        return result
+
+    def process(self, entries: Iterable[Entry]) -> Iterator[Entry]:
+        for rel_path, content in entries:
+            yield rel_path, self.optimise(rel_path, content)
+
+
+def original_line(line_map: List[int], line: int) -> int:
+    """Map a 1-based line number of the compacted text back to the original file."""
+    if 1 <= line <= len(line_map):
+        return line_map[line - 1]
+    return line
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Incremental pcap reading and in-memory TCP stream reassembly.
+
+``script/04_detect_breach.sh`` merges the rolling ``pcap.out/pcap-*.pcap``
+files every minute and runs tshark over them again and again.  This module
+does the same work in one pass and needs only the standard library:
+
+* ``PcapTail`` follows one growing capture file.  It remembers the offset of
+  the last complete record, so every poll parses only the bytes tcpdump
+  appended since the previous one.  A half-written record at the end is left
+  for the next poll.
+* ``parse_tcp`` decodes Ethernet (including VLAN tags), Linux cooked (SLL /
+  SLL2), BSD loopback and raw IP link types into the TCP fields needed here,
+  for IPv4 and IPv6.
+* ``TcpStream`` reassembles both directions of a connection by sequence
+  number.  It handles retransmissions, out-of-order segments and sequence
+  wrap-around, and keeps the raw records so the stream can be written back as
+  a pcap file that tshark reads like any ``tshark -w`` output.
+
+Only classic pcap (what ``tcpdump -w`` writes) is supported, not pcapng.
+"""
+
+import socket
+import struct
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# magic → (struct byte order, timestamp resolution)
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+PCAPNG_MAGIC = b"\x0a\x0d\x0d\x0a"
+GLOBAL_HEADER_LEN = 24
+RECORD_HEADER_LEN = 16
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = (12, 14, 101, 228, 229)
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+ETHERTYPE_VLAN = (0x8100, 0x88A8, 0x9100)
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_ACK = 0x10
+
+SEQ_MOD = 1 << 32
+MAX_OUT_OF_ORDER = 512          # buffered segments before a gap is given up on
+
+Endpoint = Tuple[str, int]
+
+
+@dataclass
+class Packet:
+    """One TCP segment plus the raw pcap record it came from."""
+    ts: float
+    record: bytes                   # record header + captured bytes, as on disk
+    src: Endpoint
+    dst: Endpoint
+    seq: int
+    flags: int
+    payload: bytes
+
+
+# ------------------------------------------------------------
+# Link / network / transport decoding
+# ------------------------------------------------------------
+def _network_offset(linktype: int, data: bytes) -> Optional[Tuple[int, int]]:
+    """``(ethertype, offset of the IP header)`` for the supported link types."""
+    if linktype == LINKTYPE_ETHERNET:
+        if len(data) < 14:
+            return None
+        off = 12
+        ethertype = struct.unpack_from("!H", data, off)[0]
+        while ethertype in ETHERTYPE_VLAN and len(data) >= off + 6:
+            off += 4
+            ethertype = struct.unpack_from("!H", data, off)[0]
+        return ethertype, off + 2
+    if linktype == LINKTYPE_LINUX_SLL:
+        return (struct.unpack_from("!H", data, 14)[0], 16) if len(data) >= 16 else None
+    if linktype == LINKTYPE_LINUX_SLL2:
+        return (struct.unpack_from("!H", data, 0)[0], 20) if len(data) >= 20 else None
+    if linktype == LINKTYPE_NULL:
+        if len(data) < 4:
+            return None
+        family = struct.unpack_from("<I", data, 0)[0]
+        if family > 0xFFFF:                       # written in big endian
+            family = struct.unpack_from(">I", data, 0)[0]
+        return (ETHERTYPE_IPV4 if family == 2 else ETHERTYPE_IPV6), 4
+    if linktype in LINKTYPE_RAW:
+        if not data:
+            return None
+        return (ETHERTYPE_IPV4 if data[0] >> 4 == 4 else ETHERTYPE_IPV6), 0
+    return None
+
+
+def parse_tcp(linktype: int, data: bytes) -> Optional[Tuple[Endpoint, Endpoint, int, int, bytes]]:
+    """
+    Decode a captured frame into ``(src, dst, seq, flags, payload)``.
+    Returns ``None`` for anything that is not an unfragmented TCP segment.
+    """
+    net = _network_offset(linktype, data)
+    if net is None:
+        return None
+    ethertype, off = net
+
+    if ethertype == ETHERTYPE_IPV4:
+        if len(data) < off + 20:
+            return None
+        ihl = (data[off] & 0x0F) * 4
+        total_len, frag, proto = (
+            struct.unpack_from("!H", data, off + 2)[0],
+            struct.unpack_from("!H", data, off + 6)[0],
+            data[off + 9],
+        )
+        if proto != 6 or frag & 0x3FFF:           # not TCP, or a fragment
+            return None
+        src_ip = socket.inet_ntoa(data[off + 12:off + 16])
+        dst_ip = socket.inet_ntoa(data[off + 16:off + 20])
+        end = min(len(data), off + total_len)     # strip Ethernet padding
+        off += ihl
+    elif ethertype == ETHERTYPE_IPV6:
+        if len(data) < off + 40 or data[off + 6] != 6:
+            return None                           # extension headers are not followed
+        payload_len = struct.unpack_from("!H", data, off + 4)[0]
+        src_ip = socket.inet_ntop(socket.AF_INET6, data[off + 8:off + 24])
+        dst_ip = socket.inet_ntop(socket.AF_INET6, data[off + 24:off + 40])
+        end = min(len(data), off + 40 + payload_len)
+        off += 40
+    else:
+        return None
+
+    if end < off + 20:
+        return None
+    sport, dport, seq = struct.unpack_from("!HHI", data, off)
+    data_off = (data[off + 12] >> 4) * 4
+    flags = data[off + 13]
+    return (src_ip, sport), (dst_ip, dport), seq, flags, data[off + data_off:end]
+
+
+# ------------------------------------------------------------
+# Incremental file reading
+# ------------------------------------------------------------
+class PcapTail:
+    """Follows one capture file that tcpdump may still be appending to."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.offset = 0
+        self.header: Optional[bytes] = None       # global header, reused for dumps
+        self.linktype = LINKTYPE_ETHERNET
+        self.unsupported = False
+        self._order = "<"
+        self._resolution = 1e-6
+
+    def _read_header(self, blob: bytes) -> bool:
+        if len(blob) < GLOBAL_HEADER_LEN:
+            return False
+        magic = blob[:4]
+        if magic not in PCAP_MAGIC:
+            kind = "pcapng" if magic == PCAPNG_MAGIC else "unknown format"
+            print(f"[-] {self.path}: {kind} is not supported – skipped")
+            self.unsupported = True
+            return False
+        self._order, self._resolution = PCAP_MAGIC[magic]
+        self.linktype = struct.unpack_from(self._order + "I", blob, 20)[0] & 0x0FFFFFFF
+        self.header = blob[:GLOBAL_HEADER_LEN]
+        self.offset = GLOBAL_HEADER_LEN
+        return True
+
+    def read_new(self, min_ts: float = 0.0) -> Iterator[Packet]:
+        """TCP packets appended since the previous call (older than ``min_ts`` skipped)."""
+        if self.unsupported:
+            return
+        try:
+            with open(self.path, "rb") as f:
+                if self.header is None:
+                    if not self._read_header(f.read(GLOBAL_HEADER_LEN)):
+                        return
+                f.seek(self.offset)
+                blob = f.read()
+        except FileNotFoundError:
+            return
+
+        rec_fmt = self._order + "IIII"
+        pos = 0
+        while pos + RECORD_HEADER_LEN <= len(blob):
+            ts_sec, ts_frac, incl_len, _ = struct.unpack_from(rec_fmt, blob, pos)
+            end = pos + RECORD_HEADER_LEN + incl_len
+            if end > len(blob):
+                break                             # record still being written
+            ts = ts_sec + ts_frac * self._resolution
+            if ts >= min_ts:
+                parsed = parse_tcp(self.linktype, blob[pos + RECORD_HEADER_LEN:end])
+                if parsed is not None:
+                    src, dst, seq, flags, payload = parsed
+                    yield Packet(ts, blob[pos:end], src, dst, seq, flags, payload)
+            pos = end
+        self.offset += pos
+
+
+# ------------------------------------------------------------
+# Reassembly
+# ------------------------------------------------------------
+class HalfStream:
+    """One direction of a TCP connection, delivered in sequence order."""
+
+    def __init__(self) -> None:
+        self.next_seq: Optional[int] = None
+        self.pending: Dict[int, bytes] = {}
+        self.nbytes = 0
+        self.gaps = 0
+
+    def feed(self, seq: int, flags: int, payload: bytes) -> bytes:
+        """Add a segment; return the bytes that became contiguous."""
+        if flags & TCP_SYN:
+            self.next_seq = (seq + 1) % SEQ_MOD
+            seq = self.next_seq
+        if not payload:
+            return b""
+        if self.next_seq is None:                 # capture started mid-connection
+            self.next_seq = seq
+
+        ahead = (seq - self.next_seq) % SEQ_MOD
+        if ahead >= SEQ_MOD // 2:                 # starts before next_seq: retransmission
+            overlap = SEQ_MOD - ahead
+            if overlap >= len(payload):
+                return b""
+            payload, ahead = payload[overlap:], 0
+        if ahead:
+            self.pending.setdefault(seq, payload)
+            if len(self.pending) <= MAX_OUT_OF_ORDER:
+                return b""
+            # the missing segment was never captured – skip the hole
+            self.gaps += 1
+            self.next_seq = min(self.pending, key=lambda s: (s - self.next_seq) % SEQ_MOD)
+            return self._drain()
+
+        self.next_seq = (self.next_seq + len(payload)) % SEQ_MOD
+        self.nbytes += len(payload)
+        return payload + self._drain()
+
+    def _drain(self) -> bytes:
+        out = []
+        while self.pending:
+            progressed = False
+            for seq in list(self.pending):
+                ahead = (seq - self.next_seq) % SEQ_MOD
+                if ahead and ahead < SEQ_MOD // 2:
+                    continue
+                data = self.pending.pop(seq)
+                skip = (SEQ_MOD - ahead) % SEQ_MOD if ahead else 0
+                if skip < len(data):
+                    data = data[skip:]
+                    self.next_seq = (self.next_seq + len(data)) % SEQ_MOD
+                    self.nbytes += len(data)
+                    out.append(data)
+                progressed = True
+            if not progressed:
+                break
+        return b"".join(out)
+
+
+def stream_key(a: Endpoint, b: Endpoint) -> Tuple[Endpoint, Endpoint]:
+    """Direction-independent connection key."""
+    return (a, b) if a <= b else (b, a)
+
+
+@dataclass
+class TcpStream:
+    """Both directions of one connection plus its raw records."""
+    key: Tuple[Endpoint, Endpoint]
+    header: bytes
+    first_ts: float
+    last_ts: float = 0.0
+    records: List[bytes] = field(default_factory=list)
+    halves: Dict[Endpoint, HalfStream] = field(default_factory=dict)
+    record_bytes: int = 0
+    closed: bool = False
+    truncated: bool = False
+
+    def add(self, pkt: Packet, max_bytes: int) -> bytes:
+        """Record ``pkt`` and return the sender's newly contiguous payload."""
+        self.last_ts = pkt.ts
+        if pkt.flags & (TCP_FIN | TCP_RST):
+            self.closed = True
+        if self.record_bytes + len(pkt.record) <= max_bytes:
+            self.records.append(pkt.record)
+            self.record_bytes += len(pkt.record)
+        else:
+            self.truncated = True
+        half = self.halves.setdefault(pkt.src, HalfStream())
+        return half.feed(pkt.seq, pkt.flags, pkt.payload)
+
+    def to_pcap(self) -> bytes:
+        """The stream as a stand-alone pcap file (same header as the capture)."""
+        return self.header + b"".join(self.records)
+
+
+# ------------------------------------------------------------
+# Whole-file helpers for stream dumps
+# ------------------------------------------------------------
+def read_pcap(path: str) -> Tuple[Optional[bytes], List[Packet]]:
+    """Global header and TCP packets of a finished capture (e.g. a breach dump)."""
+    tail = PcapTail(path)
+    packets = list(tail.read_new())
+    return tail.header, packets
+
+
+def _server_endpoint(packets: List[Packet], server_ip: Optional[str], server_port: Optional[int]) -> Optional[Endpoint]:
+    if server_ip is not None or server_port is not None:
+        for pkt in packets:
+            for ep in (pkt.src, pkt.dst):
+                if (server_ip is None or ep[0] == server_ip) and (server_port is None or ep[1] == server_port):
+                    return ep
+    for pkt in packets:                           # the side that received the SYN
+        if pkt.flags & TCP_SYN and not pkt.flags & TCP_ACK:
+            return pkt.dst
+    return packets[0].dst if packets else None
+
+
+def stream_turns(
+    packets: List[Packet],
+    server_ip: Optional[str] = None,
+    server_port: Optional[int] = None,
+) -> List[Tuple[bool, bytes]]:
+    """
+    Reassembled payload of a single-connection capture as ``(from_server,
+    data)`` turns – consecutive segments in one direction are merged and
+    retransmissions are dropped.
+    """
+    server = _server_endpoint(packets, server_ip, server_port)
+    halves: Dict[Endpoint, HalfStream] = {}
+    turns: List[Tuple[bool, bytes]] = []
+    for pkt in packets:
+        data = halves.setdefault(pkt.src, HalfStream()).feed(pkt.seq, pkt.flags, pkt.payload)
+        if not data:
+            continue
+        from_server = pkt.src == server
+        if turns and turns[-1][0] == from_server:
+            turns[-1] = (from_server, turns[-1][1] + data)
+        else:
+            turns.append((from_server, data))
+    return turns
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Linear-time, byte-accurate prompt chunk assembly.
+
+Every file is wrapped as::
+
+    \\n--- BEGIN FILE: <path> ---\\n<content>\\n--- END FILE: <path> ---\\n
+
+and wrapped files are joined with ``"\\n"`` into chunks of at most
+``max_total_bytes`` UTF‑8 bytes – the limit holds *exactly*, including
+separators, overlap and truncation notes.
+
+* Sizes come from ``SourceText.nbytes`` when available, so content is never
+  re-encoded just to be measured; each chunk is joined exactly once.
+* A file that alone exceeds the limit is truncated by **bytes** (never
+  splitting a UTF‑8 character) and marked as truncated.
+* The overlap copied into the next chunk is cut on a file boundary when one
+  is close enough, otherwise on a line boundary with a short "continued"
+  marker naming the file.  It is dropped when it would not fit next to the
+  following file.
+"""
+
+import re
+from typing import Iterable, Iterator, List, Tuple
+
+from file_scanner import utf8_size
+
+FILE_HEADER = "\n--- BEGIN FILE: {path} ---\n"
+FILE_FOOTER = "\n--- END FILE: {path} ---\n"
+TRUNCATION_NOTE = "\n[... truncated to fit the chunk size ...]"
+CONTINUED_HEADER = "--- CONTINUED FILE: {path} (overlap from previous chunk) ---\n"
+SEPARATOR = "\n"
+
+_HEADER_ASCII = len(FILE_HEADER.format(path=""))
+_FOOTER_ASCII = len(FILE_FOOTER.format(path=""))
+_TRUNCATION_BYTES = len(TRUNCATION_NOTE.encode("utf-8"))
+_BEGIN_MARK = "\n--- BEGIN FILE: "
+
+
+def wrap_file(rel_path: str, content: str) -> str:
+    """Build a small wrapper that makes the prompt self‑documenting."""
+    return f"{FILE_HEADER.format(path=rel_path)}{content}{FILE_FOOTER.format(path=rel_path)}"
+
+
+def wrapped_size(rel_path: str, content: str) -> int:
+    """UTF‑8 size of ``wrap_file(rel_path, content)`` without building it."""
+    return utf8_size(content) + 2 * utf8_size(rel_path) + _HEADER_ASCII + _FOOTER_ASCII
+
+
+def _truncate_utf8(text: str, max_bytes: int) -> str:
+    """Longest prefix of ``text`` whose UTF‑8 encoding fits in ``max_bytes``."""
+    if max_bytes <= 0:
+        return ""
+    # A prefix of max_bytes characters is at least max_bytes bytes – encode only that
+    return text[:max_bytes].encode("utf-8")[:max_bytes].decode("utf-8", "ignore")
+
+
+def _overlap_tail(chunk: str, last_path: str, overlap_bytes: int) -> Tuple[str, int]:
+    """
+    Return ``(text, nbytes)`` to repeat at the start of the next chunk: a
+    suffix of ``chunk`` of at most ``overlap_bytes`` bytes that starts at a
+    file header if there is one in range, else at a line start (prefixed by
+    a "continued" marker).
+    """
+    if overlap_bytes <= 0:
+        return "", 0
+
+    tail = _truncate_utf8(chunk[-overlap_bytes:][::-1], overlap_bytes)[::-1]
+    file_start = tail.find(_BEGIN_MARK)
+    if file_start != -1:
+        tail = tail[file_start + 1:]
+        return tail, utf8_size(tail)
+
+    marker = CONTINUED_HEADER.format(path=last_path)
+    budget = overlap_bytes - utf8_size(marker)
+    if budget <= 0:
+        return "", 0
+    tail = _truncate_utf8(tail[::-1], budget)[::-1]
+    line_start = tail.find("\n")
+    if line_start == -1 or not tail[line_start + 1:].strip():
+        return "", 0
+    tail = marker + tail[line_start + 1:]
+    return tail, utf8_size(tail)
+
+
+def iter_prompt_chunks(
+    file_entries: Iterable[Tuple[str, str]],
+    max_total_bytes: int,
+    overlap_bytes: int,
+) -> Iterator[str]:
+    """
+    Yield chunk strings (without prologue) of at most ``max_total_bytes``
+    UTF‑8 bytes each, in a single pass over ``file_entries``.
+    """
+    parts: List[str] = []
+    size = 0                       # bytes of parts + separators
+    last_path = ""
+    has_file = False               # overlap alone never makes a chunk
+
+    for rel_path, content in file_entries:
+        wrapped_bytes = wrapped_size(rel_path, content)
+
+        # If a single file alone exceeds the per‑chunk limit, we truncate it (by bytes)
+        if wrapped_bytes > max_total_bytes:
+            print(f"[!] File '{rel_path}' is larger than the chunk size – truncating.")
+            frame = wrapped_bytes - utf8_size(content)
+            content = _truncate_utf8(content, max_total_bytes - frame - _TRUNCATION_BYTES)
+            content += TRUNCATION_NOTE
+            wrapped_bytes = wrapped_size(rel_path, content)
+            if wrapped_bytes > max_total_bytes:          # even the path does not fit
+                wrapped = _truncate_utf8(wrap_file(rel_path, content), max_total_bytes)
+                wrapped_bytes = utf8_size(wrapped)
+            else:
+                wrapped = wrap_file(rel_path, content)
+        else:
+            wrapped = wrap_file(rel_path, content)
+
+        added = wrapped_bytes + (len(SEPARATOR) if parts else 0)
+        if size + added > max_total_bytes:
+            if has_file:
+                chunk = SEPARATOR.join(parts)
+                yield chunk
+                tail, tail_bytes = _overlap_tail(chunk, last_path, overlap_bytes)
+            else:
+                tail, tail_bytes = "", 0
+            # keep the overlap only if the next file still fits next to it
+            if tail and tail_bytes + len(SEPARATOR) + wrapped_bytes <= max_total_bytes:
+                parts, size = [tail], tail_bytes
+            else:
+                parts, size = [], 0
+            has_file = False
+            added = wrapped_bytes + (len(SEPARATOR) if parts else 0)
+
+        parts.append(wrapped)
+        size += added
+        last_path = rel_path
+        has_file = True
+
+    if has_file:
+        yield SEPARATOR.join(parts)
+
+
+_FILE_HEADER_RE = re.compile(r"^--- BEGIN FILE: (.+) ---$", re.MULTILINE)
+
+
+def chunk_file_paths(chunk: str) -> List[str]:
+    """Paths of the files whose BEGIN header appears in ``chunk`` (in order)."""
+    return _FILE_HEADER_RE.findall(chunk)
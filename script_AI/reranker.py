@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Optional cross-encoder rerank stage for ``14_retrieve.py``.
+
+First-stage retrieval (dense + BM25) is cheap but coarse, so 30 candidates
+are fetched to be safe.  Sending all of them to the LLM costs far more than
+rescoring them.  ``Reranker`` scores ``(query, chunk)`` pairs with a local
+cross-encoder (``sentence_transformers.CrossEncoder``) in CPU batches and
+keeps the best ``top_n``:
+
+    reranker = Reranker(RERANK_MODEL_DIR)
+    best = reranker.rerank(query, hits, chunks, top_n=5)
+    logger.info(reranker.report())
+
+Scores are kept in an LRU cache keyed by ``(query, chunk_id)``.  Repeated
+or refined queries in an interactive session only score the chunks they have
+not seen yet.  ``report()`` summarises latency, the cache hit rate, how far
+the reranker reordered the candidates, and how much prompt text was saved.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+from instrumentation import tracer
+
+RERANK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_BATCH = 16
+RERANK_MAX_LENGTH = 512          # chunk tokens seen by the cross-encoder
+CACHE_SIZE = 8192
+
+
+@dataclass
+class RerankStats:
+    queries: int = 0
+    pairs: int = 0
+    cache_hits: int = 0
+    total_s: float = 0.0
+    promoted: int = 0            # kept chunks that were outside the first-stage top_n
+    chars_in: int = 0
+    chars_out: int = 0
+
+
+class Reranker:
+    def __init__(
+        self,
+        model_dir: str,
+        batch_size: int = RERANK_BATCH,
+        max_length: int = RERANK_MAX_LENGTH,
+        cache_size: int = CACHE_SIZE,
+    ) -> None:
+        # Imported here so that retrieval without --rerank does not need it
+        from sentence_transformers import CrossEncoder
+
+        with tracer.span("load_reranker"):
+            self.model = CrossEncoder(model_dir, max_length=max_length, device="cpu")
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, int], float]" = OrderedDict()
+        self.stats = RerankStats()
+
+    # --------------------------------------------------------------
+    # LRU cache
+    # --------------------------------------------------------------
+    def _cached(self, key: Tuple[str, int]):
+        score = self._cache.get(key)
+        if score is not None:
+            self._cache.move_to_end(key)
+        return score
+
+    def _remember(self, key: Tuple[str, int], score: float) -> None:
+        self._cache[key] = score
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # --------------------------------------------------------------
+    # Scoring
+    # --------------------------------------------------------------
+    def score(self, query: str, chunk_ids: Sequence[int], chunks: Sequence[str]) -> List[float]:
+        """Cross-encoder score of every chunk id for ``query`` (cached)."""
+        scores = [self._cached((query, cid)) for cid in chunk_ids]
+        missing = [n for n, s in enumerate(scores) if s is None]
+        self.stats.pairs += len(chunk_ids)
+        self.stats.cache_hits += len(chunk_ids) - len(missing)
+        if missing:
+            with tracer.span("rerank_batch", pairs=len(missing), batch_size=self.batch_size):
+                pairs = [(query, chunks[chunk_ids[n]]) for n in missing]
+                predicted = self.model.predict(pairs, batch_size=self.batch_size,
+                                               show_progress_bar=False)
+            for n, value in zip(missing, predicted):
+                scores[n] = float(value)
+                self._remember((query, chunk_ids[n]), scores[n])
+        return scores
+
+    def rerank(self, query: str, hits: list, chunks: Sequence[str], top_n: int) -> list:
+        """Reorder first-stage ``hits`` (``14_retrieve.Hit``); keep ``top_n``.
+
+        The returned hits carry ``rerank_score`` and their first-stage
+        position in ``first_rank``.
+        """
+        started = time.perf_counter()
+        with tracer.span("rerank", candidates=len(hits), top_n=top_n):
+            scores = self.score(query, [h.id for h in hits], chunks)
+            order = sorted(range(len(hits)), key=lambda n: scores[n], reverse=True)[:top_n]
+        kept = []
+        for n in order:
+            hit = hits[n]
+            hit.rerank_score = scores[n]
+            hit.first_rank = n + 1
+            kept.append(hit)
+
+        st = self.stats
+        st.queries += 1
+        st.total_s += time.perf_counter() - started
+        st.promoted += sum(1 for n in order if n >= top_n)
+        st.chars_in += sum(len(chunks[h.id]) for h in hits)
+        st.chars_out += sum(len(chunks[h.id]) for h in kept)
+        return kept
+
+    def report(self) -> str:
+        st = self.stats
+        if not st.queries:
+            return "[+] Rerank: no queries"
+        hit_rate = 100.0 * st.cache_hits / st.pairs if st.pairs else 0.0
+        saved = 100.0 * (1 - st.chars_out / st.chars_in) if st.chars_in else 0.0
+        return (f"[+] Rerank: {st.queries} query(ies), {st.total_s / st.queries * 1000:.0f} ms/query, "
+                f"{st.pairs} pair(s) with {hit_rate:.0f} % cache hits; "
+                f"{st.promoted} chunk(s) promoted from below the first-stage cut-off; "
+                f"prompt text {st.chars_in:,} → {st.chars_out:,} chars ({saved:.0f} % saved)")
+
+
+def ensure_model(models_dir: str, name: str = RERANK_MODEL_NAME) -> str:
+    """Local directory of the cross-encoder, downloaded on first use like the embedder."""
+    model_dir = os.path.join(models_dir, name.replace("/", "--"))
+    if not os.path.exists(model_dir):
+        from huggingface_hub import snapshot_download
+        snapshot_download(repo_id=name, local_dir=model_dir)
+    return model_dir
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Priority queue and deadline-aware scheduling of LLM requests.
+
+During a CTF round the scripts have a hard time budget.  ``DeadlineScheduler``
+hands out jobs (files or prompt chunks) highest priority first, and as the
+deadline approaches it shrinks ``max_tokens`` so that a reply still fits into
+the remaining time:
+
+    sched = DeadlineScheduler(deadline_s=900, default_max_tokens=4096)
+    for name, payload in items:
+        sched.push(name, priority, payload)
+    for job in sched:                                # stops at the deadline
+        started = time.perf_counter()
+        reply = ask(job.payload, max_tokens=sched.max_tokens())
+        sched.record(time.perf_counter() - started, reply, job)
+    sched.save_pending("pending.jsonl")              # what did not fit
+
+The throughput estimate (tokens per second, prefill included) is learnt from
+the finished jobs; ``record`` may be called from worker threads.  A job whose
+request failed (empty reply) is not retried in this run, but it is saved with
+the pending ones.  ``load_pending`` reads the saved jobs back for a later run.
+"""
+
+import heapq
+import itertools
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterator, List, Optional
+
+# 1 token ≈ 4 bytes – same rule of thumb as the chunk size constants
+BYTES_PER_TOKEN = 4
+MIN_MAX_TOKENS = 256           # below this a reply is not worth starting
+
+
+@dataclass(order=True)
+class Job:
+    sort_key: tuple = field(init=False, repr=False)
+    priority: float = field(compare=False)
+    name: str = field(compare=False)
+    payload: Any = field(compare=False)
+    seq: int = field(compare=False, default=0)
+
+    def __post_init__(self) -> None:
+        self.sort_key = (-self.priority, self.seq)
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "priority": self.priority, "payload": self.payload}
+
+
+class DeadlineScheduler:
+    """Max-priority queue with a global deadline and adaptive ``max_tokens``."""
+
+    def __init__(
+        self,
+        deadline_s: Optional[float] = None,
+        default_max_tokens: int = 4096,
+        min_max_tokens: int = MIN_MAX_TOKENS,
+    ) -> None:
+        self.started = time.monotonic()
+        self.deadline = self.started + deadline_s if deadline_s else None
+        self.default_max_tokens = default_max_tokens
+        self.min_max_tokens = min(min_max_tokens, default_max_tokens)
+        self._heap: List[Job] = []
+        self._failed: List[Job] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.done = 0
+        self.total_s = 0.0
+        self.total_tokens = 0
+        self.expired = False
+
+    # --------------------------------------------------------------
+    # Queue
+    # --------------------------------------------------------------
+    def push(self, name: str, priority: float, payload: Any) -> None:
+        heapq.heappush(self._heap, Job(priority, name, payload, next(self._seq)))
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __iter__(self) -> Iterator[Job]:
+        while self._heap:
+            if not self._time_for_another_job():
+                self.expired = True
+                return
+            yield heapq.heappop(self._heap)
+
+    def pending(self) -> List[Job]:
+        """Jobs never handed out plus those whose request failed, highest priority first."""
+        with self._lock:
+            return sorted(self._heap + self._failed)
+
+    # --------------------------------------------------------------
+    # Deadline handling
+    # --------------------------------------------------------------
+    def remaining_s(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def tokens_per_s(self) -> Optional[float]:
+        with self._lock:
+            if not self.done or self.total_s <= 0:
+                return None
+            return self.total_tokens / self.total_s
+
+    def max_tokens(self) -> int:
+        """``max_tokens`` for the next request: what still fits before the deadline."""
+        remaining, tps = self.remaining_s(), self.tokens_per_s()
+        if remaining is None or tps is None:
+            return self.default_max_tokens
+        fit = int(remaining * tps)
+        return max(self.min_max_tokens, min(self.default_max_tokens, fit))
+
+    def _time_for_another_job(self) -> bool:
+        remaining = self.remaining_s()
+        if remaining is None:
+            return True
+        if remaining <= 0:
+            return False
+        tps = self.tokens_per_s()
+        return tps is None or remaining * tps >= self.min_max_tokens
+
+    def record(self, elapsed_s: float, reply: Optional[str], job: Optional[Job] = None) -> None:
+        """Feed back one finished request (reply size ≈ generated tokens).
+
+        An empty ``reply`` means the request failed: it does not count towards
+        the throughput, and ``job`` goes back to the pending jobs.
+        """
+        with self._lock:
+            if not reply:
+                if job is not None:
+                    self._failed.append(job)
+                return
+            self.done += 1
+            self.total_s += elapsed_s
+            self.total_tokens += max(1, len(reply) // BYTES_PER_TOKEN)
+
+    # --------------------------------------------------------------
+    # Persistence of unfinished work
+    # --------------------------------------------------------------
+    def save_pending(self, path: str) -> int:
+        """Write the jobs still queued to ``path`` (JSONL, highest priority first)."""
+        jobs = self.pending()
+        with open(path, "w", encoding="utf-8") as f:
+            for job in jobs:
+                f.write(json.dumps(job.to_dict(), ensure_ascii=False) + "\n")
+        return len(jobs)
+
+    def load_pending(self, path: str) -> int:
+        """Queue the jobs saved by an earlier ``save_pending``; return how many."""
+        n = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    d = json.loads(line)
+                    self.push(d["name"], float(d["priority"]), d["payload"])
+                    n += 1
+        return n
+
+    def report(self) -> str:
+        elapsed = time.monotonic() - self.started
+        tps = self.tokens_per_s()
+        line = f"[+] Scheduler: {self.done} job(s) in {elapsed:.1f}s"
+        if tps:
+            line += f", ~{tps:.1f} tokens/s"
+        if self._heap:
+            line += f", {len(self._heap)} left" + (" (deadline reached)" if self.expired else "")
+        if self._failed:
+            line += f", {len(self._failed)} failed"
+        return line
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Condensation of recorded TCP streams before they are put into a prompt.
+
+A breach stream often carries far more bytes than the model needs to write a
+replay script: images and JavaScript the browser fetched, megabyte downloads,
+and the same keep-alive request repeated dozens of times.  ``condense_turns``
+rewrites the ``(from_server, data)`` turns of ``pcap_stream.stream_turns``:
+
+* HTTP/1.x messages are parsed, including pipelined requests, chunked bodies
+  and gzip / deflate content encoding.  Request lines and headers are kept
+  verbatim.  Very long header values are cut.
+* Request bodies are kept up to ``max_request_body``.  Larger form bodies
+  keep every parameter name, with long values cut.
+* Response bodies are kept only when they are small text.  Otherwise only
+  windows around the flag and around tokens a later request reuses (file
+  names, CSRF tokens, ids) remain, since the prompt notes that "a part of
+  payload from client could be based upon a part of payload of previous reply
+  from server".
+* Bulky and binary parts are replaced with size-annotated placeholders such
+  as ``[... 48213 bytes of image/png omitted ...]``.
+* Consecutive byte-identical requests collapse into the first exchange plus
+  a note, but only when the skipped reply carries no flag (searched after
+  de-chunking and decompression), sets no cookie, and holds no token that a
+  later request reuses.  Requests that differ only in values are never
+  collapsed: the value is usually the exploit.
+* Non-HTTP payloads are cut to a head, a tail and windows around flags.
+
+``request_shape`` doubles as the fingerprint input of
+``22_generate_replay_script.py``.
+"""
+
+import re
+import zlib
+from dataclasses import dataclass
+from typing import List, Optional, Set, Tuple
+
+Turn = Tuple[bool, bytes]
+
+MAX_REQUEST_BODY = 16 * 1024     # request bodies are replayed – keep them unless huge
+MAX_RESPONSE_BODY = 1024         # small text responses are kept whole
+MAX_HEADER_VALUE = 512
+MAX_FORM_VALUE = 256
+MAX_RAW = 4096                   # non-HTTP payload kept as is up to this size
+CONTEXT = 160                    # bytes kept around a flag / reused token
+HEAD_KEEP = 256
+TAIL_KEEP = 128
+MIN_REUSED_TOKEN = 6
+
+_HTTP_REQUEST_RE = re.compile(rb"^[A-Z]{3,10} \S+ HTTP/\d(?:\.\d)?$")
+_HTTP_RESPONSE_RE = re.compile(rb"^HTTP/\d(?:\.\d)? (\d{3})")
+_TOKEN_RE = re.compile(rb"[A-Za-z0-9+/=_\-]{16,}")
+_NUMBER_RE = re.compile(rb"\d+")
+_FORM_RE = re.compile(rb"^[\w.%+\-\[\]]+=[^\s]*(?:&[\w.%+\-\[\]]+=[^\s]*)*$")
+_WORD_RE = re.compile(rb"[\w.\-/%%]{%d,}" % MIN_REUSED_TOKEN)
+
+
+# ------------------------------------------------------------
+# Request shape (values masked)
+# ------------------------------------------------------------
+def _mask(data: bytes) -> bytes:
+    return _NUMBER_RE.sub(b"0", _TOKEN_RE.sub(b"*", data))
+
+
+def _param_names(query: bytes) -> bytes:
+    return b"&".join(sorted(p.split(b"=", 1)[0] for p in query.split(b"&") if p))
+
+
+def request_shape(data: bytes) -> bytes:
+    """What stays the same when an exploit is re-run: no values, only structure."""
+    head, sep, body = data.partition(b"\r\n\r\n")
+    lines = head.split(b"\r\n")
+    if not sep or not _HTTP_REQUEST_RE.match(lines[0]):
+        return _mask(data)
+    method, target, _ = lines[0].split(b" ", 2)
+    path, _, query = target.partition(b"?")
+    headers = sorted(line.split(b":", 1)[0].strip().lower() for line in lines[1:] if b":" in line)
+    body = body.strip()
+    body_shape = _param_names(body) if _FORM_RE.match(body) else _mask(body)
+    return b" ".join([method, _mask(path), _param_names(query)]) + b"|" + b",".join(headers) + b"|" + body_shape
+
+
+# ------------------------------------------------------------
+# HTTP/1.x parsing
+# ------------------------------------------------------------
+@dataclass
+class HttpMessage:
+    head: bytes                  # start line + header lines, without the blank line
+    body: bytes                  # de-chunked
+    raw_len: int
+    chunked: bool = False
+
+    @property
+    def start_line(self) -> bytes:
+        return self.head.split(b"\r\n", 1)[0]
+
+    def header(self, name: bytes) -> Optional[bytes]:
+        name = name.lower()
+        for line in self.head.split(b"\r\n")[1:]:
+            key, sep, value = line.partition(b":")
+            if sep and key.strip().lower() == name:
+                return value.strip()
+        return None
+
+
+def _dechunk(data: bytes, pos: int) -> Tuple[bytes, int]:
+    """Decode a chunked body starting at ``pos``; returns ``(body, end)``."""
+    out = []
+    while pos < len(data):
+        eol = data.find(b"\r\n", pos)
+        if eol == -1:
+            break
+        try:
+            size = int(data[pos:eol].split(b";", 1)[0], 16)
+        except ValueError:
+            break
+        pos = eol + 2
+        if size == 0:
+            trailer = data.find(b"\r\n\r\n", pos - 2)
+            return b"".join(out), (trailer + 4 if trailer != -1 else len(data))
+        out.append(data[pos:pos + size])
+        pos += size + 2
+    return b"".join(out), len(data)
+
+
+def parse_http(data: bytes, response: bool) -> Optional[Tuple[List[HttpMessage], bytes]]:
+    """Messages in ``data`` plus unparsed trailing bytes; ``None`` if not HTTP."""
+    start_re = _HTTP_RESPONSE_RE if response else _HTTP_REQUEST_RE
+    messages: List[HttpMessage] = []
+    pos = 0
+    while pos < len(data):
+        end = data.find(b"\r\n\r\n", pos)
+        if end == -1 or not start_re.match(data[pos:data.find(b"\r\n", pos)]):
+            break
+        msg = HttpMessage(data[pos:end], b"", 0)
+        body_start = end + 4
+        length = msg.header(b"content-length")
+        status = _HTTP_RESPONSE_RE.match(msg.start_line)
+        no_body = status is not None and (status.group(1)[:1] == b"1" or status.group(1) in (b"204", b"304"))
+        if no_body:
+            body_end = body_start
+        elif b"chunked" in (msg.header(b"transfer-encoding") or b"").lower():
+            msg.body, body_end = _dechunk(data, body_start)
+            msg.chunked = True
+        elif length is not None and length.isdigit():
+            body_end = min(len(data), body_start + int(length))
+        else:
+            body_end = len(data) if response else body_start
+        if not msg.chunked:
+            msg.body = data[body_start:body_end]
+        msg.raw_len = body_end - pos
+        messages.append(msg)
+        pos = body_end
+    if not messages:
+        return None
+    return messages, data[pos:]
+
+
+def _decode_body(msg: HttpMessage) -> Tuple[bytes, str]:
+    """Body after Content-Encoding, plus a note for the placeholder."""
+    encoding = (msg.header(b"content-encoding") or b"").lower()
+    if encoding in (b"gzip", b"x-gzip", b"deflate"):
+        wbits = 16 + zlib.MAX_WBITS if b"gzip" in encoding else zlib.MAX_WBITS
+        try:
+            return zlib.decompressobj(wbits).decompress(msg.body), f" ({encoding.decode()}-decoded)"
+        except zlib.error:
+            pass
+    return msg.body, ""
+
+
+def _is_text(body: bytes, content_type: bytes) -> bool:
+    ct = content_type.lower()
+    if ct and not any(t in ct for t in (b"text", b"json", b"xml", b"javascript", b"form", b"html")):
+        return False
+    sample = body[:1024]
+    return not sample or sum(b < 9 or 13 < b < 32 for b in sample) < len(sample) * 0.05
+
+
+# ------------------------------------------------------------
+# Windows around the interesting parts
+# ------------------------------------------------------------
+def _windows(data: bytes, spans: List[Tuple[int, int]], head: int = 0, tail: int = 0) -> bytes:
+    """Keep ``data`` around ``spans`` (plus head / tail); annotate the cuts."""
+    keep = [(max(0, s - CONTEXT), min(len(data), e + CONTEXT)) for s, e in spans]
+    if head:
+        keep.append((0, min(len(data), head)))
+    if tail:
+        keep.append((max(0, len(data) - tail), len(data)))
+    keep.sort()
+    merged: List[List[int]] = []
+    for s, e in keep:
+        if merged and s <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s, e])
+    out, pos = [], 0
+    for s, e in merged:
+        if s > pos:
+            out.append(b"\n[... %d bytes omitted ...]\n" % (s - pos))
+        out.append(data[s:e])
+        pos = e
+    if pos < len(data):
+        out.append(b"\n[... %d bytes omitted ...]\n" % (len(data) - pos))
+    return b"".join(out)
+
+
+@dataclass
+class CondenseStats:
+    streams: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    collapsed: int = 0
+
+    def report(self) -> str:
+        saved = 100 * (1 - self.bytes_out / self.bytes_in) if self.bytes_in else 0.0
+        return (f"[+] Condensed {self.streams} stream(s): {self.bytes_in:,} → {self.bytes_out:,} bytes "
+                f"({saved:.0f} % saved), {self.collapsed} repeated exchange(s) collapsed")
+
+
+class StreamCondenser:
+    def __init__(
+        self,
+        flag_regex: str,
+        max_request_body: int = MAX_REQUEST_BODY,
+        max_response_body: int = MAX_RESPONSE_BODY,
+    ) -> None:
+        self.flag_re = re.compile(flag_regex.encode())
+        self.max_request_body = max_request_body
+        self.max_response_body = max_response_body
+        self.stats = CondenseStats()
+
+    # --------------------------------------------------------------
+    # Single messages
+    # --------------------------------------------------------------
+    def _head(self, msg: HttpMessage) -> bytes:
+        lines = []
+        for line in msg.head.split(b"\r\n"):
+            if len(line) > MAX_HEADER_VALUE:
+                line = line[:MAX_HEADER_VALUE] + b"[... %d bytes omitted ...]" % (len(line) - MAX_HEADER_VALUE)
+            lines.append(line)
+        return b"\r\n".join(lines) + b"\r\n\r\n"
+
+    def _request(self, msg: HttpMessage) -> bytes:
+        body = msg.body
+        if len(body) > self.max_request_body:
+            ctype = msg.header(b"content-type") or b""
+            if _FORM_RE.match(body.strip()):
+                params = []
+                for p in body.strip().split(b"&"):
+                    if len(p) > MAX_FORM_VALUE:
+                        p = p[:MAX_FORM_VALUE] + b"[... %d bytes omitted ...]" % (len(p) - MAX_FORM_VALUE)
+                    params.append(p)
+                body = b"&".join(params)
+            elif _is_text(body, ctype):
+                body = _windows(body, self._flag_spans(body), head=HEAD_KEEP * 4, tail=TAIL_KEEP)
+            else:
+                body = b"[... %d bytes of %s omitted ...]" % (len(body), ctype or b"binary data")
+        return self._head(msg) + body
+
+    def _flag_spans(self, data: bytes) -> List[Tuple[int, int]]:
+        return [m.span() for m in self.flag_re.finditer(data)]
+
+    def _response(self, msg: HttpMessage, reused: Set[bytes]) -> bytes:
+        body, note = _decode_body(msg)
+        ctype = msg.header(b"content-type") or b""
+        flags = self._flag_spans(body)
+        if not flags and len(body) <= self.max_response_body and _is_text(body, ctype) and not note:
+            return self._head(msg) + body
+        if not _is_text(body, ctype) and not flags:
+            placeholder = b"[... %d bytes of %s%s omitted ...]" % (len(body), ctype or b"binary data", note.encode())
+            return self._head(msg) + placeholder
+        spans = flags + [m.span() for m in _WORD_RE.finditer(body) if m.group() in reused]
+        kept = _windows(body, spans, head=HEAD_KEEP)
+        if note:
+            kept = b"[body%s]\n" % note.encode() + kept
+        return self._head(msg) + kept
+
+    def _raw(self, data: bytes) -> bytes:
+        if len(data) <= MAX_RAW:
+            return data
+        return _windows(data, self._flag_spans(data), head=HEAD_KEEP * 2, tail=TAIL_KEEP)
+
+    # --------------------------------------------------------------
+    # Whole stream
+    # --------------------------------------------------------------
+    def condense_turns(self, turns: List[Turn]) -> List[Turn]:
+        self.stats.streams += 1
+        self.stats.bytes_in += sum(len(d) for _, d in turns)
+
+        # words the client sends for the first time after turn i – candidates
+        # for values it took from a server reply
+        later: List[Set[bytes]] = [set() for _ in range(len(turns) + 1)]
+        for i in range(len(turns) - 1, -1, -1):
+            from_server, data = turns[i]
+            later[i] = later[i + 1] if from_server else later[i + 1] | set(_WORD_RE.findall(data))
+        sent: Set[bytes] = set()
+
+        out: List[Turn] = []
+        last_request: Optional[bytes] = None
+        skipped = 0
+        i = 0
+        while i < len(turns):
+            from_server, data = turns[i]
+            if from_server:                       # orphan server turn (banner etc.)
+                out.append((True, self._condense_server(data, later[i] - sent)))
+                i += 1
+                continue
+            reply = turns[i + 1][1] if i + 1 < len(turns) and turns[i + 1][0] else None
+            sent.update(_WORD_RE.findall(data))
+            after = i + 2 if reply is not None else i + 1
+            boring = reply is None or not self._reply_matters(reply, later[after] - sent)
+            if data == last_request and boring:
+                skipped += 1
+                self.stats.collapsed += 1
+                i = after
+                continue
+            if skipped and out:
+                out[-1] = (out[-1][0], out[-1][1] + b"\n[... %d more identical exchange(s) omitted ...]\n" % skipped)
+            skipped = 0
+            last_request = data
+            out.append((False, self._condense_client(data)))
+            if reply is not None:
+                out.append((True, self._condense_server(reply, later[i + 2] - sent)))
+                i += 2
+            else:
+                i += 1
+        if skipped and out:
+            out[-1] = (out[-1][0], out[-1][1] + b"\n[... %d more identical exchange(s) omitted ...]\n" % skipped)
+
+        self.stats.bytes_out += sum(len(d) for _, d in out)
+        return out
+
+    def _reply_matters(self, data: bytes, reused: Set[bytes]) -> bool:
+        """Flag (in the decoded body), cookie or a token the client reuses later."""
+        parsed = parse_http(data, response=True)
+        if parsed is None:
+            bodies = [data]
+        else:
+            messages, rest = parsed
+            if any(m.header(b"set-cookie") is not None for m in messages):
+                return True
+            bodies = [_decode_body(m)[0] for m in messages] + [rest]
+        return any(self.flag_re.search(body) or any(w in reused for w in _WORD_RE.findall(body))
+                   for body in bodies)
+
+    def _condense_client(self, data: bytes) -> bytes:
+        parsed = parse_http(data, response=False)
+        if parsed is None:
+            return self._raw(data)
+        messages, rest = parsed
+        return b"".join(self._request(m) for m in messages) + self._raw(rest)
+
+    def _condense_server(self, data: bytes, reused: Set[bytes]) -> bytes:
+        parsed = parse_http(data, response=True)
+        if parsed is None:
+            return self._raw(data)
+        messages, rest = parsed
+        return b"".join(self._response(m, reused) for m in messages) + self._raw(rest)
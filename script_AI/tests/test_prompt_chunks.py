@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Randomised checks of the byte limit of ``prompt_chunks.iter_prompt_chunks``:
+no chunk may exceed ``max_total_bytes`` UTF‑8 bytes, whatever the content
+(multi-byte characters), overlap, file sizes or path lengths.
+
+    python -m pytest script_AI/tests
+"""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_chunks import chunk_file_paths, iter_prompt_chunks  # noqa: E402
+
+CASES = 3000
+# ASCII, 2-, 3- and 4-byte UTF-8 characters, and line breaks for the overlap cut
+ALPHABET = "abcdefgh \n" + "éüß" + "€中文" + "😀🔒"
+
+
+def _text(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(length))
+
+
+def _entries(rng: random.Random, max_total_bytes: int):
+    entries = []
+    for n in range(rng.randint(0, 8)):
+        if rng.random() < 0.1:                   # path longer than the whole chunk
+            path = f"dir/{_text(rng, max_total_bytes).replace(chr(10), '_')}{n}.js"
+        else:
+            path = f"src/{_text(rng, rng.randint(1, 12)).replace(chr(10), '_')}{n}.js"
+        # mostly small files, some around the limit, some far above it
+        size = rng.choice([rng.randint(0, 40), rng.randint(0, max_total_bytes), rng.randint(0, 4 * max_total_bytes)])
+        entries.append((path, _text(rng, size)))
+    return entries
+
+
+def _assert_within_limit(entries, max_total_bytes: int, overlap_bytes: int):
+    chunks = list(iter_prompt_chunks(entries, max_total_bytes, overlap_bytes))
+    for chunk in chunks:
+        assert len(chunk.encode("utf-8")) <= max_total_bytes
+    return chunks
+
+
+@pytest.mark.parametrize("seed", range(CASES))
+def test_chunks_never_exceed_byte_limit(seed):
+    rng = random.Random(seed)
+    max_total_bytes = rng.randint(1, 600)
+    overlap_bytes = rng.choice([0, rng.randint(1, max_total_bytes), rng.randint(0, 2 * max_total_bytes)])
+    _assert_within_limit(_entries(rng, max_total_bytes), max_total_bytes, overlap_bytes)
+
+
+def test_multibyte_file_larger_than_limit_is_truncated_on_a_character():
+    chunks = _assert_within_limit([("a.js", "😀" * 500)], 200, 0)
+    assert len(chunks) == 1
+    assert "�" not in chunks[0]
+    assert "truncated" in chunks[0]
+
+
+def test_path_longer_than_limit():
+    _assert_within_limit([("x" * 500 + ".js", "content"), ("b.js", "€" * 10)], 120, 40)
+
+
+def test_overlap_with_multibyte_lines():
+    entries = [(f"f{n}.js", "中文€\n" * 30) for n in range(10)]
+    chunks = _assert_within_limit(entries, 400, 150)
+    assert [p for c in chunks for p in chunk_file_paths(c)] == [f"f{n}.js" for n in range(10)]
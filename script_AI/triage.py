@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Two-tier triage in front of the expensive per-file analysis.
+
+1. Heuristic tier – ``file_ranking.score_file`` (sink/source regexes and path
+   hints).  Files scoring at least ``threshold`` always go to the large model.
+2. Optional cheap-model tier – files below the threshold (but not obviously
+   tests / vendored code) are shown, truncated, to a small fast model that
+   answers YES/NO.
+
+Recall safeguard: a random ``audit_rate`` share of the rejected files is still
+analysed by the large model.  Audited files that turn out to contain findings
+are counted as *misses*, which estimates how much recall the cascade costs.
+
+``TriageStats.report()`` prints how many expensive calls were saved.
+"""
+
+import random
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from file_ranking import score_file
+
+DEFAULT_THRESHOLD = 3.0        # heuristic score that skips the cheap tier
+MODEL_FLOOR = -4.0             # below this (tests, vendor/) the cheap tier is skipped too
+DEFAULT_AUDIT_RATE = 0.1       # share of rejected files analysed anyway
+TRIAGE_SNIPPET_BYTES = 8_000   # what the cheap model gets to see
+
+ANALYSE, AUDIT, SKIP = "analyse", "audit", "skip"
+
+TRIAGE_PROMPT = (
+    "You are triaging files for a security review.  Answer with exactly one word, "
+    "YES or NO: could the following file contain a security vulnerability or "
+    "handle untrusted input, authentication, files, processes or a database?\n\n"
+    "--- BEGIN FILE ({path}) ---\n{snippet}\n--- END FILE ---"
+)
+
+
+@dataclass
+class TriageStats:
+    seen: int = 0
+    heuristic_pass: int = 0
+    model_pass: int = 0
+    model_calls: int = 0
+    skipped: int = 0
+    audited: int = 0
+    audit_misses: int = 0
+
+    @property
+    def analysed(self) -> int:
+        return self.heuristic_pass + self.model_pass + self.audited
+
+    def report(self, mean_call_s: Optional[float] = None) -> str:
+        saved = f"[+] Triage: {self.skipped}/{self.seen} expensive call(s) saved"
+        if mean_call_s:
+            saved += f" (~{self.skipped * mean_call_s:.0f}s at {mean_call_s:.1f}s per call)"
+        lines = [
+            saved,
+            f"[+] Triage: analysed {self.analysed} – {self.heuristic_pass} by heuristic, "
+            f"{self.model_pass} by cheap model ({self.model_calls} cheap call(s)), "
+            f"{self.audited} recall audit(s)",
+        ]
+        if self.audited:
+            lines.append(
+                f"[{'!' if self.audit_misses else '+'}] Triage recall audit: "
+                f"{self.audit_misses}/{self.audited} rejected file(s) had findings"
+                + (" – consider lowering --triage-threshold" if self.audit_misses else "")
+            )
+        return "\n".join(lines)
+
+
+class Triage:
+    """
+    Decide per file whether the expensive model should see it.
+
+    ``classifier(rel_path, snippet) -> bool`` is the optional cheap-model tier;
+    it is only consulted for files the heuristic did not already accept.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        classifier: Optional[Callable[[str, str], bool]] = None,
+        audit_rate: float = DEFAULT_AUDIT_RATE,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.threshold = threshold
+        self.classifier = classifier
+        self.audit_rate = audit_rate
+        self.rng = random.Random(seed)
+        self.stats = TriageStats()
+
+    def decide(self, rel_path: str, content: str) -> str:
+        """Return ``ANALYSE``, ``AUDIT`` (rejected, but sampled for recall) or ``SKIP``."""
+        self.stats.seen += 1
+        score = score_file(rel_path, content).score
+        if score >= self.threshold:
+            self.stats.heuristic_pass += 1
+            return ANALYSE
+
+        if self.classifier is not None and score > MODEL_FLOOR:
+            self.stats.model_calls += 1
+            if self.classifier(rel_path, content[:TRIAGE_SNIPPET_BYTES]):
+                self.stats.model_pass += 1
+                return ANALYSE
+
+        if self.audit_rate > 0 and self.rng.random() < self.audit_rate:
+            self.stats.audited += 1
+            return AUDIT
+        self.stats.skipped += 1
+        return SKIP
+
+    def record_audit(self, had_findings: bool) -> None:
+        if had_findings:
+            self.stats.audit_misses += 1
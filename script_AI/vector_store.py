@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Storage precision of the FAISS vector store.
+
+``13_embedding.py`` used to store full float32 vectors in ``IndexFlatL2``.
+The index size is dim × chunks × 4 bytes, and ``14_retrieve.py`` loads all
+of it at startup.  ``build_index`` can store the vectors more compactly:
+
+* ``fp32`` – ``IndexFlatL2``, exact (the default, as before);
+* ``fp16`` – ``IndexScalarQuantizer`` with half floats, 2× smaller;
+* ``sq8``  – ``IndexScalarQuantizer`` with 8-bit codes (trained per
+  dimension on the corpus itself), 4× smaller.
+
+On top of that, ``dim`` truncates the vectors Matryoshka-style to their
+first 512 / 256 / 128 components and re-normalises them; embeddinggemma is
+trained for this.  14 reads the dimension back from ``index.d`` and
+truncates the query embedding the same way (``fit_query``).
+
+``recall_report`` measures what the smaller index costs: it uses a sample
+of the chunk vectors themselves as queries and compares the top-k of each
+candidate store with the exact float32 ranking.
+
+``read_index`` memory-maps the stored vectors instead of copying them, so
+14 starts in milliseconds and parallel retrieval processes share one copy
+in the page cache; ``startup_benchmark`` measures both ways of loading.
+"""
+
+import time
+from typing import Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+PRECISIONS = ("fp32", "fp16", "sq8")
+MATRYOSHKA_DIMS = (768, 512, 256, 128)
+RECALL_QUERIES = 200
+RECALL_K = 10
+
+_QUANTIZER = {"fp16": faiss.ScalarQuantizer.QT_fp16, "sq8": faiss.ScalarQuantizer.QT_8bit}
+
+
+def truncate_dims(vectors: np.ndarray, dim: Optional[int]) -> np.ndarray:
+    """First ``dim`` components, re-normalised to unit length (float32)."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if not dim or dim >= vectors.shape[1]:
+        return vectors
+    cut = np.ascontiguousarray(vectors[:, :dim])
+    faiss.normalize_L2(cut)
+    return cut
+
+
+def fit_query(index, query_embedding: np.ndarray) -> np.ndarray:
+    """Query embedding shaped for ``index`` (truncated if the store is)."""
+    return truncate_dims(query_embedding, index.d)
+
+
+def build_index(embeddings: np.ndarray, precision: str = "fp32", dim: Optional[int] = None):
+    """FAISS L2 index over ``embeddings`` stored with the given precision."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"unknown precision {precision!r} (use one of {PRECISIONS})")
+    vectors = truncate_dims(embeddings, dim)
+    d = vectors.shape[1]
+    if precision == "fp32":
+        index = faiss.IndexFlatL2(d)
+    else:
+        index = faiss.IndexScalarQuantizer(d, _QUANTIZER[precision], faiss.METRIC_L2)
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def index_bytes(index) -> int:
+    """Bytes taken by the stored vectors (codes) of ``index``."""
+    return int(index.code_size) * index.ntotal
+
+
+def describe(index) -> str:
+    return f"{type(index).__name__}, dim {index.d}, {index.ntotal} vector(s), {index_bytes(index) / 1e6:.2f} MB"
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray) -> float:
+    """Mean share of the true top-k ids that ``found`` also returns."""
+    k = truth.shape[1]
+    return float(np.mean([len(set(t) & set(f)) / k for t, f in zip(truth, found)]))
+
+
+def recall_report(
+    embeddings: np.ndarray,
+    configs: Sequence[tuple],
+    k: int = RECALL_K,
+    queries: int = RECALL_QUERIES,
+    seed: int = 0,
+) -> List[Dict]:
+    """Recall@k and size of each ``(precision, dim)`` against exact float32."""
+    vectors = truncate_dims(embeddings, None)
+    k = min(k, len(vectors))
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(queries, len(vectors)), replace=False)]
+    baseline = build_index(vectors)
+    _, truth = baseline.search(sample, k)
+    base_bytes = index_bytes(baseline)
+
+    rows = []
+    for precision, dim in configs:
+        index = build_index(vectors, precision, dim)
+        _, found = index.search(truncate_dims(sample, dim), k)
+        size = index_bytes(index)
+        rows.append({"precision": precision, "dim": index.d, "bytes": size,
+                     "ratio": base_bytes / size, "recall": recall_at_k(truth, found)})
+    return rows
+
+
+# ------------------------------------------------------------
+# Loading
+# ------------------------------------------------------------
+# Flat and scalar-quantizer codes are mapped straight from the file
+# (IO_FLAG_MMAP_IFC, faiss >= 1.8); older faiss only maps IVF lists.
+MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+
+def read_index(path: str, mmap: bool = True):
+    """Read a FAISS index; with ``mmap`` the vectors stay in the page cache.
+
+    A mapped index costs no copy at startup, and every retrieval process on
+    the host shares the same physical pages.  Pages are faulted in by the
+    first searches (or are already there when another process used them).
+    """
+    return faiss.read_index(path, MMAP_FLAG if mmap else 0)
+
+
+def memory_mb() -> Dict[str, float]:
+    """RSS and PSS of this process in MB (PSS splits shared pages; Linux only)."""
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup", "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    usage[key.lower()] = int(rest.split()[0]) / 1024
+    except OSError:
+        import resource
+        usage["rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return usage
+
+
+def _startup_probe(path: str, mmap: bool, barrier, results) -> None:
+    before = memory_mb()
+    started = time.perf_counter()
+    index = read_index(path, mmap)
+    loaded = time.perf_counter()
+    index.search(np.zeros((1, index.d), dtype=np.float32), 1)     # flat scan touches every vector
+    searched = time.perf_counter()
+    barrier.wait()                  # every process holds the index when memory is sampled
+    after = memory_mb()
+    results.put({"load_ms": (loaded - started) * 1000, "first_query_ms": (searched - loaded) * 1000,
+                 **{f"{k}_mb": after[k] - before.get(k, 0.0) for k in after}})
+    barrier.wait()
+
+
+def startup_benchmark(path: str, processes: int = 4) -> List[Dict]:
+    """Load time, first query and per-process memory, copied vs mapped.
+
+    ``processes`` readers hold the index at the same time, like several
+    retrieval processes on one host.  Memory is the growth caused by the
+    index in each process.
+    """
+    import multiprocessing
+
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    for mmap in (False, True):
+        barrier, results = ctx.Barrier(processes), ctx.Queue()
+        workers = [ctx.Process(target=_startup_probe, args=(path, mmap, barrier, results))
+                   for _ in range(processes)]
+        for w in workers:
+            w.start()
+        samples = [results.get() for _ in workers]
+        for w in workers:
+            w.join()
+        row = {"mode": "mmap" if mmap else "read", "processes": processes}
+        for key in samples[0]:
+            row[key] = sum(s[key] for s in samples) / len(samples)
+        rows.append(row)
+    return rows